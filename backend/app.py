@@ -1,9 +1,13 @@
+import logging
 import os
-from flask import Flask, render_template, request, jsonify
+import time
+from flask import Flask, Response, g, render_template, request, jsonify
 from flask_cors import CORS
-import pandas as pd
-from python.query_processing import QueryProcessor
-from python.joke_ranker import JokeRanker
+from python.joke_service import JokeService
+from python.metrics import REGISTRY, REQUEST_SECONDS, RESPONSES, stage_timer
+from python.log_utils import get_logger, log_event
+
+logger = get_logger('app')
 
 # ROOT_PATH for linking with all your files. 
 # Feel free to use a config.py or settings.py with a global export variable
@@ -15,135 +19,226 @@ current_directory = os.path.dirname(os.path.abspath(__file__))
 # Specify the path to the csv file relative to the current script
 dataset_path = os.path.join(current_directory, 'dataset.csv')
 
-# Load jokes from CSV
-try:
-    jokes_df = pd.read_csv(dataset_path)
-    print(f"Successfully loaded {len(jokes_df)} jokes from dataset")
-except Exception as e:
-    print(f"Error loading joke dataset: {str(e)}")
-    jokes_df = pd.DataFrame(columns=['id', 'title', 'body', 'category'])
-
-app = Flask(__name__)
-CORS(app)
-
-query_processor = QueryProcessor()
-
-joke_texts = []
-joke_data_map = {}
-
-for idx, row in jokes_df.iterrows():
-    # Create standardized joke text
-    joke_text = f"{row.get('title', '')} {row.get('body', '')}".strip()
-    joke_texts.append(joke_text)
-    joke_data_map[joke_text] = row.to_dict()
-
-joke_ranker = JokeRanker(joke_texts)
-
-def joke_search(query, category=""):
-    try:
-        # Process the query to extract information
-        query_info = query_processor.process_query(query)
-        print(f"Processed query: {query_info}")
-        
-        # Override category if provided as a parameter
-        if category:
-            query_info['category'] = category
-            
-        # Get keywords for search
-        search_query = ' '.join(query_info['keywords'])
-        print(f"Searching with keywords: {search_query}")
-        
-        # Get ranked jokes using cosine similarity
-        ranked_jokes = joke_ranker.rank_jokes(search_query, 5)
-        print(f"Found {len(ranked_jokes)} ranked jokes")
-        
-        # If a category filter is active, filter the ranked jokes by category
-        filtered_results = []
-        for joke_text, score in ranked_jokes:
-            if joke_text in joke_data_map:
-                joke_data = joke_data_map[joke_text]
-                
-                # Apply category filter if specified
-                if category and category != 'general' and category != '':
-                    if category.lower() not in joke_data.get('category', '').lower():
-                        continue  # Skip jokes that don't match the category
-                
-                filtered_results.append({
-                    'title': joke_data.get('title', ''),
-                    'body': joke_data.get('body', ''),
-                    'category': joke_data.get('category', ''),
-                    'score': float(score)
-                })
-        
-        return filtered_results
-    except Exception as e:
-        print(f"Error in joke_search: {str(e)}")
-        return []
-
-@app.route("/")
-def home():
-    return render_template('base.html', title="Joke Recommender")
-
-@app.route("/roast-it")
-def search_jokes():
-    query = request.args.get("query", "")
-    category = request.args.get("category", "")
-    
-    if not query:
-        return jsonify({"error": "No query provided"}), 400
-    
-    try:
-        jokes = joke_search(query, category)
-        
-        # Format joke texts and scores for response
-        jokes_with_scores = []
-        for joke in jokes:
-            joke_text = ""
-            if joke.get('title') and joke.get('body'):
-                joke_text = f"{joke['title']}: {joke['body']}"
-            elif joke.get('body'):
-                joke_text = joke['body']
-                
-            jokes_with_scores.append({
-                "joke": joke_text,
-                "score": joke.get('score', 1.0)
-            })
-            
-        return jsonify({
-            "jokes_with_scores": jokes_with_scores
+# Prebuilt search index written by build_index.py
+index_dir = os.path.join(current_directory, 'joke_index')
+
+# Limits for the batch endpoint
+MAX_BATCH_QUERIES = 100
+MAX_TOP_N = 50
+
+# Seconds clients and proxies may reuse /categories before revalidating its ETag
+CATEGORIES_MAX_AGE = 60
+
+def format_jokes(jokes):
+    """Format joke texts and scores for a /roast-it response."""
+    jokes_with_scores = []
+    for joke in jokes:
+        joke_text = ""
+        if joke.get('title') and joke.get('body'):
+            joke_text = f"{joke['title']}: {joke['body']}"
+        elif joke.get('body'):
+            joke_text = joke['body']
+
+        jokes_with_scores.append({
+            "joke": joke_text,
+            "score": joke.get('score', 1.0)
         })
-    except Exception as e:
-        print(f"Error in search_jokes: {str(e)}")
-        return jsonify({
-            "error": str(e),
-            "jokes_with_scores": []
-        }), 500
-
-@app.route("/categories")
-def get_categories():
-    """Return all available joke categories"""
-    categories = jokes_df['category'].dropna().unique().tolist()
-    return jsonify(categories)
-
-@app.route("/joke/random")
-def random_joke():
-    """Return a random joke"""
-    if len(jokes_df) > 0:
-        random_joke = jokes_df.sample(1).iloc[0].to_dict()
-        return jsonify(random_joke)
-    else:
-        return jsonify({"error": "No jokes available"}), 404
-
-# Debug endpoint to check if jokes are loaded correctly
-@app.route("/debug/jokes")
-def debug_jokes():
-    """Return information about loaded jokes"""
-    return jsonify({
-        "total_jokes": len(jokes_df),
-        "joke_texts": len(joke_texts),
-        "categories": jokes_df['category'].dropna().unique().tolist(),
-        "sample_jokes": jokes_df.head(3).to_dict('records') if len(jokes_df) > 0 else []
-    })
+    return jokes_with_scores
+
+def parse_batch(payload):
+    """Validate a /roast-it/batch body; returns ([(query, category, top_n)], None) or (None, error)."""
+    items = payload.get("queries") if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return None, "Expected a list of {query, category, top_n} objects"
+    if len(items) > MAX_BATCH_QUERIES:
+        return None, f"At most {MAX_BATCH_QUERIES} queries per batch"
+
+    searches = []
+    for item in items:
+        if not isinstance(item, dict) or not item.get("query"):
+            return None, "Every item needs a query"
+        top_n = item.get("top_n", 5)
+        if not isinstance(top_n, int) or not 1 <= top_n <= MAX_TOP_N:
+            return None, f"top_n must be an integer between 1 and {MAX_TOP_N}"
+        category = item.get("category") or ""
+        if not isinstance(category, str):
+            return None, "category must be a string"
+        searches.append((str(item["query"]), category, top_n))
+    return searches, None
+
+def format_batch(searches, results):
+    """Format joke_search_batch results for a /roast-it/batch response."""
+    return {
+        "results": [
+            {"query": query, "jokes_with_scores": format_jokes(jokes)}
+            for (query, _, _), jokes in zip(searches, results)
+        ]
+    }
+
+def create_app(preload=False, service=None):
+    """Application factory (`flask run` and `gunicorn 'app:create_app()'` both find it).
+
+    The dataset and index are loaded on the first request that needs them, or right away
+    with preload=True; gunicorn.conf.py preloads in the master so workers fork warm.
+    """
+    app = Flask(__name__)
+    CORS(app)
+
+    service = service or JokeService.from_env(dataset_path, index_dir)
+    app.extensions['joke_service'] = service
+    if preload:
+        service.load()
+
+    # Jokes can only be ingested over HTTP when a shared token is configured
+    ingest_token = os.environ.get('JOKE_INGEST_TOKEN')
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        if REGISTRY.enabled and 'request_start' in g:
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_SECONDS.observe((endpoint,), time.perf_counter() - g.request_start)
+            RESPONSES.inc((endpoint, str(response.status_code)))
+        return response
+
+    @app.route("/")
+    def home():
+        return render_template('base.html', title="Joke Recommender")
+
+    @app.route("/roast-it")
+    def search_jokes():
+        query = request.args.get("query", "")
+        category = request.args.get("category", "")
+
+        if not query:
+            return jsonify({"error": "No query provided"}), 400
+
+        try:
+            jokes = service.joke_search(query, category)
+            with stage_timer('format'):
+                return jsonify({
+                    "jokes_with_scores": format_jokes(jokes)
+                })
+        except Exception as e:
+            log_event(logger, 'search_jokes_failed', logging.ERROR, exc_info=e, error=str(e))
+            return jsonify({
+                "error": str(e),
+                "jokes_with_scores": []
+            }), 500
+
+    @app.route("/roast-it/batch", methods=["POST"])
+    def search_jokes_batch():
+        """Rank a JSON list of {query, category, top_n} objects, returning results in request order"""
+        searches, error = parse_batch(request.get_json(silent=True))
+        if error:
+            return jsonify({"error": error}), 400
+
+        try:
+            results = service.joke_search_batch(searches)
+            with stage_timer('format'):
+                return jsonify(format_batch(searches, results))
+        except Exception as e:
+            log_event(logger, 'search_jokes_batch_failed', logging.ERROR, exc_info=e, error=str(e))
+            return jsonify({
+                "error": str(e),
+                "results": []
+            }), 500
+
+    @app.route("/jokes/ingest", methods=["POST"])
+    def ingest_jokes():
+        """Add a JSON list of scraped jokes to the live index without a full refit"""
+        if not ingest_token or request.headers.get("X-Ingest-Token") != ingest_token:
+            return jsonify({"error": "Ingestion is disabled or the token is wrong"}), 403
+        payload = request.get_json(silent=True)
+        records = payload.get("jokes") if isinstance(payload, dict) else payload
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            return jsonify({"error": "Expected a list of joke objects"}), 400
+
+        try:
+            summary = service.ingest(records)
+        except Exception as e:
+            log_event(logger, 'ingest_failed', logging.ERROR, exc_info=e, error=str(e))
+            return jsonify({"error": str(e)}), 500
+        if summary is None:
+            return jsonify({"error": "No jokes with a title or body"}), 400
+        return jsonify(summary)
+
+    def cached_json(body, etag, max_age):
+        """Serve a pre-serialized body with an ETag, answering 304 when the client has it."""
+        response = Response(body, mimetype="application/json")
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        return response.make_conditional(request)
+
+    @app.route("/categories")
+    def get_categories():
+        """Return all available joke categories"""
+        catalog = service.catalog
+        return cached_json(catalog.categories_body, catalog.categories_etag, CATEGORIES_MAX_AGE)
+
+    @app.route("/joke/random")
+    def random_joke():
+        """Return a random joke, optionally from ?category= and only ?clean=1 jokes"""
+        catalog = service.catalog
+        category = request.args.get("category", "")
+        clean = request.args.get("clean", "").lower() in ("1", "true", "yes")
+        row = catalog.random_row(category, clean)
+        if row is None:
+            return jsonify({"error": "No jokes available"}), 404
+        response = jsonify(catalog.snapshot.store.record(row))
+        response.cache_control.no_store = True
+        return response
+
+    @app.route("/joke/<joke_id>/similar")
+    def similar_jokes(joke_id):
+        """Return the ?k= (default 5) jokes most similar to the joke with this id"""
+        k = request.args.get("k", "5")
+        if not k.isdigit() or not 1 <= int(k) <= MAX_TOP_N:
+            return jsonify({"error": f"k must be an integer between 1 and {MAX_TOP_N}"}), 400
+        try:
+            found = service.similar(joke_id, int(k))
+        except Exception as e:
+            log_event(logger, 'similar_jokes_failed', logging.ERROR, exc_info=e, error=str(e))
+            return jsonify({"error": str(e), "similar": []}), 500
+        if found is None:
+            return jsonify({"error": f"No joke with id {joke_id}"}), 404
+        joke, similar = found
+        with stage_timer('format'):
+            return jsonify({"id": joke_id, "joke": joke, "similar": similar})
+
+    # Debug endpoint to check if jokes are loaded correctly
+    @app.route("/debug/jokes")
+    def debug_jokes():
+        """Return information about loaded jokes"""
+        catalog = service.catalog
+        return cached_json(catalog.debug_body, catalog.debug_etag, 0)
+
+    @app.route("/ready")
+    def ready():
+        """Readiness probe: 503 until the dataset and index are loaded, starting the load if needed"""
+        if not service.ready:
+            service.load_in_background()
+            error = str(service.load_error) if service.load_error else None
+            return jsonify({"ready": False, "error": error}), 503
+        snapshot = service.current
+        return jsonify({"ready": True, "index_version": snapshot.version, "total_jokes": len(snapshot.store)})
+
+    @app.route("/metrics")
+    def metrics():
+        """Prometheus metrics: per-stage and per-endpoint latency, index size, cache and memory"""
+        return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/debug/cache")
+    def debug_cache():
+        """Return search result cache counters"""
+        service.ensure_loaded()
+        return jsonify(service.result_cache.stats())
+
+    return app
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file
+    create_app(preload=True).run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,138 @@
+"""ASGI entry point: the Flask app, with the search endpoints served from the event loop.
+
+    gunicorn -c gunicorn_asgi.conf.py                  (production, uvicorn workers)
+    uvicorn --factory asgi:create_asgi_app --port 5000  (single process, for development)
+
+GET /roast-it and POST /roast-it/batch are answered here. Their ranking runs in a bounded
+SearchExecutor: concurrent identical queries share one computation, a full queue or a
+missed deadline returns 503 with Retry-After, and the event loop keeps accepting
+connections while NumPy works in the pool threads. Every other route (and other methods,
+such as CORS preflights) goes to the Flask app through asgiref's WsgiToAsgi.
+"""
+import json
+import logging
+import os
+import time
+from urllib.parse import parse_qsl
+from asgiref.wsgi import WsgiToAsgi
+from app import create_app, format_batch, format_jokes, parse_batch
+from python.metrics import REGISTRY, REQUEST_SECONDS, RESPONSES, stage_timer
+from python.search_executor import Overloaded, SearchExecutor
+from python.log_utils import get_logger, log_event
+
+logger = get_logger('asgi')
+
+# Largest /roast-it/batch body read before answering 413
+MAX_BODY_BYTES = 1 << 20
+
+
+def encode_json(payload):
+    return json.dumps(payload, separators=(",", ":"), sort_keys=True).encode() + b"\n"
+
+
+class SearchASGI:
+    """ASGI app serving the search routes natively and delegating the rest to Flask."""
+
+    def __init__(self, flask_app, executor):
+        self.flask_app = flask_app
+        self.service = flask_app.extensions['joke_service']
+        self.executor = executor
+        self.wsgi = WsgiToAsgi(flask_app)
+        # (method, path) -> (endpoint, handler, the list key the Flask route returns empty on errors)
+        self.routes = {
+            ("GET", "/roast-it"): ('search_jokes', self.search_jokes, 'jokes_with_scores'),
+            ("POST", "/roast-it/batch"): ('search_jokes_batch', self.search_jokes_batch, 'results'),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        route = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if route is None:
+            return await self.wsgi(scope, receive, send)
+
+        endpoint, handler, results_key = route
+        start = time.perf_counter()
+        try:
+            status, payload, headers = await handler(scope, receive)
+        except Exception as e:
+            log_event(logger, f'{endpoint}_failed', logging.ERROR, exc_info=e, error=str(e))
+            status, payload, headers = 500, {"error": str(e), results_key: []}, []
+        body = payload if isinstance(payload, bytes) else encode_json(payload)
+
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + headers
+        if any(name == b"origin" for name, _ in scope.get('headers', ())):
+            headers.append((b"access-control-allow-origin", b"*"))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+        if REGISTRY.enabled:
+            REQUEST_SECONDS.observe((endpoint,), time.perf_counter() - start)
+            RESPONSES.inc((endpoint, str(status)))
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def search_jokes(self, scope, receive):
+        args = {}
+        for name, value in parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True):
+            args.setdefault(name, value)
+        query = args.get("query", "")
+        category = args.get("category", "")
+        if not query:
+            return 400, {"error": "No query provided"}, []
+        return await self.offload(('search', query, category), self.search_body, query, category)
+
+    async def search_jokes_batch(self, scope, receive):
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if len(body) > MAX_BODY_BYTES:
+                return 413, {"error": f"Request body over {MAX_BODY_BYTES} bytes"}, []
+            if not message.get('more_body'):
+                break
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        searches, error = parse_batch(payload)
+        if error:
+            return 400, {"error": error}, []
+        return await self.offload(('batch', tuple(searches)), self.search_batch_body, searches)
+
+    async def offload(self, key, fn, *args):
+        """Run fn in the executor, mapping shed requests to 503."""
+        try:
+            return 200, await self.executor.run(key, fn, *args), []
+        except Overloaded as e:
+            return 503, {"error": "Search is overloaded, try again", "reason": e.reason}, [(b"retry-after", b"1")]
+
+    def search_body(self, query, category):
+        """Search and serialize in a pool thread; coalesced callers share the encoded body."""
+        jokes = self.service.joke_search(query, category)
+        with stage_timer('format'):
+            return encode_json({"jokes_with_scores": format_jokes(jokes)})
+
+    def search_batch_body(self, searches):
+        results = self.service.joke_search_batch(searches)
+        with stage_timer('format'):
+            return encode_json(format_batch(searches, results))
+
+
+def create_asgi_app(preload=False, service=None, max_workers=None, max_pending=None, timeout=None):
+    """ASGI application factory; limits default to JOKE_SEARCH_THREADS, JOKE_SEARCH_QUEUE and JOKE_SEARCH_TIMEOUT."""
+    if max_workers is None:
+        max_workers = int(os.environ.get('JOKE_SEARCH_THREADS', 4))
+    if max_pending is None:
+        max_pending = int(os.environ.get('JOKE_SEARCH_QUEUE', 64))
+    if timeout is None:
+        timeout = float(os.environ.get('JOKE_SEARCH_TIMEOUT', 2.0))
+    executor = SearchExecutor(max_workers=max_workers, max_pending=max_pending, timeout=timeout)
+    return SearchASGI(create_app(preload=preload, service=service), executor)
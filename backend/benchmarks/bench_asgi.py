@@ -0,0 +1,121 @@
+"""Throughput of the ASGI serving mode against the current WSGI setups under concurrency.
+
+    python -m benchmarks.bench_asgi [--servers werkzeug,gunicorn,asgi] [--concurrency 1,8,32,64]
+        [--requests 1000] [--workers 2] [--hot-queries 0] [--queue 64] [--timeout 2]
+        [--output asgi.json]
+
+Each server serves the app's dataset.csv and joke_index with the result cache off:
+
+- werkzeug: the Flask development server, threaded (what `python app.py` runs).
+- gunicorn: gunicorn.conf.py with --workers sync workers.
+- asgi: gunicorn_asgi.conf.py, uvicorn workers with the bounded search executor.
+
+The load_test client sends GET /roast-it at each concurrency level. --hot-queries N limits
+the mix to N distinct queries, so concurrent duplicates show the effect of coalescing.
+Errors count non-200 responses, which for asgi are shed requests (503). Peak RSS is the sum
+over the server's processes.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from app import dataset_path, index_dir
+from python.joke_store import JokeStore
+from benchmarks.common import query_mix
+from benchmarks.load_test import (
+    backend_directory, environment, free_port, http_client, http_levels, process_peak_rss_mb, wait_until_ready,
+)
+
+
+def server_command(name, port, args):
+    if name == 'werkzeug':
+        return [sys.executable, "-m", "benchmarks.load_test", "--worker", "serve", "--dataset", dataset_path,
+                "--index-dir", index_dir, "--port", str(port), "--cache-size", "0"]
+    config = {'gunicorn': "gunicorn.conf.py", 'asgi': "gunicorn_asgi.conf.py"}[name]
+    return [sys.executable, "-m", "gunicorn", "-c", config]
+
+
+def process_tree(pid):
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            for child in f.read().split():
+                pids += process_tree(int(child))
+    except OSError:
+        pass
+    return pids
+
+
+def executor_events(port):
+    """joke_search_executor_events_total samples from one worker's /metrics."""
+    import http.client
+
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    connection.request("GET", "/metrics")
+    text = connection.getresponse().read().decode()
+    events = {}
+    for line in text.splitlines():
+        if line.startswith("joke_search_executor_events_total{"):
+            labels, value = line.rsplit(" ", 1)
+            events[labels.split('"')[1]] = int(float(value))
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", default="werkzeug,gunicorn,asgi")
+    parser.add_argument("--concurrency", default="1,8,32,64")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per concurrency level")
+    parser.add_argument("--queries", type=int, default=500, help="distinct queries in the mix")
+    parser.add_argument("--hot-queries", type=int, default=0, help="if set, only this many distinct queries")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="search threads per asgi worker")
+    parser.add_argument("--queue", type=int, default=64, help="admitted searches per asgi worker before 503")
+    parser.add_argument("--timeout", type=float, default=2.0, help="asgi per-request deadline in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+
+    workload = query_mix(JokeStore.from_csv(dataset_path), args.hot_queries or args.queries, seed=args.seed)
+    env = dict(
+        os.environ, JOKE_CACHE_SIZE="0", JOKE_INDEX_POLL_SECONDS="0", JOKE_LOG_SAMPLE_RATE="0",
+        JOKE_LOG_LEVEL="ERROR", WEB_CONCURRENCY=str(args.workers), JOKE_SEARCH_THREADS=str(args.threads),
+        JOKE_SEARCH_QUEUE=str(args.queue), JOKE_SEARCH_TIMEOUT=str(args.timeout),
+    )
+    report = {'environment': environment(), 'config': {
+        'servers': args.servers.split(","), 'concurrency': args.concurrency, 'requests': args.requests,
+        'queries': len(workload), 'workers': args.workers, 'threads': args.threads, 'queue': args.queue,
+        'timeout': args.timeout, 'seed': args.seed,
+    }, 'results': []}
+
+    for name in args.servers.split(","):
+        port = free_port()
+        env['JOKE_BIND'] = f"127.0.0.1:{port}"
+        server = subprocess.Popen(
+            server_command(name, port, args), cwd=backend_directory, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            ready_seconds = wait_until_ready(server, port)
+            runs = http_levels(http_client(port), workload, args, server.pid)
+            peak_mb = sum(process_peak_rss_mb(pid) for pid in process_tree(server.pid))
+            for run in runs:
+                report['results'].append(dict(run, server=name, ready_seconds=round(ready_seconds, 3)))
+            report['results'][-1]['server_peak_rss_mb'] = round(peak_mb, 1)
+            if name == 'asgi':
+                report['results'][-1]['executor_events_one_worker'] = executor_events(port)
+        finally:
+            server.terminate()
+            server.wait()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
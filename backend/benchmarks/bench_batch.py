@@ -0,0 +1,53 @@
+"""Throughput of POST /roast-it/batch against one GET /roast-it per query.
+
+    python -m benchmarks.bench_batch [--queries 512] [--batch-size 32]
+
+Uses the Flask test client against app.py, so it measures the app's own dataset and index.
+"""
+import argparse
+import contextlib
+import json
+import os
+import time
+from benchmarks.common import sample_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-n", type=int, default=5)
+    args = parser.parse_args()
+
+    from app import create_app
+    flask_app = create_app(preload=True)
+    client = flask_app.test_client()
+    joke_store = flask_app.extensions['joke_service'].current.store
+    queries = sample_queries(joke_store, args.queries)
+
+    # The routes still print per query; keep that cost but not the terminal noise
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        client.get("/roast-it", query_string={"query": queries[0]})
+        start = time.perf_counter()
+        for query in queries:
+            client.get("/roast-it", query_string={"query": query})
+        single_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(0, len(queries), args.batch_size):
+            items = [{"query": q, "top_n": args.top_n} for q in queries[i:i + args.batch_size]]
+            client.post("/roast-it/batch", json={"queries": items})
+        batch_seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        'corpus_size': len(joke_store),
+        'queries': len(queries),
+        'batch_size': args.batch_size,
+        'single_qps': round(len(queries) / single_seconds, 1),
+        'batch_qps': round(len(queries) / batch_seconds, 1),
+        'speedup': round(single_seconds / batch_seconds, 2),
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Cost of /joke/random, /categories and /debug/jokes against the old per-request DataFrame code.
+
+    python -m benchmarks.bench_browse [--size 100000] [--calls 2000]
+
+The legacy numbers time what the endpoints used to run on every request
+(jokes_df.sample(1).iloc[0].to_dict() and dropna().unique().tolist()). The new numbers
+time the JokeCatalog lookups and the endpoints through the Flask test client, including
+a revalidation that answers 304, and the one-off cost of building the catalog.
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.common import write_synthetic_dataset
+
+
+def per_call_us(fn, calls):
+    fn()
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return round((time.perf_counter() - start) / calls * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    from app import create_app
+    from build_index import build_index
+    from python.joke_catalog import JokeCatalog
+    from python.joke_service import JokeService
+    from python.log_utils import get_logger
+
+    get_logger('benchmark')
+    logging.getLogger('jokes').handlers[0].setStream(open(os.devnull, "w"))
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset_path = write_synthetic_dataset(os.path.join(tmp, 'dataset.csv'), args.size)
+        # Random clean labels stand in for the profanity model, which is not what is measured
+        jokes_df = pd.read_csv(dataset_path)
+        jokes_df['clean'] = np.random.default_rng(0).random(len(jokes_df)) < 0.8
+        jokes_df.to_csv(dataset_path, index=False)
+        index_dir = os.path.join(tmp, 'joke_index')
+        build_index(dataset_path, index_dir, 50)
+        service = JokeService(dataset_path, index_dir, cache_size=0, index_poll_seconds=0, log_sample_rate=0.0)
+        client = create_app(preload=True, service=service).test_client()
+        snapshot = service.current
+
+        start = time.perf_counter()
+        catalog = JokeCatalog(snapshot)
+        build_ms = (time.perf_counter() - start) * 1000.0
+        category = snapshot.store.categories[0]
+        etag = client.get("/categories").headers["ETag"]
+
+        legacy = {
+            'random': per_call_us(lambda: jokes_df.sample(1).iloc[0].to_dict(), args.calls),
+            'random_category_clean': per_call_us(
+                lambda: jokes_df[(jokes_df['category'] == category) & jokes_df['clean']].sample(1).iloc[0].to_dict(),
+                args.calls,
+            ),
+            'categories': per_call_us(lambda: jokes_df['category'].dropna().unique().tolist(), args.calls),
+        }
+        lookups = {
+            'random': per_call_us(lambda: snapshot.store.record(catalog.random_row()), args.calls),
+            'random_category_clean': per_call_us(
+                lambda: snapshot.store.record(catalog.random_row(category, clean=True)), args.calls
+            ),
+        }
+        endpoints = {
+            'GET /joke/random': per_call_us(lambda: client.get("/joke/random"), args.calls),
+            'GET /joke/random?category&clean=1': per_call_us(
+                lambda: client.get("/joke/random", query_string={"category": category, "clean": "1"}), args.calls
+            ),
+            'GET /categories': per_call_us(lambda: client.get("/categories"), args.calls),
+            'GET /categories (304)': per_call_us(
+                lambda: client.get("/categories", headers={"If-None-Match": etag}), args.calls
+            ),
+            'GET /debug/jokes': per_call_us(lambda: client.get("/debug/jokes"), args.calls),
+        }
+
+    print(json.dumps({
+        'jokes': args.size,
+        'catalog_build_ms': round(build_ms, 2),
+        'legacy_us': legacy,
+        'catalog_us': lookups,
+        'endpoint_us': endpoints,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
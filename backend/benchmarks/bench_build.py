@@ -0,0 +1,90 @@
+"""Wall time and peak memory of the streaming index build against the in-memory build.
+
+    python -m benchmarks.bench_build [--sizes 100000,400000] [--workers 4] [--chunk-size 50000]
+
+For each synthetic corpus size, both builds run in a fresh interpreter, so each peak RSS
+(VmHWM) is its own. The streaming build also reports its largest worker process. The
+indexes are then compared on known-item search (see eval_hybrid) in the default svd mode,
+to show the streamed SVD retrieves as well as TruncatedSVD.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.common import peak_rss_mb, write_synthetic_dataset
+
+backend_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(mode, dataset_path, index_dir, workers, chunk_size):
+    import logging
+    from python.log_utils import get_logger
+
+    get_logger('benchmark')
+    logging.getLogger('jokes').setLevel(logging.WARNING)
+    start = time.perf_counter()
+    if mode == 'memory':
+        from build_index import build_index
+        build_index(dataset_path, index_dir)
+    else:
+        from python.streaming_build import build_index_streaming
+        build_index_streaming(dataset_path, index_dir, workers=workers, chunk_size=chunk_size)
+    return {
+        'seconds': round(time.perf_counter() - start, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'largest_worker_rss_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024.0, 1),
+    }
+
+
+def retrieval_quality(dataset_path, index_dir, n_queries):
+    from benchmarks.common import load_ranker
+    from benchmarks.eval_hybrid import known_item_queries, relevance
+
+    joke_store, ranker = load_ranker(dataset_path, index_dir)
+    quality = {}
+    for name, queries in known_item_queries(joke_store, ranker, n_queries).items():
+        hit_rate, mrr = relevance(ranker, queries, 5)
+        quality[name] = {'hit@5': hit_rate, 'mrr@10': mrr}
+    return quality
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100000,400000")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200, help="known-item queries per set; 0 skips")
+    parser.add_argument("--mode", choices=['memory', 'streaming'], default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--dataset", help=argparse.SUPPRESS)
+    parser.add_argument("--index-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode, args.dataset, args.index_dir, args.workers, args.chunk_size)))
+        return
+
+    report = {'workers': args.workers, 'chunk_size': args.chunk_size, 'cpu_count': os.cpu_count(), 'runs': []}
+    for size in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            dataset_path = write_synthetic_dataset(os.path.join(tmp, 'dataset.csv'), size)
+            run = {'jokes': size, 'dataset_mb': round(os.path.getsize(dataset_path) / 2 ** 20, 1)}
+            for mode in ('memory', 'streaming'):
+                index_dir = os.path.join(tmp, mode)
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_build", "--mode", mode, "--dataset", dataset_path,
+                     "--index-dir", index_dir, "--workers", str(args.workers), "--chunk-size", str(args.chunk_size)],
+                    cwd=backend_directory, check=True, capture_output=True, text=True,
+                ).stdout
+                run[mode] = json.loads(output.strip().splitlines()[-1])
+                if args.queries:
+                    run[mode]['known_item'] = retrieval_quality(dataset_path, index_dir, args.queries)
+            report['runs'].append(run)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
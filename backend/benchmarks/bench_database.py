@@ -0,0 +1,161 @@
+"""Load and read throughput of MySQLDatabaseHandler against the old per-call connection code.
+
+    python -m benchmarks.bench_database [--rows 200000] [--script-rows 5000] [--url sqlite:///...]
+
+By default it runs against a SQLite file in a temporary directory. Pass --url to point it
+at a scratch MySQL database instead (its 'jokes' table is dropped and recreated).
+
+- load: an init.sql-style script of one INSERT per joke, run the old way (whole file read
+  and split, one autocommitted statement at a time on a connection that is never
+  returned) and with load_file_into_db (streamed, committed in batches). Then bulk_insert
+  (executemany in transactional batches) for all rows.
+- read: the whole table with query_selector (fetchall) and with stream_query chunks.
+  Python heap peaks come from a second, traced pass. copy_to_csv exports the table the
+  way build_index.py --from-db does.
+- leaks: how many old-style query_selector calls run before the pool is exhausted.
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+import warnings
+import pandas as pd
+from benchmarks.common import write_synthetic_dataset
+
+CREATE_TABLE = "CREATE TABLE jokes (id INTEGER, title TEXT, body TEXT, category TEXT, score INTEGER)"
+
+
+def legacy_query_executor(engine, queries):
+    """The old query_executor: a new connection per call, never closed, no transaction."""
+    conn = engine.connect()
+    for query in queries:
+        conn.execute(query)
+
+
+def legacy_query_selector(engine, query):
+    conn = engine.connect()
+    return conn.execute(query)
+
+
+def legacy_load_file(engine, file_path):
+    with open(file_path, "r") as sql_file:
+        legacy_query_executor(engine, list(filter(lambda x: x != '', sql_file.read().split(";\n"))))
+
+
+def sql_literal(value):
+    if pd.isna(value):
+        return "NULL"
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+def write_script(path, jokes_df):
+    with open(path, "w") as f:
+        f.write("DROP TABLE IF EXISTS jokes;\n" + CREATE_TABLE + ";\n")
+        for row in jokes_df.itertuples(index=False):
+            f.write(f"INSERT INTO jokes VALUES ({', '.join(sql_literal(value) for value in row)});\n")
+
+
+def rows_per_s(rows, seconds):
+    return round(rows / seconds) if seconds > 0 else None
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def traced_peak_mb(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(peak / 2 ** 20, 1)
+
+
+def reset_table(database):
+    database.query_executor(["DROP TABLE IF EXISTS jokes", CREATE_TABLE])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--script-rows", type=int, default=5000, help="rows in the INSERT script")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--url", default=None)
+    args = parser.parse_args()
+
+    from helpers.MySQLDatabaseHandler import MySQLDatabaseHandler
+    from python.log_utils import get_logger
+
+    get_logger('benchmark')
+    logging.getLogger('jokes').setLevel(logging.WARNING)
+    # The legacy functions use string execution, which SQLAlchemy 1.4 flags for 2.0
+    warnings.simplefilter('ignore', DeprecationWarning)
+    report = {'rows': args.rows, 'script_rows': args.script_rows}
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{os.path.join(tmp, 'jokes.db')}"
+        report['database'] = url.split(':')[0]
+        jokes_df = pd.read_csv(write_synthetic_dataset(os.path.join(tmp, 'dataset.csv'), args.rows))
+        script_path = os.path.join(tmp, 'jokes.sql')
+        write_script(script_path, jokes_df.head(args.script_rows))
+
+        database = MySQLDatabaseHandler(url=url)
+        load = {}
+        _, seconds = timed(lambda: legacy_load_file(database.engine, script_path))
+        load['legacy_script_rows_per_s'] = rows_per_s(args.script_rows, seconds)
+        database.close()
+        _, seconds = timed(lambda: database.load_file_into_db(script_path))
+        load['load_file_into_db_rows_per_s'] = rows_per_s(args.script_rows, seconds)
+        reset_table(database)
+        rows = jokes_df.astype(object).where(jokes_df.notna(), None).itertuples(index=False)
+        inserted, seconds = timed(lambda: database.bulk_insert('jokes', rows, columns=list(jokes_df.columns)))
+        load['bulk_insert_rows_per_s'] = rows_per_s(inserted, seconds)
+        report['load'] = load
+
+        query = "SELECT * FROM jokes"
+        read = {}
+        database.query_selector("SELECT count(*) FROM jokes")
+        _, seconds = timed(lambda: database.query_selector(query))
+        read['fetchall_rows_per_s'] = rows_per_s(args.rows, seconds)
+        read['fetchall_peak_mb'] = traced_peak_mb(lambda: database.query_selector(query))
+
+        def stream():
+            return sum(len(chunk) for chunk in database.stream_query(query, chunk_size=args.chunk_size))
+
+        streamed, seconds = timed(stream)
+        read['stream_rows_per_s'] = rows_per_s(streamed, seconds)
+        read['stream_peak_mb'] = traced_peak_mb(stream)
+        exported, seconds = timed(lambda: database.copy_to_csv(query, os.path.join(tmp, 'export.csv'),
+                                                               chunk_size=args.chunk_size))
+        read['copy_to_csv_rows_per_s'] = rows_per_s(exported, seconds)
+        report['read'] = read
+        database.close()
+
+        # The old selector keeps every result's connection checked out until garbage collection
+        leaky = MySQLDatabaseHandler(url=url, pool_size=5, max_overflow=10, pool_timeout=1)
+        results, calls = [], 0
+        try:
+            while calls < 100:
+                results.append(legacy_query_selector(leaky.engine, "SELECT 1"))
+                calls += 1
+        except Exception as e:
+            report['leaks'] = {'legacy_calls_before_exhaustion': calls, 'error': type(e).__name__}
+        del results
+        leaky.close()
+        pooled = MySQLDatabaseHandler(url=url, pool_size=5, max_overflow=10, pool_timeout=1)
+        for _ in range(1000):
+            pooled.query_selector("SELECT 1")
+        report.setdefault('leaks', {})['pool_after_1000_calls'] = pooled.pool_status()
+        pooled.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
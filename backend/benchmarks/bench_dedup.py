@@ -0,0 +1,144 @@
+"""Throughput and accuracy of near-duplicate removal, and what it saves in the index.
+
+    python -m benchmarks.bench_dedup [--size 500000] [--duplicate-share 0.2] [--skip-index]
+
+A synthetic corpus is written with a share of its rows turned into reposts of other
+jokes: lowercased or re-punctuated titles and one to three words of the body replaced or
+dropped. Each row remembers its source joke, so the script can count reposts the dedup
+stage missed and distinct jokes it merged by mistake.
+
+It then builds the index for the raw and the deduplicated corpus and compares their
+jokes, size on disk and build time. Finally it shows query-time diversification on the
+raw index: among the top 5 for each title query, how many results repost a better one.
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.common import write_synthetic_dataset, time_calls, latency_summary
+
+
+def with_reposts(jokes_df, duplicate_share, seed=0):
+    """Replace duplicate_share of the rows with lightly edited copies of other rows, then shuffle."""
+    rng = np.random.default_rng(seed)
+    jokes_df = jokes_df.assign(source=np.arange(len(jokes_df)))
+    n_reposts = int(len(jokes_df) * duplicate_share)
+    originals = len(jokes_df) - n_reposts
+    sources = rng.integers(0, originals, size=n_reposts)
+    reposts = jokes_df.iloc[sources].copy()
+    titles, bodies = [], []
+    for title, body in zip(reposts['title'], reposts['body']):
+        titles.append(title.lower() if rng.random() < 0.5 else title + rng.choice(["!", "?", "..."]))
+        words = body.split()
+        for _ in range(rng.integers(1, 4)):
+            position = int(rng.integers(0, len(words)))
+            if rng.random() < 0.5 and len(words) > 1:
+                del words[position]
+            else:
+                words[position] = words[int(rng.integers(0, len(words)))]
+        bodies.append(" ".join(words))
+    reposts['title'] = titles
+    reposts['body'] = bodies
+    reposts['id'] = np.arange(originals, len(jokes_df))
+    reposts['score'] = rng.integers(0, 5000, size=n_reposts)
+    jokes_df = pd.concat([jokes_df.iloc[:originals], reposts], ignore_index=True)
+    return jokes_df.iloc[rng.permutation(len(jokes_df))].reset_index(drop=True)
+
+
+def clustering_errors(labels, sources):
+    """(reposts left unmerged, distinct jokes wrongly merged) for cluster labels against true sources."""
+    pairs = pd.DataFrame({'label': labels, 'source': sources}).drop_duplicates()
+    # A source split over k clusters counts k - 1 missed merges; a cluster over k sources, k - 1 wrong ones
+    return len(pairs) - pairs['source'].nunique(), len(pairs) - pairs['label'].nunique()
+
+
+def directory_mb(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names) / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=500_000)
+    parser.add_argument("--duplicate-share", type=float, default=0.2)
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--diversity", type=float, default=0.9)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--skip-index", action="store_true")
+    args = parser.parse_args()
+
+    from build_index import build_index
+    from python.dedup import THRESHOLD, dedup_jokes, minhash_signatures, near_duplicate_clusters
+    from python.joke_store import joke_texts
+    from python.log_utils import get_logger
+
+    get_logger('benchmark')
+    logging.getLogger('jokes').setLevel(logging.WARNING)
+    threshold = args.threshold or THRESHOLD
+    report = {'jokes': args.size, 'duplicate_share': args.duplicate_share, 'threshold': threshold}
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = os.path.join(tmp, 'raw.csv')
+        write_synthetic_dataset(raw_path, args.size)
+        jokes_df = with_reposts(pd.read_csv(raw_path), args.duplicate_share)
+        jokes_df.to_csv(raw_path, index=False)
+        sources = jokes_df['source'].to_numpy()
+
+        start = time.perf_counter()
+        signatures = minhash_signatures(joke_texts(jokes_df))
+        hashed = time.perf_counter()
+        _, labels = near_duplicate_clusters(signatures, threshold=threshold)
+        clustered = time.perf_counter()
+        missed, wrong = clustering_errors(labels, sources)
+        deduped, stats = dedup_jokes(jokes_df, threshold=threshold)
+        report['dedup'] = {
+            'minhash_jokes_per_s': round(len(jokes_df) / (hashed - start)),
+            'lsh_cluster_jokes_per_s': round(len(jokes_df) / (clustered - hashed)),
+            'stage': stats,
+            'stage_jokes_per_s': round(len(jokes_df) / (stats['minhash_seconds'] + stats['cluster_seconds']
+                                                       + stats['merge_seconds'])),
+            'true_duplicates': int(len(jokes_df) - len(np.unique(sources))),
+            'missed_duplicates': missed,
+            'wrongly_merged': wrong,
+        }
+        deduped_path = os.path.join(tmp, 'deduped.csv')
+        deduped.drop(columns='source').to_csv(deduped_path, index=False)
+
+        if not args.skip_index:
+            from benchmarks.common import load_ranker
+
+            report['index'] = {}
+            for name, path in (('raw', raw_path), ('deduped', deduped_path)):
+                index_dir = os.path.join(tmp, f'{name}_index')
+                start = time.perf_counter()
+                build_index(path, index_dir)
+                report['index'][name] = {
+                    'jokes': int(len(pd.read_csv(path, usecols=['id']))),
+                    'build_seconds': round(time.perf_counter() - start, 1),
+                    'size_mb': round(directory_mb(index_dir), 1),
+                }
+            report['index']['size_reduction'] = round(
+                1 - report['index']['deduped']['size_mb'] / report['index']['raw']['size_mb'], 3
+            )
+
+            joke_store, ranker = load_ranker(raw_path, os.path.join(tmp, 'raw_index'))
+            queries = [title for title in jokes_df['title'].iloc[:args.queries]]
+            report['diversity'] = {}
+            for diversity in (None, args.diversity):
+                ranker.use_search_mode('svd', diversity=diversity)
+                repeated = 0
+                for query in queries:
+                    indices, _ = ranker.rank_indices(query, 5)
+                    repeated += len(indices) - len(np.unique(sources[indices]))
+                report['diversity'][str(diversity)] = {
+                    'reposts_in_top5_per_query': round(repeated / len(queries), 3),
+                    'latency': latency_summary(time_calls(ranker.rank_indices, [(query, 5) for query in queries])),
+                }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Filtered vs unfiltered search latency with JokeFilters pre-filtering.
+
+    python -m benchmarks.bench_filters [--size 200000] [--categories 40]
+
+Compares the old approach (top 5 over everything, then drop other categories) with
+scoring only the eligible rows, on a synthetic corpus with Zipf-distributed categories.
+"""
+import argparse
+import json
+import numpy as np
+from python.joke_filters import JokeFilters
+from python.vector_index import ExactIndex
+from benchmarks.common import random_unit_rows, time_calls, latency_summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--categories", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-n", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    names = [f"Category {i}" for i in range(args.categories)]
+    weights = 1.0 / np.arange(1, args.categories + 1)
+    categories = np.array(names, dtype=object)[rng.choice(args.categories, size=args.size, p=weights / weights.sum())]
+    filters = JokeFilters(categories, flags={'clean': rng.random(args.size) < 0.8})
+    index = ExactIndex(random_unit_rows(args.size, 100, seed=1))
+    queries = random_unit_rows(args.queries, 100, seed=2)
+    category_names = [names[i] for i in rng.integers(0, args.categories, size=args.queries)]
+
+    def post_filtered(query, category):
+        indices, scores = index.search(query, args.top_n)
+        return [i for i in indices if category.lower() in categories[i].lower()]
+
+    def pre_filtered(query, category, flags=()):
+        return index.search(query, args.top_n, rows=filters.eligible_rows(category, flags))[0]
+
+    jobs = list(zip(queries, category_names))
+    report = {
+        'corpus_size': args.size,
+        'categories': args.categories,
+        'unfiltered': latency_summary(time_calls(index.search, [(q, args.top_n) for q in queries])),
+        'post_filtered': latency_summary(time_calls(post_filtered, jobs)),
+        'post_filtered_mean_results': float(np.mean([len(post_filtered(q, c)) for q, c in jobs])),
+        'pre_filtered': latency_summary(time_calls(pre_filtered, jobs)),
+        'pre_filtered_mean_results': float(np.mean([len(pre_filtered(q, c)) for q, c in jobs])),
+        'pre_filtered_clean': latency_summary(time_calls(pre_filtered, [(q, c, ('clean',)) for q, c in jobs])),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
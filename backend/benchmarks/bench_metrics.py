@@ -0,0 +1,79 @@
+"""Overhead of the stage timers, request metrics and sampled logging on GET /roast-it.
+
+    python -m benchmarks.bench_metrics [--queries 400] [--rounds 6]
+
+Runs the same uncached queries through the Flask test client with the metrics registry
+enabled and disabled, alternating rounds to spread out machine noise, and times a bare
+stage_timer enter/exit.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import numpy as np
+from app import create_app, dataset_path, index_dir
+from python.joke_service import JokeService
+from python.log_utils import get_logger
+from python.metrics import REGISTRY, stage_timer
+from benchmarks.common import sample_queries, latency_summary
+
+
+def timer_cost_ns(n=200_000):
+    start = time.perf_counter()
+    for _ in range(n):
+        with stage_timer('benchmark'):
+            pass
+    return (time.perf_counter() - start) / n * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--rounds", type=int, default=6)
+    parser.add_argument("--log-sample-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    get_logger('benchmark')
+    logging.getLogger('jokes').handlers[0].setStream(open(os.devnull, "w"))
+    # No result cache, so every request runs the whole pipeline
+    service = JokeService(
+        dataset_path, index_dir, cache_size=0, index_poll_seconds=0, log_sample_rate=args.log_sample_rate
+    )
+    client = create_app(preload=True, service=service).test_client()
+    queries = sample_queries(service.current.store, args.queries)
+
+    latencies = {True: [], False: []}
+    for round_number in range(args.rounds):
+        for enabled in ((True, False) if round_number % 2 == 0 else (False, True)):
+            REGISTRY.enabled = enabled
+            for query in queries:
+                start = time.perf_counter()
+                client.get("/roast-it", query_string={"query": query})
+                latencies[enabled].append(time.perf_counter() - start)
+    REGISTRY.enabled = True
+
+    enabled_ms = np.mean(latencies[True]) * 1000.0
+    disabled_ms = np.mean(latencies[False]) * 1000.0
+    enabled_cost = timer_cost_ns()
+    REGISTRY.enabled = False
+    disabled_cost = timer_cost_ns()
+    REGISTRY.enabled = True
+
+    print(json.dumps({
+        'corpus_size': len(service.current.store),
+        'requests_per_mode': len(latencies[True]),
+        'log_sample_rate': args.log_sample_rate,
+        'metrics_on': latency_summary(latencies[True]),
+        'metrics_off': latency_summary(latencies[False]),
+        'mean_on_ms': round(enabled_ms, 4),
+        'mean_off_ms': round(disabled_ms, 4),
+        'overhead_per_request_us': round((enabled_ms - disabled_ms) * 1000.0, 1),
+        'overhead_pct': round((enabled_ms - disabled_ms) / disabled_ms * 100.0, 2),
+        'stage_timer_ns': round(enabled_cost),
+        'disabled_stage_timer_ns': round(disabled_cost),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
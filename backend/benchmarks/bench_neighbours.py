@@ -0,0 +1,155 @@
+"""Build time, memory and recall of the precomputed neighbour graph, and /joke/<id>/similar latency.
+
+    python -m benchmarks.bench_neighbours [--sizes 100000,200000] [--k 10] [--workers 4]
+    python -m benchmarks.bench_neighbours --sizes 0 --dataset dataset.csv --index-dir joke_index
+
+For each corpus size, random unit vectors are generated in a fresh interpreter and the
+graph is built there, so peak RSS (VmHWM) is the build's own; 'build_peak_mb' is the
+peak above the resident vectors, against the size of the dense N x N float32 score
+matrix the build avoids. Each run also reports:
+
+- recall@k of the graph against a brute-force scan for a sample of rows,
+- the grouped selection (neighbour_graph.tile_top_k) against plain top_k on one tile,
+- per-joke lookup latency from the graph against a vector search with the joke's vector.
+
+With --dataset and --index-dir the /joke/<id>/similar endpoint is also timed through the
+Flask test client, with the index's graph and with it switched off.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from benchmarks.common import current_rss_mb, latency_summary, peak_rss_mb, random_unit_rows, time_calls
+
+backend_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def graph_recall(graph, vectors, k, rows):
+    """Share of each sampled row's true top k (by exact float32 scan) found in its graph entry."""
+    found = 0
+    for row in rows:
+        scores = vectors @ vectors[row]
+        scores[row] = -np.inf
+        truth = np.argpartition(-scores, k)[:k]
+        found += len(np.intersect1d(graph.neighbours(row)[0], truth))
+    return round(found / (len(rows) * k), 4)
+
+
+def selection_speedup(vectors, k, repeats=3):
+    """Seconds to pick the top k of one (ROW_BLOCK x COLUMN_BLOCK) tile with top_k and tile_top_k."""
+    from python.neighbour_graph import COLUMN_BLOCK, ROW_BLOCK, tile_top_k
+    from python.svd_reducer import top_k
+
+    tile = vectors[:ROW_BLOCK] @ vectors[:COLUMN_BLOCK].T
+    timings = {}
+    for name, select in (('top_k', top_k), ('tile_top_k', tile_top_k)):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            selected = select(tile, k)
+        timings[name] = (time.perf_counter() - start) / repeats
+        timings[name + '_scores'] = np.sort(np.take_along_axis(tile, selected, axis=1), axis=1)
+    return {
+        'tile': [ROW_BLOCK, min(COLUMN_BLOCK, len(vectors))],
+        'matmul_ms': round(time_calls(lambda: vectors[:ROW_BLOCK] @ vectors[:COLUMN_BLOCK].T, [()]).mean() * 1000, 1),
+        'top_k_ms': round(timings['top_k'] * 1000, 1),
+        'tile_top_k_ms': round(timings['tile_top_k'] * 1000, 1),
+        'speedup': round(timings['top_k'] / timings['tile_top_k'], 1),
+        'same_scores': bool(np.array_equal(timings['top_k_scores'], timings['tile_top_k_scores'])),
+    }
+
+
+def measure(n_jokes, k, workers, n_sample):
+    from python.neighbour_graph import build_neighbour_graph
+    from python.vector_index import ExactIndex
+
+    vectors = random_unit_rows(n_jokes, 100, seed=1)
+    baseline_mb = current_rss_mb()
+    start = time.perf_counter()
+    graph = build_neighbour_graph(vectors, k, workers=workers)
+    seconds = time.perf_counter() - start
+    peak_mb = peak_rss_mb()
+
+    rows = np.random.default_rng(0).choice(n_jokes, min(n_sample, n_jokes), replace=False)
+    exact = ExactIndex(vectors)
+    return {
+        'jokes': n_jokes,
+        'k': k,
+        'seconds': round(seconds, 2),
+        'pairs_per_s': round(n_jokes * n_jokes / seconds),
+        'vectors_mb': round(vectors.nbytes / 2 ** 20, 1),
+        'build_peak_mb': round(peak_mb - baseline_mb, 1) if baseline_mb is not None else None,
+        'dense_matrix_mb': round(n_jokes * n_jokes * 4 / 2 ** 20, 1),
+        'graph_mb': round(graph.nbytes / 2 ** 20, 2),
+        'recall_at_k': graph_recall(graph, vectors, k, rows),
+        'selection': selection_speedup(vectors, k),
+        'lookup': {
+            'graph': latency_summary(time_calls(graph.neighbours, [(int(row), k) for row in rows])),
+            'vector_search': latency_summary(time_calls(exact.search, [(vectors[row], k + 1) for row in rows])),
+        },
+    }
+
+
+def endpoint_latency(dataset_path, index_dir, k, n_sample):
+    """p50/p95 of GET /joke/<id>/similar?k= for sampled jokes, with and without the index's graph."""
+    import logging
+    from app import create_app
+    from python.joke_service import JokeService
+    from python.log_utils import get_logger
+
+    get_logger('benchmark')
+    logging.getLogger('jokes').setLevel(logging.WARNING)
+    service = JokeService(dataset_path, index_dir, index_poll_seconds=0, log_sample_rate=0).load()
+    client = create_app(service=service).test_client()
+    store = service.current.store
+    rows = np.random.default_rng(0).choice(len(store), min(n_sample, len(store)), replace=False)
+    ids = [str(store.value('id', int(row)) if 'id' in store.columns else row) for row in rows]
+    urls = [(f"/joke/{joke_id}/similar?k={k}",) for joke_id in ids]
+    ranker = service.current.ranker
+    graph = ranker.neighbour_graph
+    latency = {'neighbour_graph': graph is not None}
+    if graph is not None:
+        latency['graph'] = latency_summary(time_calls(client.get, urls))
+    ranker.neighbour_graph = None
+    latency['vector_search'] = latency_summary(time_calls(client.get, urls))
+    ranker.neighbour_graph = graph
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100000,200000")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--sample", type=int, default=200, help="rows checked for recall and timed")
+    parser.add_argument("--dataset", default=None)
+    parser.add_argument("--index-dir", default=None)
+    parser.add_argument("--jokes", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.jokes:
+        import logging
+        from python.log_utils import get_logger
+
+        get_logger('benchmark')
+        logging.getLogger('jokes').setLevel(logging.WARNING)
+        print(json.dumps(measure(args.jokes, args.k, args.workers, args.sample)))
+        return
+
+    report = {'workers': args.workers, 'cpu_count': os.cpu_count(), 'runs': []}
+    for size in [int(s) for s in args.sizes.split(",") if int(s)]:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_neighbours", "--jokes", str(size), "--k", str(args.k),
+             "--workers", str(args.workers), "--sample", str(args.sample)],
+            cwd=backend_directory, check=True, capture_output=True, text=True,
+        ).stdout
+        report['runs'].append(json.loads(output.strip().splitlines()[-1]))
+    if args.dataset and args.index_dir:
+        report['endpoint'] = endpoint_latency(args.dataset, args.index_dir, args.k, args.sample)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
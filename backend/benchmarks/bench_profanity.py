@@ -0,0 +1,70 @@
+"""Profanity classification cost: per-joke calls vs one batched corpus pass, and per-request filtering.
+
+    python -m benchmarks.bench_profanity [--size 50000] [--chunk-size 10000]
+
+The old retrieve_jokes called profanity_check.predict([text]) for every candidate joke on
+every request. Now the corpus is scored once in chunks and requests only look up the
+precomputed 'clean' mask through JokeFilters.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from python.joke_store import JokeStore
+from python.profanity_filter import profanity_scorer, score_clean
+from benchmarks.common import time_calls, latency_summary, write_synthetic_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=50_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--sample", type=int, default=500, help="jokes scored one call at a time")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        joke_store = JokeStore.from_csv(write_synthetic_dataset(os.path.join(tmp, 'dataset.csv'), args.size))
+    texts = [joke_store.text(i) for i in range(len(joke_store))]
+    scorer = profanity_scorer()
+
+    per_joke = time_calls(lambda text: scorer([text]), [(text,) for text in texts[:args.sample]])
+    start = time.perf_counter()
+    clean = score_clean(texts, chunk_size=args.chunk_size, scorer=scorer)
+    batched_seconds = time.perf_counter() - start
+    sample_clean = np.array([scorer([text])[0] < 0.5 for text in texts[:args.sample]])
+
+    filters = joke_store.filters
+    filters.set_flag('clean', clean)
+    rng = np.random.default_rng(0)
+    categories = [filters.names[i] for i in rng.integers(0, len(filters.names), size=args.queries)]
+    jobs = [(category, ('clean',)) for category in categories]
+    cold = []
+    for category, flags in jobs:
+        filters._cache.clear()
+        start = time.perf_counter()
+        filters.eligible_rows(category, flags)
+        cold.append(time.perf_counter() - start)
+    mean_candidates = float(np.mean([len(filters.eligible_rows(category)) for category in categories]))
+
+    report = {
+        'corpus_size': len(texts),
+        'scorer': getattr(scorer, '__module__', '') + '.' + scorer.__name__,
+        'per_joke_call': latency_summary(per_joke),
+        'per_joke_corpus_estimate_s': round(float(per_joke.mean()) * len(texts), 2),
+        'batched_corpus_s': round(batched_seconds, 3),
+        'batched_per_joke_ms': round(batched_seconds / max(len(texts), 1) * 1000.0, 5),
+        'batched_matches_per_joke': bool(np.array_equal(sample_clean, clean[:args.sample])),
+        'clean_share': round(float(clean.mean()), 4) if len(clean) else None,
+        'old_request_estimate_ms': round(mean_candidates * float(per_joke.mean()) * 1000.0, 2),
+        'mean_category_candidates': mean_candidates,
+        'request_filter_cold': latency_summary(cold),
+        'request_filter_cached': latency_summary(time_calls(filters.eligible_rows, jobs)),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
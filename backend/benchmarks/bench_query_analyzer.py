@@ -0,0 +1,109 @@
+"""Check the compiled QueryAnalyzer against the original QueryProcessor steps and compare throughput.
+
+    python -m benchmarks.bench_query_analyzer [--queries 20000]
+
+"original" is the old QueryProcessor path with the regex-based preprocess, "reference" the
+same loops with the current preprocess. Equivalence is checked on every pair of keywords
+(joined with and without spaces, so keywords overlap and straddle each other), random
+keyword soups with mixed case and punctuation, a realistic query mix, and keyword tables
+where category and sentiment keywords start at the same position or are prefixes of one
+another. Exits non-zero if any output differs.
+"""
+import argparse
+import itertools
+import json
+import re
+import sys
+import time
+import numpy as np
+from python.query_processing import QueryProcessor
+from python.text_utils import preprocess
+from benchmarks.common import sample_queries
+from python.joke_store import JokeStore
+
+
+def legacy_preprocess(text):
+    """text_utils.preprocess as it was before it switched to str.translate."""
+    text = text.lower()
+    text = re.sub(r"[.,\/#!$%\^&\*;:{}=\-_`~()@\[\]]", " ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+def adversarial_processor():
+    """A processor whose keyword tables overlap across and within groups."""
+    processor = QueryProcessor()
+    processor.humor_categories = {
+        'dad': ['dad', 'dark dad', 'pun'],
+        'pun': ['pun', 'punch', 'puns'],
+        'dark': ['dark', 'da'],
+    }
+    processor.sentiment_keywords = {
+        'edgy': ['darker', 'punchline'],
+        'dark': ['dark', 'dad'],
+        'mild': ['d', 'a.b'],
+    }
+    processor.rebuild_analyzer()
+    return processor
+
+
+def keyword_queries(processor, n_random, rng):
+    keywords = [kw for kws in processor.humor_categories.values() for kw in kws]
+    keywords += [kw for kws in processor.sentiment_keywords.values() for kw in kws]
+    keywords += processor.joke_subjects + ["jokes", "about", "the", "UPGRADE", "a-b", "!!", ""]
+    queries = [f"{a} {b}" for a, b in itertools.product(keywords, repeat=2)]
+    queries += [a + b for a, b in itertools.product(keywords, repeat=2)]
+    for _ in range(n_random):
+        words = rng.choice(keywords, size=rng.integers(0, 7))
+        text = rng.choice([" ", "", "-", ", "]).join(words)
+        queries.append(text.upper() if rng.random() < 0.2 else text)
+    return queries
+
+
+def mismatches(processor, queries):
+    return [q for q in queries if processor.process_query(q) != processor.process_query_reference(q)]
+
+
+def throughput(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    processor = QueryProcessor()
+    realistic = sample_queries(JokeStore.empty(), 200, seed=0)
+    queries = keyword_queries(processor, 5000, rng) + realistic
+    checks = {
+        'preprocess': [q for q in queries if preprocess(q) != legacy_preprocess(q)],
+        'default_tables': mismatches(processor, queries),
+        'adversarial_tables': mismatches(adversarial_processor(), keyword_queries(adversarial_processor(), 5000, rng)),
+    }
+
+    bench = [realistic[i] for i in rng.integers(0, len(realistic), size=args.queries)]
+    original = QueryProcessor()
+    original.preprocess_query = legacy_preprocess
+    original_qps = throughput(original.process_query_reference, bench)
+    old_qps = throughput(processor.process_query_reference, bench)
+    new_qps = throughput(processor.process_query, bench)
+    report = {
+        'mismatches': {name: len(queries) for name, queries in checks.items()},
+        'mismatch_examples': {name: queries[:5] for name, queries in checks.items() if queries},
+        'original_queries_per_s': round(original_qps),
+        'reference_queries_per_s': round(old_qps),
+        'analyzer_queries_per_s': round(new_qps),
+        'speedup_vs_original': round(new_qps / original_qps, 2),
+    }
+    print(json.dumps(report, indent=2))
+    if any(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
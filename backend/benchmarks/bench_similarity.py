@@ -0,0 +1,60 @@
+"""Micro-benchmark SVDReducer.compute_similarity against the previous cosine_similarity + argsort path.
+
+    python -m benchmarks.bench_similarity [--sizes 10000 100000 1000000] [--queries 200]
+"""
+import argparse
+import json
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+from python.svd_reducer import SVDReducer
+from benchmarks.common import random_unit_rows, time_calls, latency_summary
+
+
+def legacy_similarity(query_reduced, corpus_reduced, top_n=5):
+    """The pre-argpartition scoring path, kept here as the baseline."""
+    similarities = cosine_similarity(query_reduced, corpus_reduced).flatten()
+    ranked_indices = similarities.argsort()[::-1][:top_n]
+    return ranked_indices, similarities
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dims", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=64, help="queries per call for the batched run")
+    args = parser.parse_args()
+
+    reducer = SVDReducer(n_components=args.dims)
+    results = []
+    for size in args.sizes:
+        corpus32 = random_unit_rows(size, args.dims, seed=1)
+        corpus64 = corpus32.astype(np.float64)
+        queries = random_unit_rows(args.queries, args.dims, seed=2)
+
+        legacy = time_calls(legacy_similarity, [(q[None, :].astype(np.float64), corpus64, args.top_n) for q in queries])
+        single = time_calls(reducer.compute_similarity, [(q, corpus32, args.top_n) for q in queries])
+        batches = [(queries[i:i + args.batch], corpus32, args.top_n) for i in range(0, len(queries), args.batch)]
+        batched = time_calls(reducer.compute_similarity, batches, warmup=1)
+
+        # Same top-k as the baseline, up to float32 rounding on near-ties
+        agree = np.mean([
+            set(legacy_similarity(q[None, :].astype(np.float64), corpus64, args.top_n)[0])
+            == set(reducer.compute_similarity(q, corpus32, args.top_n)[0])
+            for q in queries[:20]
+        ])
+
+        results.append({
+            'corpus_size': size,
+            'legacy': latency_summary(legacy),
+            'top_k': latency_summary(single),
+            'top_k_batched_per_query': latency_summary(batched / args.batch),
+            'top_k_agreement': float(agree),
+        })
+        print(json.dumps(results[-1]))
+        del corpus32, corpus64
+
+
+if __name__ == "__main__":
+    main()
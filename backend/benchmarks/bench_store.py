@@ -0,0 +1,74 @@
+"""Startup time and memory of JokeStore against the old DataFrame + iterrows + joke_data_map load.
+
+    python -m benchmarks.bench_store [--size 200000] [--dataset path/to/dataset.csv]
+
+Each approach runs in a fresh interpreter so peak RSS is not shared between them.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.common import write_synthetic_dataset, peak_rss_mb, current_rss_mb
+
+
+def load_legacy(dataset_path):
+    """The pre-JokeStore startup path from app.py."""
+    import pandas as pd
+    jokes_df = pd.read_csv(dataset_path)
+    joke_texts = []
+    joke_data_map = {}
+    for idx, row in jokes_df.iterrows():
+        joke_text = f"{row.get('title', '')} {row.get('body', '')}".strip()
+        joke_texts.append(joke_text)
+        joke_data_map[joke_text] = row.to_dict()
+    return jokes_df, joke_texts, joke_data_map
+
+
+def load_store(dataset_path):
+    from python.joke_store import JokeStore
+    return JokeStore.from_csv(dataset_path)
+
+
+def measure(mode, dataset_path):
+    import pandas  # noqa: F401 -- import cost is common to both paths
+    baseline = current_rss_mb()
+    start = time.perf_counter()
+    loaded = load_legacy(dataset_path) if mode == 'legacy' else load_store(dataset_path)
+    seconds = time.perf_counter() - start
+    return {
+        'mode': mode,
+        'seconds': round(seconds, 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'retained_rss_mb': round(current_rss_mb() - baseline, 1),
+        'rows': len(loaded[1]) if mode == 'legacy' else len(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--dataset", default=None)
+    parser.add_argument("--mode", choices=['legacy', 'store'], default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode, args.dataset)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset_path = args.dataset or write_synthetic_dataset(os.path.join(tmp, 'dataset.csv'), args.size)
+        report = {'dataset_mb': round(os.path.getsize(dataset_path) / (1024.0 * 1024.0), 1)}
+        for mode in ('legacy', 'store'):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_store", "--mode", mode, "--dataset", dataset_path],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            report[mode] = json.loads(output.strip().splitlines()[-1])
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
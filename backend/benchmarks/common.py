@@ -0,0 +1,162 @@
+"""Shared helpers for the scripts in this folder.
+
+Run benchmarks from the backend folder as modules, e.g. `python -m benchmarks.bench_similarity`,
+so the `python.` imports used by the app resolve.
+"""
+import os
+import time
+import numpy as np
+
+
+def random_unit_rows(n_rows, n_dims, seed=0, dtype=np.float32):
+    """Return an (n_rows, n_dims) matrix of random L2-normalized rows."""
+    rng = np.random.default_rng(seed)
+    matrix = rng.standard_normal((n_rows, n_dims), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix.astype(dtype, copy=False)
+
+
+def time_calls(fn, args_list, warmup=3):
+    """Call fn(*args) for each args tuple and return per-call latencies in seconds."""
+    for args in args_list[:warmup]:
+        fn(*args)
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+def latency_summary(latencies):
+    """Summarize latencies (seconds) as milliseconds percentiles."""
+    latencies = np.asarray(latencies) * 1000.0
+    return {
+        'count': int(latencies.size),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 4),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 4),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 4),
+    }
+
+
+def load_ranker(dataset_path, index_dir=None, **ranker_params):
+    """Load the real dataset as a JokeStore and its ranker, from the prebuilt index when it is current."""
+    from python.joke_index import dataset_hash
+    from python.joke_ranker import JokeRanker
+    from python.joke_store import JokeStore
+
+    joke_store = JokeStore.from_csv(dataset_path)
+    if index_dir is not None:
+        try:
+            return joke_store, JokeRanker.from_index(joke_store.texts, index_dir, dataset_hash(dataset_path), **ranker_params)
+        except (OSError, ValueError) as e:
+            print(f"Index unavailable ({e}), fitting ranker")
+    return joke_store, JokeRanker(joke_store.texts, **ranker_params)
+
+
+def sample_queries(joke_store, n_queries, seed=0):
+    """Build a realistic query mix: subject/category prompts plus titles of real jokes."""
+    from python.query_processing import QueryProcessor
+
+    processor = QueryProcessor()
+    rng = np.random.default_rng(seed)
+    templates = ["jokes about {}", "funny {} jokes", "tell me a {} joke", "{} humor"]
+    topics = processor.joke_subjects + [kw for kws in processor.humor_categories.values() for kw in kws]
+    queries = [templates[i % len(templates)].format(topic) for i, topic in enumerate(topics)]
+    if len(joke_store):
+        rows = rng.integers(0, len(joke_store), size=max(0, n_queries - len(queries)))
+        queries += [joke_store.value('title', i) or joke_store.text(i)[:60] for i in rows]
+    return [queries[i] for i in rng.permutation(len(queries))[:n_queries]]
+
+
+def query_mix(joke_store, n_queries, seed=0, category_share=0.2):
+    """Return n_queries (query, category) pairs shaped like real /roast-it traffic.
+
+    Half ask for a subject from QueryProcessor.joke_subjects, a fifth combine a humor
+    category keyword with a subject, a tenth add a sentiment ('clean jokes about work') and
+    the rest quote the title of a joke in the corpus. A category_share of queries also
+    filter on one of the corpus categories.
+    """
+    from python.query_processing import QueryProcessor
+
+    processor = QueryProcessor()
+    rng = np.random.default_rng(seed)
+    subjects = processor.joke_subjects
+    humor = [kw for kws in processor.humor_categories.values() for kw in kws]
+    sentiments = [kw for kws in processor.sentiment_keywords.values() for kw in kws]
+    templates = ["jokes about {}", "funny {} jokes", "tell me a {} joke", "{} humor"]
+    categories = joke_store.categories
+
+    mix = []
+    for _ in range(n_queries):
+        kind = rng.random()
+        subject = subjects[rng.integers(len(subjects))]
+        if kind < 0.5 or not len(joke_store):
+            query = templates[rng.integers(len(templates))].format(subject)
+        elif kind < 0.7:
+            query = f"{humor[rng.integers(len(humor))]} about {subject}"
+        elif kind < 0.8:
+            query = f"{sentiments[rng.integers(len(sentiments))]} jokes about {subject}"
+        else:
+            row = int(rng.integers(len(joke_store)))
+            query = joke_store.value('title', row) or joke_store.text(row)[:60]
+        category = categories[rng.integers(len(categories))] if categories and rng.random() < category_share else ""
+        mix.append((query, category))
+    return mix
+
+
+def write_synthetic_dataset(path, n_jokes, seed=0, n_categories=30):
+    """Write a dataset.csv-shaped corpus of n_jokes synthetic jokes to path."""
+    import pandas as pd
+    from python.query_processing import QueryProcessor
+
+    rng = np.random.default_rng(seed)
+    syllables = np.array(["ka", "lo", "mi", "ra", "te", "zu", "pe", "no", "vi", "sa", "gu", "do", "be", "fi"])
+    invented = ["".join(rng.choice(syllables, size=rng.integers(2, 4))) for _ in range(20_000)]
+    vocabulary = np.array(QueryProcessor().joke_subjects + invented)
+    # Zipf-like word frequencies, so a few words are common and most are rare
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    weights /= weights.sum()
+
+    def sentences(n, low, high):
+        lengths = rng.integers(low, high, size=n)
+        words = vocabulary[rng.choice(len(vocabulary), size=int(lengths.sum()), p=weights)]
+        bounds = np.concatenate(([0], np.cumsum(lengths)))
+        return [" ".join(words[bounds[i]:bounds[i + 1]]) for i in range(n)]
+
+    categories = np.array([f"Category {i}" for i in range(n_categories)], dtype=object)
+    category_weights = 1.0 / np.arange(1, n_categories + 1)
+    pd.DataFrame({
+        'id': np.arange(n_jokes),
+        'title': sentences(n_jokes, 3, 10),
+        'body': sentences(n_jokes, 10, 60),
+        'category': categories[rng.choice(n_categories, size=n_jokes, p=category_weights / category_weights.sum())],
+        'score': rng.integers(0, 5000, size=n_jokes),
+    }).to_csv(path, index=False)
+    return path
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB.
+
+    Reads VmHWM on Linux, because ru_maxrss survives fork + exec and would report the
+    parent's peak for benchmark subprocesses.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def current_rss_mb():
+    """Current resident set size of this process in MiB, or None off Linux."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024.0)
+    except OSError:
+        return None
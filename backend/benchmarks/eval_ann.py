@@ -0,0 +1,81 @@
+"""Recall@k vs latency of the IVF vector index against the exact scan.
+
+    python -m benchmarks.eval_ann [--dataset dataset.csv] [--nprobe 1 2 4 8 16 32]
+    python -m benchmarks.eval_ann --synthetic 1000000
+
+With --synthetic N the corpus and queries are random unit vectors instead of the real dataset.
+"""
+import argparse
+import json
+import os
+import time
+from functools import partial
+import numpy as np
+from python.vector_index import ExactIndex, IVFIndex
+from python.svd_reducer import top_k
+from benchmarks.common import load_ranker, sample_queries, random_unit_rows, time_calls, latency_summary
+
+backend_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def recall_at_k(approx, exact):
+    """Mean fraction of the exact top-k found by the approximate search."""
+    return float(np.mean([len(set(a) & set(e)) / max(len(e), 1) for a, e in zip(approx, exact)]))
+
+
+def scanned_fraction(index, queries, nprobe):
+    """Mean fraction of the corpus an IVF search scores per query."""
+    probes = top_k(queries @ index.centroids.T, min(nprobe, index.n_lists))
+    sizes = np.diff(index.offsets)
+    return float(np.mean(sizes[probes].sum(axis=1)) / len(index))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dataset", default=os.path.join(backend_directory, 'dataset.csv'))
+    parser.add_argument("--index-dir", default=os.path.join(backend_directory, 'joke_index'))
+    parser.add_argument("--synthetic", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = random_unit_rows(args.synthetic, 100, seed=1)
+        queries = random_unit_rows(args.queries, 100, seed=2)
+    else:
+        joke_store, ranker = load_ranker(args.dataset, args.index_dir)
+        vectors = ranker.joke_reduced
+        queries = ranker.embed_queries(sample_queries(joke_store, args.queries))
+        # Queries with no known terms embed to zero and match nothing in either backend
+        queries = queries[np.linalg.norm(queries, axis=1) > 0]
+
+    exact = ExactIndex(vectors)
+    start = time.perf_counter()
+    ivf = IVFIndex(vectors, n_lists=args.n_lists)
+    build_seconds = time.perf_counter() - start
+
+    exact_top = [exact.search(q, args.top_n)[0] for q in queries]
+    report = {
+        'corpus_size': len(exact),
+        'queries': len(queries),
+        'top_n': args.top_n,
+        'ivf_lists': ivf.n_lists,
+        'ivf_build_seconds': round(build_seconds, 3),
+        'exact': latency_summary(time_calls(exact.search, [(q, args.top_n) for q in queries])),
+        'ivf': [],
+    }
+    for nprobe in args.nprobe:
+        approx_top = [ivf.search(q, args.top_n, nprobe=nprobe)[0] for q in queries]
+        report['ivf'].append({
+            'nprobe': nprobe,
+            'recall_at_k': round(recall_at_k(approx_top, exact_top), 4),
+            'scanned_fraction': round(scanned_fraction(ivf, queries, nprobe), 4),
+            **latency_summary(time_calls(partial(ivf.search, nprobe=nprobe), [(q, args.top_n) for q in queries])),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
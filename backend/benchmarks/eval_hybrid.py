@@ -0,0 +1,115 @@
+"""Relevance and latency of hybrid (BM25 candidates + SVD rerank) search against pure SVD search.
+
+    python -m benchmarks.eval_hybrid [--dataset dataset.csv] [--weights 0 0.3 0.5 0.7 1]
+        [--candidates 100] [--queries 500]
+
+There are no relevance labels, so relevance is measured as known-item search over the
+dataset: each query is built from one joke and should find that joke.
+
+- title: the joke's title.
+- rare_terms: the joke's two highest-idf terms, the names and rare words that the SVD space
+  blurs together.
+- fragment: six consecutive words from the joke body.
+
+For each query set and mode the script reports hit@k and MRR@10 for the target joke, plus
+per-query latency. It also times the pruned and exhaustive BM25 stage on its own (they
+return identical results).
+"""
+import argparse
+import json
+import os
+import numpy as np
+from benchmarks.common import load_ranker, time_calls, latency_summary
+
+backend_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def known_item_queries(joke_store, ranker, n_queries, seed=0):
+    """Return {query set: [(query, target row)]} built from randomly chosen jokes."""
+    rng = np.random.default_rng(seed)
+    idf = ranker.vectorizer.idf_
+    vocabulary = ranker.vectorizer.get_feature_names_out()
+    rows = rng.permutation(len(joke_store))
+    sets = {'title': [], 'rare_terms': [], 'fragment': []}
+    for row in rows:
+        row = int(row)
+        title = joke_store.value('title', row)
+        if len(sets['title']) < n_queries and title and len(title.split()) >= 2:
+            sets['title'].append((title, row))
+        terms = ranker.term_counts([joke_store.text(row).lower()]).indices
+        if len(sets['rare_terms']) < n_queries and len(terms) >= 2:
+            rare = terms[np.argsort(-idf[terms])[:2]]
+            sets['rare_terms'].append((" ".join(vocabulary[rare]), row))
+        words = (joke_store.value('body', row) or "").split()
+        if len(sets['fragment']) < n_queries and len(words) >= 12:
+            start = int(rng.integers(0, len(words) - 6))
+            sets['fragment'].append((" ".join(words[start:start + 6]), row))
+        if all(len(queries) >= n_queries for queries in sets.values()):
+            break
+    return sets
+
+
+def relevance(ranker, queries, top_n):
+    """hit@top_n and MRR@10 of the target row for each (query, target) pair."""
+    hits, reciprocal_ranks = [], []
+    for query, target in queries:
+        indices, _ = ranker.rank_indices(query, max(top_n, 10))
+        ranks = np.flatnonzero(np.asarray(indices) == target)
+        rank = int(ranks[0]) + 1 if ranks.size else None
+        hits.append(rank is not None and rank <= top_n)
+        reciprocal_ranks.append(1.0 / rank if rank is not None and rank <= 10 else 0.0)
+    return round(float(np.mean(hits)), 4), round(float(np.mean(reciprocal_ranks)), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=os.path.join(backend_directory, 'dataset.csv'))
+    parser.add_argument("--index-dir", default=os.path.join(backend_directory, 'joke_index'))
+    parser.add_argument("--queries", type=int, default=500, help="queries per query set")
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=100)
+    parser.add_argument("--weights", type=float, nargs="+", default=[0.0, 0.3, 0.5, 0.7, 1.0])
+    args = parser.parse_args()
+
+    joke_store, ranker = load_ranker(args.dataset, args.index_dir)
+    if ranker.joke_tf is None:
+        raise SystemExit("The index has no postings; rebuild it with build_index.py")
+    query_sets = known_item_queries(joke_store, ranker, args.queries)
+
+    modes = [('svd', None)] + [('hybrid', weight) for weight in args.weights]
+    results = []
+    for name, queries in query_sets.items():
+        for mode, weight in modes:
+            if mode == 'hybrid':
+                ranker.use_search_mode('hybrid', candidates=args.candidates, svd_weight=weight)
+            else:
+                ranker.use_search_mode('svd')
+            hit_rate, mrr = relevance(ranker, queries, args.top_n)
+            latencies = time_calls(ranker.rank_indices, [(query, args.top_n) for query, _ in queries])
+            results.append({
+                'query_set': name, 'mode': mode, 'svd_weight': weight,
+                f'hit@{args.top_n}': hit_rate, 'mrr@10': mrr, 'latency': latency_summary(latencies),
+            })
+
+    inverted_index = ranker.inverted_index
+    term_lists = [ranker.vectorizer.transform([query]).indices for queries in query_sets.values() for query, _ in queries]
+    stage_one = {
+        'pruned': latency_summary(time_calls(inverted_index.search, [(terms, args.candidates) for terms in term_lists])),
+        'exhaustive': latency_summary(time_calls(
+            lambda terms, k: inverted_index.search(terms, k, prune=False), [(terms, args.candidates) for terms in term_lists]
+        )),
+    }
+
+    print(json.dumps({
+        'jokes': len(joke_store),
+        'terms': inverted_index.n_terms,
+        'postings': int(inverted_index.tf.nnz),
+        'queries_per_set': {name: len(queries) for name, queries in query_sets.items()},
+        'candidates': args.candidates,
+        'results': results,
+        'bm25_stage': stage_one,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
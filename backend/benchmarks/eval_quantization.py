@@ -0,0 +1,97 @@
+"""Memory, scan throughput and recall@k of the compressed vector indexes against an exact float64 scan.
+
+    python -m benchmarks.eval_quantization [--dataset dataset.csv] [--index-dir joke_index] [--rerank 0 8]
+    python -m benchmarks.eval_quantization --synthetic 1000000
+
+The reference ranking is an exact scan over a float64 copy of joke_reduced, which is how
+SVDReducer used to hold it. The stored matrix is float32 ('exact' below). For every
+backend (sq8, fp16, pq) and rerank setting the script reports the bytes held for
+scanning, build time, single-query latency, batched throughput and recall@k against the
+float64 ranking. With --synthetic N the corpus and queries are random unit vectors, which
+is the hardest case for product quantization.
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+from python.svd_reducer import dot_top_k
+from python.vector_index import ExactIndex, make_vector_index
+from benchmarks.common import load_ranker, sample_queries, random_unit_rows, time_calls, latency_summary
+from benchmarks.eval_ann import recall_at_k
+
+backend_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def batch_queries_per_s(index, queries, top_n, batch_size):
+    batches = [queries[start:start + batch_size] for start in range(0, len(queries), batch_size)]
+    index.search(batches[0], top_n)
+    start = time.perf_counter()
+    for batch in batches:
+        index.search(batch, top_n)
+    return round(len(queries) / (time.perf_counter() - start), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=os.path.join(backend_directory, 'dataset.csv'))
+    parser.add_argument("--index-dir", default=os.path.join(backend_directory, 'joke_index'))
+    parser.add_argument("--synthetic", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--backends", nargs="+", default=['sq8', 'fp16', 'pq'])
+    parser.add_argument("--rerank", type=int, nargs="+", default=[0, 8])
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = random_unit_rows(args.synthetic, 100, seed=1)
+        queries = random_unit_rows(args.queries, 100, seed=2)
+    else:
+        joke_store, ranker = load_ranker(args.dataset, args.index_dir)
+        vectors = ranker.joke_reduced
+        queries = ranker.embed_queries(sample_queries(joke_store, args.queries))
+        queries = queries[np.linalg.norm(queries, axis=1) > 0]
+
+    reference = np.asarray(vectors, dtype=np.float64)
+    exact_top = [dot_top_k(q.astype(np.float64), reference, args.top_n)[0] for q in queries]
+    exact = ExactIndex(vectors)
+    report = {
+        'corpus_size': len(exact),
+        'dimensions': vectors.shape[1],
+        'queries': len(queries),
+        'top_n': args.top_n,
+        'float64_mb': round(reference.nbytes / 2 ** 20, 1),
+        'results': [{
+            'backend': 'exact',
+            'mb': round(vectors.nbytes / 2 ** 20, 1),
+            'recall_at_k': round(recall_at_k([exact.search(q, args.top_n)[0] for q in queries], exact_top), 4),
+            'latency': latency_summary(time_calls(exact.search, [(q, args.top_n) for q in queries])),
+            'batch_queries_per_s': batch_queries_per_s(exact, queries, args.top_n, args.batch_size),
+        }],
+    }
+    del reference
+
+    for backend in args.backends:
+        start = time.perf_counter()
+        index = make_vector_index(backend, vectors)
+        build_seconds = time.perf_counter() - start
+        for rerank in args.rerank:
+            index.rerank = rerank
+            report['results'].append({
+                'backend': backend,
+                'rerank': rerank,
+                'mb': round(index.nbytes / 2 ** 20, 1),
+                'memory_reduction_vs_float64': round(report['float64_mb'] / (index.nbytes / 2 ** 20), 1),
+                'build_seconds': round(build_seconds, 2),
+                'recall_at_k': round(recall_at_k([index.search(q, args.top_n)[0] for q in queries], exact_top), 4),
+                'latency': latency_summary(time_calls(index.search, [(q, args.top_n) for q in queries])),
+                'batch_queries_per_s': batch_queries_per_s(index, queries, args.top_n, args.batch_size),
+            })
+        del index
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Check that importing app.py stays cheap, using `python -X importtime`.
+
+    python -m benchmarks.import_budget [--budget-ms 400] [--runs 5]
+
+Fails (exit status 1) if the median cumulative import time of `app` exceeds the budget, or
+if importing it pulls in any module that should only load with the index (pandas,
+scikit-learn, scipy, nltk). Also reports the slowest top-level imports and, with
+--preload, how long create_app(preload=True) takes to become ready.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Modules that belong in JokeService.load(), not in `import app`
+HEAVY_MODULES = ('pandas', 'sklearn', 'scipy', 'nltk')
+
+backend_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module):
+    """Run `python -X importtime -c "import <module>"` and return [(name, self_us, cumulative_us, depth)].
+
+    Entries are in the order Python prints them: each module after everything it imported.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend_directory, capture_output=True, text=True, check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return times
+
+
+def direct_imports(times, module):
+    """The depth-1 imports made by module itself, not by interpreter startup (site)."""
+    end = max(i for i, entry in enumerate(times) if entry[0] == module and entry[3] == 0)
+    start = max([i for i in range(end) if times[i][3] == 0], default=-1) + 1
+    return [(name, cumulative) for name, _, cumulative, depth in times[start:end] if depth == 1]
+
+
+def preload_seconds():
+    code = (
+        "import time; start = time.perf_counter(); import app; "
+        "app.create_app(preload=True); print(time.perf_counter() - start)"
+    )
+    env = dict(os.environ, JOKE_INDEX_POLL_SECONDS="0")
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=backend_directory, capture_output=True, text=True, check=True, env=env,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--budget-ms", type=float, default=400.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--preload", action="store_true", help="also time create_app(preload=True)")
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    totals_ms = sorted(
+        next(cumulative for name, _, cumulative, depth in run if name == args.module and depth == 0) / 1000.0
+        for run in runs
+    )
+    median_ms = totals_ms[len(totals_ms) // 2]
+    last = runs[-1]
+    heavy = sorted({name for name, _, _, _ in last if name.split('.')[0] in HEAVY_MODULES})
+    top_level = sorted(direct_imports(last, args.module), key=lambda item: -item[1])
+
+    report = {
+        'module': args.module,
+        'median_import_ms': round(median_ms, 1),
+        'budget_ms': args.budget_ms,
+        'heavy_modules_imported': heavy[:20],
+        'slowest_top_level_imports_ms': {name: round(us / 1000.0, 1) for name, us in top_level[:8]},
+    }
+    if args.preload:
+        start = time.perf_counter()
+        report['preload_ready_s'] = round(preload_seconds(), 2)
+        report['preload_process_s'] = round(time.perf_counter() - start, 2)
+    print(json.dumps(report, indent=2))
+    if median_ms > args.budget_ms or heavy:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""Load test for the search API: throughput, latency percentiles and peak RSS as JSON.
+
+    python -m benchmarks.load_test [--sizes 10000,50000] [--concurrency 1,4,16]
+        [--modes inprocess,http] [--requests 1000] [--output load_test.json]
+        [--compare previous.json]
+
+For each corpus size a synthetic dataset is generated (the same seed gives the same corpus)
+and indexed with build_index. Then:
+
+- inprocess: a fresh interpreter loads a JokeService and calls joke_search from N threads.
+- http: the app runs under werkzeug's threaded server in a child process, and N client
+  threads send GET /roast-it over keep-alive connections. Peak RSS is the server's.
+
+Each (size, mode, concurrency) run is closed-loop: every thread sends its next request as
+soon as the previous one returns, until --requests have completed. The result cache is off
+by default (--cache-size 0) so every request runs the whole pipeline. With --compare, the
+report also lists throughput and p95 ratios against an earlier report.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+import numpy as np
+from benchmarks.common import latency_summary, peak_rss_mb, query_mix, write_synthetic_dataset
+
+backend_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_closed_loop(call, workload, concurrency, n_requests):
+    """Issue n_requests calls from `concurrency` threads; returns (latencies, errors, seconds)."""
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, errors = [], [0]
+
+    def worker(make_call):
+        local = []
+        while True:
+            with lock:
+                i = next(counter)
+            if i >= n_requests:
+                break
+            query, category = workload[i % len(workload)]
+            start = time.perf_counter()
+            ok = make_call(query, category)
+            local.append(time.perf_counter() - start)
+            if not ok:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(call(),)) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.perf_counter() - start
+
+
+def summarize(latencies, errors, seconds, concurrency, peak_mb):
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(seconds, 3),
+        'throughput_rps': round(len(latencies) / seconds, 1),
+        'latency': latency_summary(latencies),
+        'peak_rss_mb': round(peak_mb, 1),
+    }
+
+
+def inprocess_worker(args):
+    """Run every concurrency level against joke_search in this interpreter."""
+    from python.joke_service import JokeService
+
+    service = JokeService(
+        args.dataset, args.index_dir, cache_size=args.cache_size, index_poll_seconds=0, log_sample_rate=0.0
+    )
+    start = time.perf_counter()
+    store = service.current.store
+    load_seconds = time.perf_counter() - start
+    workload = query_mix(store, args.queries, seed=args.seed)
+
+    def call():
+        def search(query, category):
+            service.joke_search(query, category)
+            return True
+        return search
+
+    run_closed_loop(call, workload, 1, min(50, args.requests))
+    runs = []
+    for concurrency in args.concurrency:
+        latencies, errors, seconds = run_closed_loop(call, workload, concurrency, args.requests)
+        runs.append(summarize(latencies, errors, seconds, concurrency, peak_rss_mb()))
+    return {'load_seconds': round(load_seconds, 3), 'runs': runs}
+
+
+def serve_worker(args):
+    """Serve the app for --dataset/--index-dir on --port until killed."""
+    import logging
+    from werkzeug.serving import make_server
+    from app import create_app
+    from python.joke_service import JokeService
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    service = JokeService(
+        args.dataset, args.index_dir, cache_size=args.cache_size, index_poll_seconds=0, log_sample_rate=0.0
+    )
+    make_server("127.0.0.1", args.port, create_app(service=service), threaded=True).serve_forever()
+
+
+def process_peak_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024.0
+    return float('nan')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(server, port, timeout=300):
+    """Poll GET /ready until it answers 200; returns the seconds waited."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if server.poll() is not None:
+            raise RuntimeError("load test server exited during startup")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/ready")
+            if connection.getresponse().status == 200:
+                return time.perf_counter() - start
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("load test server was not ready in time")
+
+
+def http_client(port):
+    """Return a factory of per-thread GET /roast-it callers, each on its own keep-alive connection."""
+    def call():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+
+        def get(query, category):
+            params = {"query": query, "category": category} if category else {"query": query}
+            connection.request("GET", "/roast-it?" + urlencode(params))
+            response = connection.getresponse()
+            response.read()
+            return response.status == 200
+        return get
+    return call
+
+
+def http_levels(call, workload, args, pid):
+    """Warm up, then run each concurrency level, reporting the peak RSS of process pid."""
+    run_closed_loop(call, workload, 1, min(50, args.requests))
+    runs = []
+    for concurrency in args.concurrency:
+        latencies, errors, seconds = run_closed_loop(call, workload, concurrency, args.requests)
+        runs.append(summarize(latencies, errors, seconds, concurrency, process_peak_rss_mb(pid)))
+    return runs
+
+
+def http_runs(args, dataset_path, index_dir, workload):
+    """Start a server child process and drive GET /roast-it at each concurrency level."""
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.load_test", "--worker", "serve", "--dataset", dataset_path,
+         "--index-dir", index_dir, "--port", str(port), "--cache-size", str(args.cache_size)],
+        cwd=backend_directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        ready_seconds = wait_until_ready(server, port)
+        runs = http_levels(http_client(port), workload, args, server.pid)
+        return {'ready_seconds': round(ready_seconds, 3), 'runs': runs}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=backend_directory, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(report, previous):
+    """Throughput and p95 ratios (current / previous) for runs present in both reports."""
+    def keyed(runs):
+        return {(run['size'], run['mode'], run['concurrency']): run for run in runs}
+
+    old = keyed(previous['results'])
+    rows = []
+    for key, run in keyed(report['results']).items():
+        if key in old:
+            rows.append({
+                'size': key[0], 'mode': key[1], 'concurrency': key[2],
+                'throughput_ratio': round(run['throughput_rps'] / old[key]['throughput_rps'], 3),
+                'p95_ratio': round(run['latency']['p95_ms'] / old[key]['latency']['p95_ms'], 3),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,50000")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--modes", default="inprocess,http")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per concurrency level")
+    parser.add_argument("--queries", type=int, default=500, help="distinct queries in the mix")
+    parser.add_argument("--cache-size", type=int, default=0)
+    parser.add_argument("--components", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="also write the JSON report here")
+    parser.add_argument("--compare", default=None, help="earlier report to compare against")
+    parser.add_argument("--worker", choices=['inprocess', 'serve'], default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--dataset", help=argparse.SUPPRESS)
+    parser.add_argument("--index-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in str(args.concurrency).split(",")]
+
+    if args.worker == 'inprocess':
+        print(json.dumps(inprocess_worker(args)))
+        return
+    if args.worker == 'serve':
+        serve_worker(args)
+        return
+
+    from build_index import build_index
+    from python.joke_store import JokeStore
+
+    modes = args.modes.split(",")
+    report = {'environment': environment(), 'config': {
+        'sizes': args.sizes, 'concurrency': args.concurrency, 'modes': modes, 'requests': args.requests,
+        'queries': args.queries, 'cache_size': args.cache_size, 'components': args.components, 'seed': args.seed,
+    }, 'corpora': [], 'results': []}
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            dataset_path = write_synthetic_dataset(os.path.join(tmp, 'dataset.csv'), size, seed=args.seed)
+            index_dir = os.path.join(tmp, 'joke_index')
+            start = time.perf_counter()
+            build_index(dataset_path, index_dir, args.components)
+            report['corpora'].append({'size': size, 'build_seconds': round(time.perf_counter() - start, 2)})
+
+            if 'inprocess' in modes:
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.load_test", "--worker", "inprocess",
+                     "--dataset", dataset_path, "--index-dir", index_dir,
+                     "--concurrency", ",".join(map(str, args.concurrency)), "--requests", str(args.requests),
+                     "--queries", str(args.queries), "--cache-size", str(args.cache_size), "--seed", str(args.seed)],
+                    cwd=backend_directory, check=True, capture_output=True, text=True,
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                report['corpora'][-1]['inprocess_load_seconds'] = result['load_seconds']
+                report['results'] += [dict(run, size=size, mode='inprocess') for run in result['runs']]
+
+            if 'http' in modes:
+                workload = query_mix(JokeStore.from_csv(dataset_path), args.queries, seed=args.seed)
+                result = http_runs(args, dataset_path, index_dir, workload)
+                report['corpora'][-1]['http_ready_seconds'] = result['ready_seconds']
+                report['results'] += [dict(run, size=size, mode='http') for run in result['runs']]
+
+    if args.compare:
+        with open(args.compare) as f:
+            report['comparison'] = compare(report, json.load(f))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
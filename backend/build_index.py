@@ -0,0 +1,106 @@
+"""Build the persisted search index for dataset.csv.
+
+Run from the backend folder whenever the dataset changes:
+
+    python build_index.py [--dataset dataset.csv] [--index-dir joke_index] [--streaming --workers 8]
+
+app.py memory-maps the result at startup instead of refitting TF-IDF and SVD in every worker.
+Jokes without a precomputed 'clean' label are scored in batches first and the column is
+saved to the dataset, so the index is built against the labeled file. With --dedup,
+near-duplicate jokes (reposts with small wording changes) are collapsed before that.
+
+--from-db URL first streams the joke table (or --query) from a database into the dataset
+file chunk by chunk, so the app and the index are built from the same rows.
+
+--neighbours K also precomputes each joke's K most similar jokes, so the
+/joke/<id>/similar endpoint is a lookup rather than a corpus scan.
+
+--vector-index KIND (default: $JOKE_VECTOR_INDEX, else 'exact') trains that nearest-neighbour
+backend once and saves it with the index, so workers load it instead of training it.
+
+--streaming builds the same index format out of core for corpora too large to hold in
+memory: the dataset is read in chunks, preprocessed and tokenized across a process pool,
+and SVD is fitted by randomized subspace iteration over the spilled term counts.
+"""
+import argparse
+import os
+import resource
+import time
+from python.joke_index import dataset_hash
+from python.joke_ranker import JokeRanker
+from python.joke_store import JokeStore
+from python.profanity_filter import add_clean_column
+from python.dedup import THRESHOLD, dedup_dataset
+from python.metrics import process_memory
+
+current_directory = os.path.dirname(os.path.abspath(__file__))
+
+
+def build_index(dataset_path, index_dir, n_components=100, neighbours=0, index_type='exact'):
+    """Fit the ranker on the dataset and write it to index_dir, with a k=neighbours graph if set."""
+    data_hash = dataset_hash(dataset_path)
+    joke_store = JokeStore.from_csv(dataset_path)
+    ranker = JokeRanker(joke_store.texts, n_components=n_components, index_type=index_type)
+    if neighbours:
+        start = time.perf_counter()
+        ranker.build_neighbours(neighbours)
+        print(f"Found {neighbours} neighbours per joke in {time.perf_counter() - start:.1f}s")
+    return ranker.save(index_dir, data_hash)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the joke search index.")
+    parser.add_argument("--dataset", default=os.path.join(current_directory, 'dataset.csv'))
+    parser.add_argument("--index-dir", default=os.path.join(current_directory, 'joke_index'))
+    parser.add_argument("--components", type=int, default=100)
+    parser.add_argument("--skip-profanity", action="store_true", help="don't label jokes as clean")
+    parser.add_argument("--from-db", metavar="URL", help="export jokes from this database URL into --dataset first")
+    parser.add_argument("--query", default="SELECT * FROM jokes", help="rows to export with --from-db")
+    parser.add_argument("--dedup", action="store_true", help="collapse near-duplicate jokes in the dataset first")
+    parser.add_argument("--dedup-threshold", type=float, default=THRESHOLD, help="estimated shingle Jaccard similarity")
+    parser.add_argument("--neighbours", type=int, default=0, metavar="K",
+                        help="precompute each joke's K most similar jokes for /joke/<id>/similar")
+    parser.add_argument("--vector-index", default=os.environ.get('JOKE_VECTOR_INDEX', 'exact'),
+                        help="nearest-neighbour backend to train and save (as JOKE_VECTOR_INDEX)")
+    parser.add_argument("--streaming", action="store_true", help="chunked, parallel, out-of-core build")
+    parser.add_argument("--workers", type=int, default=None, help="preprocessing processes (default: all CPUs)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="jokes per chunk with --streaming")
+    args = parser.parse_args()
+
+    if args.from_db:
+        from helpers.MySQLDatabaseHandler import MySQLDatabaseHandler
+
+        start = time.perf_counter()
+        with MySQLDatabaseHandler(url=args.from_db) as database:
+            exported = database.copy_to_csv(args.query, args.dataset)
+        print(f"Exported {exported} jokes from the database in {time.perf_counter() - start:.1f}s")
+
+    if args.dedup:
+        start = time.perf_counter()
+        stats = dedup_dataset(args.dataset, threshold=args.dedup_threshold)
+        print(f"Removed {stats['removed']} of {stats['jokes']} jokes as near-duplicates "
+              f"in {time.perf_counter() - start:.1f}s")
+
+    if not args.skip_profanity:
+        start = time.perf_counter()
+        scored = add_clean_column(args.dataset)
+        print(f"Scored {scored} jokes for profanity in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    if args.streaming:
+        from python.streaming_build import CHUNK_SIZE, build_index_streaming
+        version_dir = build_index_streaming(
+            args.dataset, args.index_dir, args.components, chunk_size=args.chunk_size or CHUNK_SIZE,
+            workers=args.workers, neighbours=args.neighbours, index_type=args.vector_index,
+        )
+    else:
+        version_dir = build_index(args.dataset, args.index_dir, args.components, args.neighbours, args.vector_index)
+    _, peak = process_memory()
+    # ru_maxrss is in KiB on Linux; for children it is the largest single worker
+    children_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    peak_text = f", peak RSS {peak / 2 ** 20:.0f} MB (largest worker {children_peak:.0f} MB)" if peak else ""
+    print(f"Built index {version_dir} in {time.perf_counter() - start:.1f}s{peak_text}")
+
+
+if __name__ == "__main__":
+    main()
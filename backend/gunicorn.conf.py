@@ -0,0 +1,13 @@
+"""gunicorn settings for serving the app from the backend folder:
+
+    gunicorn -c gunicorn.conf.py
+
+The master builds the app with preload=True, loading the dataset and memory-mapping the
+index once, then forks workers that share those pages and start answering immediately.
+"""
+import os
+
+wsgi_app = "app:create_app(preload=True)"
+preload_app = True
+bind = os.environ.get("JOKE_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
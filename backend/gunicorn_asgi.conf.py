@@ -0,0 +1,18 @@
+"""gunicorn settings for the ASGI app (asgi.py) on uvicorn workers, from the backend folder:
+
+    gunicorn -c gunicorn_asgi.conf.py
+
+As with gunicorn.conf.py, the master preloads the dataset and index and forks warm workers.
+Each worker runs one event loop that hands ranking to JOKE_SEARCH_THREADS threads, so a
+worker serves many connections at once; JOKE_SEARCH_QUEUE and JOKE_SEARCH_TIMEOUT bound how
+much work it accepts before answering 503.
+"""
+import os
+
+wsgi_app = "asgi:create_asgi_app(preload=True)"
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+bind = os.environ.get("JOKE_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+# Requests past JOKE_SEARCH_TIMEOUT are answered with 503 long before this
+timeout = 30
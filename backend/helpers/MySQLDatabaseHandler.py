@@ -1,47 +1,248 @@
+import contextlib
 import os
+import re
+import pandas as pd
 import sqlalchemy as db
+from python.log_utils import get_logger, log_event
+
+logger = get_logger('database')
+
+# Rows per executemany call, each committed in its own transaction
+BATCH_SIZE = 1000
+# Rows fetched per chunk from a server-side cursor
+CHUNK_SIZE = 10_000
+
+# Outside quotes and comments: a statement end, or the token opening a string, quoted
+# identifier or comment (MySQL needs whitespace after '--')
+_SQL_SPECIAL = re.compile(r"""['"`;#]|--(?=\s|$)|/\*""")
+# Inside each kind of quoted text: what closes it, or a backslash escape that does not
+_SQL_CLOSERS = {
+    "'": re.compile(r"\\.|'", re.DOTALL),
+    '"': re.compile(r'\\.|"', re.DOTALL),
+    '`': re.compile(r'`'),
+    '/*': re.compile(r'\*/'),
+}
+
 
 class MySQLDatabaseHandler(object):
-    
+    """Pooled access to the project database.
+
+    The engine keeps up to pool_size connections open (plus max_overflow under bursts) and
+    every method returns its connection to the pool when done. Pass url to use another
+    database, e.g. 'sqlite:///jokes.db' for local work and benchmarks.
+    """
+
     IS_DOCKER = True if 'DB_NAME' in os.environ else False
 
-    def __init__(self,MYSQL_USER,MYSQL_USER_PASSWORD,MYSQL_PORT,MYSQL_DATABASE,MYSQL_HOST = "localhost"):
-        
+    def __init__(self, MYSQL_USER=None, MYSQL_USER_PASSWORD=None, MYSQL_PORT=None, MYSQL_DATABASE=None,
+                 MYSQL_HOST="localhost", url=None, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=3600):
+
         self.MYSQL_HOST = os.environ['DB_NAME'] if MySQLDatabaseHandler.IS_DOCKER else MYSQL_HOST
         self.MYSQL_USER = "admin" if MySQLDatabaseHandler.IS_DOCKER else MYSQL_USER
         self.MYSQL_USER_PASSWORD = "admin" if MySQLDatabaseHandler.IS_DOCKER else MYSQL_USER_PASSWORD
         self.MYSQL_PORT = 3306 if MySQLDatabaseHandler.IS_DOCKER else MYSQL_PORT
         self.MYSQL_DATABASE = "kardashiandb" if MySQLDatabaseHandler.IS_DOCKER else MYSQL_DATABASE
+        self.url = url or (
+            f"mysql+pymysql://{self.MYSQL_USER}:{self.MYSQL_USER_PASSWORD}@{self.MYSQL_HOST}:{self.MYSQL_PORT}/{self.MYSQL_DATABASE}"
+        )
+        self.pool_params = {
+            'pool_size': pool_size, 'max_overflow': max_overflow,
+            'pool_timeout': pool_timeout, 'pool_recycle': pool_recycle,
+        }
         self.engine = self.validate_connection()
 
     def validate_connection(self):
-        print(f"mysql+pymysql://{self.MYSQL_USER}:{self.MYSQL_USER_PASSWORD}@{self.MYSQL_HOST}:{self.MYSQL_PORT}/{self.MYSQL_DATABASE}")
-        return db.create_engine(f"mysql+pymysql://{self.MYSQL_USER}:{self.MYSQL_USER_PASSWORD}@{self.MYSQL_HOST}:{self.MYSQL_PORT}/{self.MYSQL_DATABASE}")
+        """Create the pooled engine; connections are checked with a ping before reuse."""
+        params = dict(self.pool_params, poolclass=db.pool.QueuePool, pool_pre_ping=True)
+        if self.url.startswith('sqlite'):
+            # Pooled SQLite connections are handed between threads
+            params['connect_args'] = {'check_same_thread': False}
+        engine = db.create_engine(self.url, **params)
+        log_event(logger, 'engine_created', url=engine.url.render_as_string(hide_password=True), **self.pool_params)
+        return engine
+
+    @contextlib.contextmanager
+    def connection(self):
+        """A pooled connection, returned to the pool on exit."""
+        with self.engine.connect() as conn:
+            yield conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """A pooled connection inside a transaction: committed on exit, rolled back on error."""
+        with self.engine.begin() as conn:
+            yield conn
 
     def lease_connection(self):
+        """A raw pooled connection; the caller must close it. Prefer connection()."""
         return self.engine.connect()
-    
-    def query_executor(self,query):
-        conn = self.lease_connection()
-        if type(query) == list:
-            for i in query:
-                conn.execute(i)
-        else:
-            conn.execute(query)
-        
-
-    def query_selector(self,query):
-        conn = self.lease_connection()
-        data = conn.execute(query)
-        return data
-
-    def load_file_into_db(self,file_path  = None):
+
+    def query_executor(self, query, params=None):
+        """Run one statement or a list of statements in a single transaction."""
+        queries = query if type(query) == list else [query]
+        with self.transaction() as conn:
+            for statement in queries:
+                _execute(conn, statement, params)
+
+    def query_selector(self, query, params=None):
+        """Run a query and return all of its rows; use stream_query for large results."""
+        with self.connection() as conn:
+            return _execute(conn, query, params).fetchall()
+
+    def stream_query(self, query, params=None, chunk_size=CHUNK_SIZE):
+        """Yield the query's rows in lists of up to chunk_size.
+
+        The rows come from a server-side cursor (pymysql's SSCursor on MySQL), so only one
+        chunk is held in memory, on the client or in the driver's buffer.
+        """
+        with self.connection() as conn:
+            result = _execute(conn.execution_options(stream_results=True), query, params)
+            for rows in result.partitions(chunk_size):
+                yield rows
+
+    def stream_frames(self, query, params=None, chunk_size=CHUNK_SIZE):
+        """Like stream_query, but yields each chunk as a DataFrame with the result's columns."""
+        with self.connection() as conn:
+            result = _execute(conn.execution_options(stream_results=True), query, params)
+            columns = list(result.keys())
+            for rows in result.partitions(chunk_size):
+                yield pd.DataFrame.from_records(rows, columns=columns)
+
+    def bulk_insert(self, table, rows, columns=None, batch_size=BATCH_SIZE):
+        """Insert an iterable of row dicts (or tuples in `columns` order); returns the row count.
+
+        Rows are sent with executemany, batch_size at a time, and each batch is committed
+        in its own transaction, so a failed batch leaves no partial rows and memory stays
+        bounded for any input length.
+        """
+        inserted = 0
+        statement = None
+        batch = []
+        for row in rows:
+            if not isinstance(row, dict):
+                row = dict(zip(columns, row))
+            if statement is None:
+                columns = columns or list(row)
+                statement = db.table(table, *[db.column(name) for name in columns]).insert()
+            batch.append(row)
+            if len(batch) >= batch_size:
+                inserted += self._insert_batch(statement, batch)
+                batch = []
+        if batch:
+            inserted += self._insert_batch(statement, batch)
+        return inserted
+
+    def _insert_batch(self, statement, batch):
+        with self.transaction() as conn:
+            conn.execute(statement, batch)
+        return len(batch)
+
+    def copy_to_csv(self, query, path, params=None, chunk_size=CHUNK_SIZE):
+        """Stream the query's rows into a CSV file at path, one chunk at a time; returns the row count.
+
+        The file is written next to path and moved into place once complete.
+        """
+        written = 0
+        real_path = os.path.realpath(path)
+        with open(real_path + '.tmp', 'w', newline='') as f:
+            for frame in self.stream_frames(query, params, chunk_size):
+                frame.to_csv(f, header=written == 0, index=False)
+                written += len(frame)
+        os.replace(real_path + '.tmp', real_path)
+        return written
+
+    def load_file_into_db(self, file_path=None, batch_size=BATCH_SIZE):
+        """Run a ';'-terminated SQL script statement by statement, committing every batch_size statements.
+
+        The file is read line by line, so its size is not limited by memory.
+        """
         if MySQLDatabaseHandler.IS_DOCKER:
             return
         if file_path is None:
-            file_path = os.path.join(os.environ['ROOT_PATH'],'init.sql')
-        sql_file = open(file_path,"r")
-        sql_file_data = list(filter(lambda x:x != '',sql_file.read().split(";\n")))
-        self.query_executor(sql_file_data)
-        sql_file.close()
+            file_path = os.path.join(os.environ['ROOT_PATH'], 'init.sql')
+        executed = 0
+        with open(file_path, "r") as sql_file:
+            statements = sql_statements(sql_file)
+            while True:
+                with self.transaction() as conn:
+                    conn = conn.execution_options(no_parameters=True)
+                    count = 0
+                    for statement in statements:
+                        conn.exec_driver_sql(statement)
+                        count += 1
+                        if count == batch_size:
+                            break
+                executed += count
+                if count < batch_size:
+                    break
+        log_event(logger, 'file_loaded', path=file_path, statements=executed)
+        return executed
+
+    def pool_status(self):
+        """The pool's checked-in/checked-out connection counts, for debugging leaks."""
+        return self.engine.pool.status()
+
+    def close(self):
+        """Close every pooled connection."""
+        self.engine.dispose()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def sql_statements(lines):
+    """Yield the statements of a SQL script, split at each ';' outside quotes and comments.
+
+    Strings ('...' and "...", with backslash escapes or doubled quotes), `identifiers` and
+    comments (-- , # and /* */) may span lines and contain ';'. DELIMITER commands are not
+    supported. Raises ValueError when the script ends inside a string or comment, before
+    the unterminated statement is yielded.
+    """
+    statement = []
+    opened = None
+    has_code = False
+    for line in lines:
+        start = pos = 0
+        while pos < len(line):
+            if opened is not None:
+                match = _SQL_CLOSERS[opened].search(line, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                if not match.group().startswith('\\'):
+                    opened = None
+                continue
+            match = _SQL_SPECIAL.search(line, pos)
+            has_code = has_code or bool(line[pos:len(line) if match is None else match.start()].strip())
+            if match is None:
+                break
+            token = match.group()
+            pos = match.end()
+            if token == ';':
+                statement.append(line[start:match.start()])
+                # Comments alone are not a statement
+                if has_code:
+                    yield "".join(statement).strip()
+                statement, has_code, start = [], False, pos
+            elif token in ('--', '#'):
+                break
+            else:
+                opened = token
+                has_code = has_code or token != '/*'
+        statement.append(line[start:])
+    if opened is not None:
+        raise ValueError(f"SQL script ends inside an unterminated {opened}; check its quotes and comments")
+    if has_code:
+        yield "".join(statement).strip()
+
 
+def _execute(conn, query, params=None):
+    # Plain SQL strings go to the driver as they are (no '%' formatting), unless they have bound parameters
+    if isinstance(query, str):
+        if params is None:
+            return conn.execution_options(no_parameters=True).exec_driver_sql(query)
+        return conn.execute(db.text(query), params)
+    return conn.execute(query) if params is None else conn.execute(query, params)
@@ -0,0 +1,63 @@
+"""Add scraped jokes to the search index without a full refit.
+
+Send jokes to a running app (needs JOKE_INGEST_TOKEN set on the server):
+
+    python ingest_jokes.py wocka.json --url http://localhost:5000 --token <token>
+
+Or apply them directly to dataset.csv and joke_index/; running workers reload the new
+index version on their next poll:
+
+    python ingest_jokes.py wocka.json --offline
+
+Input is the JSON list or JSON Lines written by reddit.py, wocka.py or stupidstuff.py.
+"""
+import argparse
+import json
+import os
+import urllib.request
+from python.ingest import load_scraped_jokes, ingest_offline
+
+current_directory = os.path.dirname(os.path.abspath(__file__))
+
+
+def send_to_service(jokes_df, url, token, batch_size=1000):
+    """POST jokes to /jokes/ingest in batches and return the last response."""
+    response = None
+    for start in range(0, len(jokes_df), batch_size):
+        batch = jokes_df.iloc[start:start + batch_size]
+        body = batch.astype(object).where(batch.notna(), None).to_dict('records')
+        req = urllib.request.Request(
+            url.rstrip('/') + '/jokes/ingest',
+            data=json.dumps(body).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'X-Ingest-Token': token or ''},
+            method='POST',
+        )
+        with urllib.request.urlopen(req) as resp:
+            response = json.loads(resp.read())
+        print(f"Sent {start + len(batch)}/{len(jokes_df)} jokes: {response}")
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest scraped jokes into the search index.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--offline", action="store_true", help="write dataset.csv and joke_index directly")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--token", default=os.environ.get('JOKE_INGEST_TOKEN'))
+    parser.add_argument("--dataset", default=os.path.join(current_directory, 'dataset.csv'))
+    parser.add_argument("--index-dir", default=os.path.join(current_directory, 'joke_index'))
+    parser.add_argument("--drift-threshold", type=float, default=0.2)
+    parser.add_argument("--min-drift-tokens", type=int, default=500)
+    args = parser.parse_args()
+
+    for path in args.files:
+        jokes_df = load_scraped_jokes(path)
+        print(f"Loaded {len(jokes_df)} jokes from {path}")
+        if args.offline:
+            print(ingest_offline(jokes_df, args.dataset, args.index_dir, args.drift_threshold, args.min_drift_tokens))
+        else:
+            send_to_service(jokes_df, args.url, args.token)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import os
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sklearn.feature_extraction.text import HashingVectorizer
+from python.joke_store import joke_texts
+from python.text_utils import preprocess
+from python.log_utils import get_logger, log_event
+
+logger = get_logger('dedup')
+
+# Jokes are compared as sets of word 3-shingles of their preprocessed 'title body' text
+SHINGLE_SIZE = 3
+# 64 MinHash values per joke, split into 16 LSH bands of 4. Two jokes become candidates if
+# any band matches: ~64% likely at Jaccard 0.5, 89% at 0.6, 99% at 0.7
+NUM_PERM = 64
+BANDS = 16
+# Candidates are kept if their MinHash signatures agree on at least this share of values,
+# an estimate of the shingle Jaccard similarity
+THRESHOLD = 0.6
+# Jokes hashed per block, bounding the (block shingles x hash functions) work arrays
+CHUNK_SIZE = 50_000
+
+_SHINGLE_SPACE = 2 ** 30
+
+# Columns that are the joke itself: always the canonical row's, never filled from another member
+TEXT_COLUMNS = ('title', 'body')
+
+
+def shingle_sets(texts, shingle_size=SHINGLE_SIZE):
+    """(jokes x hashed shingles) binary CSR matrix; every row has at least one shingle.
+
+    Jokes too short to have a single shingle are represented by their whole text, so they
+    only match exact (after preprocessing) copies.
+    """
+    hasher = HashingVectorizer(
+        preprocessor=preprocess, ngram_range=(shingle_size, shingle_size), n_features=_SHINGLE_SPACE,
+        alternate_sign=False, norm=None, binary=True, dtype=np.float32,
+    )
+    shingles = hasher.transform(texts)
+    short = np.flatnonzero(np.diff(shingles.indptr) == 0)
+    if len(short):
+        whole = [zlib.crc32(preprocess(texts[i]).encode('utf-8')) % _SHINGLE_SPACE for i in short]
+        shingles = shingles + sparse.csr_matrix(
+            (np.ones(len(short), dtype=np.float32), (short, whole)), shape=shingles.shape
+        )
+    return shingles
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=0, chunk_size=CHUNK_SIZE):
+    """(jokes x num_perm) uint32 MinHash signatures of each joke's shingle set.
+
+    Each hash function is a multiply-shift hash of the shingle id, and a joke's value is
+    the minimum over its shingles, taken for a whole block of jokes with one reduceat.
+    """
+    rng = np.random.default_rng(seed)
+    multipliers = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    increments = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    shift = np.uint64(32)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for start in range(0, len(texts), chunk_size):
+        shingles = shingle_sets(texts[start:start + chunk_size], shingle_size)
+        ids = shingles.indices.astype(np.uint64)
+        row_starts = shingles.indptr[:-1]
+        block = signatures[start:start + shingles.shape[0]]
+        for p in range(num_perm):
+            hashed = ((ids * multipliers[p] + increments[p]) >> shift).astype(np.uint32)
+            block[:, p] = np.minimum.reduceat(hashed, row_starts)
+    return signatures
+
+
+def candidate_pairs(signatures, bands=BANDS):
+    """Unique (i, j) pairs of jokes that share at least one LSH band bucket.
+
+    Within a bucket every member is paired with its first member only, so the pair count is
+    linear in the number of jokes rather than quadratic in the bucket sizes.
+    """
+    n_jokes, num_perm = signatures.shape
+    rows_per_band = num_perm // bands
+    mixers = np.random.default_rng(1).integers(1, 2 ** 63, size=rows_per_band, dtype=np.uint64) | np.uint64(1)
+    positions = np.arange(n_jokes)
+    pairs = []
+    for band in range(bands):
+        keys = (signatures[:, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64) * mixers).sum(axis=1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        run_start = np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1]))
+        first = order[np.maximum.accumulate(np.where(run_start, positions, 0))]
+        pairs.append(first[~run_start].astype(np.int64) * n_jokes + order[~run_start])
+    pairs = np.unique(np.concatenate(pairs))
+    return pairs // n_jokes, pairs % n_jokes
+
+
+def near_duplicate_clusters(signatures, bands=BANDS, threshold=THRESHOLD, block_size=1_000_000):
+    """Label each joke with its near-duplicate cluster; returns (n_clusters, labels).
+
+    Candidate pairs from the LSH buckets are kept if their signatures agree on at least
+    `threshold` of the values, and clusters are the connected components of the kept pairs
+    (union-find over the pair graph), so near-duplicates of near-duplicates are merged too.
+    """
+    n_jokes = signatures.shape[0]
+    first, second = candidate_pairs(signatures, bands)
+    similar = np.zeros(len(first), dtype=bool)
+    for start in range(0, len(first), block_size):
+        end = start + block_size
+        agreement = (signatures[first[start:end]] == signatures[second[start:end]]).mean(axis=1)
+        similar[start:end] = agreement >= threshold
+    graph = sparse.coo_matrix(
+        (np.ones(int(similar.sum()), dtype=np.int8), (first[similar], second[similar])), shape=(n_jokes, n_jokes)
+    )
+    return connected_components(graph, directed=False)
+
+
+def dedup_jokes(jokes_df, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS, shingle_size=SHINGLE_SIZE, seed=0):
+    """Collapse near-duplicate jokes into one canonical row each; returns (jokes_df, stats).
+
+    The canonical joke of a cluster is its highest-scored member (the first one if there
+    is no score), so it carries the cluster's max score. Its title and body are kept as
+    they are; missing metadata, such as a category, flag or id, is filled from the other
+    members in the same order, and the new 'duplicates' column counts the rows merged
+    into it. Canonical rows keep their original relative order.
+    """
+    start = time.perf_counter()
+    n_jokes = len(jokes_df)
+    signatures = minhash_signatures(joke_texts(jokes_df), num_perm, shingle_size, seed)
+    hashed = time.perf_counter()
+    n_clusters, labels = near_duplicate_clusters(signatures, bands, threshold)
+    clustered = time.perf_counter()
+
+    if 'score' in jokes_df and pd.api.types.is_numeric_dtype(jokes_df['score']):
+        score = jokes_df['score'].fillna(-np.inf).to_numpy(dtype=np.float64)
+    else:
+        score = np.zeros(n_jokes)
+    # By cluster, then best score first, then earliest row
+    order = np.lexsort((np.arange(n_jokes), -score, labels))
+    sorted_labels = labels[order]
+    canonical = order[np.concatenate(([True], sorted_labels[1:] != sorted_labels[:-1]))]
+    # first() takes each column's first non-missing value: the canonical row's, else the next best member's.
+    # Clusters come out in label order, as do their canonical rows
+    deduped = jokes_df.iloc[order].groupby(sorted_labels, sort=True).first()
+    for name in TEXT_COLUMNS:
+        if name in jokes_df:
+            deduped[name] = jokes_df[name].to_numpy()[canonical]
+    # Rows that were themselves canonical jokes of an earlier pass count with their duplicates
+    merged = jokes_df['duplicates'].fillna(0).to_numpy() + 1 if 'duplicates' in jokes_df else None
+    deduped['duplicates'] = (np.bincount(labels, weights=merged, minlength=n_clusters) - 1).astype(np.int64)
+    deduped.index = canonical
+    deduped = deduped.sort_index().reset_index(drop=True)
+
+    stats = {
+        'jokes': n_jokes,
+        'kept': n_clusters,
+        'removed': n_jokes - n_clusters,
+        'clusters_merged': int((deduped['duplicates'] > 0).sum()),
+        'minhash_seconds': round(hashed - start, 2),
+        'cluster_seconds': round(clustered - hashed, 2),
+        'merge_seconds': round(time.perf_counter() - clustered, 2),
+    }
+    log_event(logger, 'dedup', **stats)
+    return deduped, stats
+
+
+def dedup_dataset(dataset_path, **dedup_params):
+    """Drop near-duplicate jokes from the dataset file in place; returns dedup_jokes' stats.
+
+    Like add_clean_column, the file is only rewritten when jokes were removed, since that
+    changes the dataset hash and so invalidates the built index.
+    """
+    deduped, stats = dedup_jokes(pd.read_csv(dataset_path), **dedup_params)
+    if stats['removed']:
+        real_path = os.path.realpath(dataset_path)
+        deduped.to_csv(real_path + '.tmp', index=False)
+        os.replace(real_path + '.tmp', real_path)
+    return stats
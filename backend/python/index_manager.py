@@ -0,0 +1,167 @@
+import logging
+import os
+import threading
+from collections import namedtuple
+from python.joke_index import current_version_dir, dataset_hash
+from python.joke_ranker import JokeRanker
+from python.joke_store import JokeStore
+from python.ingest import ingest_offline
+from python.profanity_filter import CLEAN_COLUMN, label_clean
+from python.log_utils import get_logger, log_event
+
+logger = get_logger('index')
+
+# One consistent view of the searchable corpus; replaced wholesale, never mutated
+Snapshot = namedtuple('Snapshot', ['store', 'ranker', 'version'])
+
+
+class IndexManager:
+    """Owns the live (store, ranker) snapshot and swaps it atomically.
+
+    Request handlers read `manager.current` once and use that snapshot throughout, so
+    ingesting jokes or finishing a background refit never changes data under a request.
+
+    With dataset_path and index_dir set, ingested jokes are also written to dataset.csv
+    and a new index version, and every worker picks that version up through
+    reload_if_changed. Without them, ingestion and refits stay in this process.
+    """
+
+    def __init__(self, store, ranker, dataset_path=None, index_dir=None, drift_threshold=0.2, min_drift_tokens=500):
+        self.current = Snapshot(store, ranker, ranker.version)
+        self.dataset_path = dataset_path
+        self.index_dir = index_dir
+        self.drift_threshold = drift_threshold
+        self.min_drift_tokens = min_drift_tokens
+        self.unknown_tokens = 0
+        self.total_tokens = 0
+        self.loaded_version_dir = current_version_dir(index_dir) if index_dir else None
+        self._write_lock = threading.Lock()
+        self._listeners = []
+        self._background = None
+
+    @property
+    def persistent(self):
+        return self.dataset_path is not None and self.index_dir is not None
+
+    @property
+    def drift(self):
+        """Share of ingested tokens missing from the fitted vocabulary since the last fit."""
+        return self.unknown_tokens / self.total_tokens if self.total_tokens else 0.0
+
+    def add_listener(self, callback):
+        """Call callback(snapshot) after every swap, e.g. to invalidate caches."""
+        self._listeners.append(callback)
+
+    def swap(self, store, ranker):
+        """Atomically publish a new snapshot."""
+        snapshot = Snapshot(store, ranker, ranker.version)
+        self.current = snapshot
+        for callback in self._listeners:
+            callback(snapshot)
+        return snapshot
+
+    def ingest(self, jokes_df):
+        """Make new jokes searchable immediately, projecting them with the fitted model.
+
+        A full refit (or, when persistent, a rewrite of the on-disk dataset and index)
+        is scheduled in the background; the refit only happens once vocabulary drift
+        passes drift_threshold.
+        """
+        with self._write_lock:
+            base = self.current
+            if CLEAN_COLUMN in base.store.filters.flags:
+                jokes_df = label_clean(jokes_df)
+            store = base.store.with_rows(jokes_df)
+            new_texts = [store.text(i) for i in range(len(base.store), len(store))]
+            unknown, total = base.ranker.vocabulary_drift(new_texts)
+            self.unknown_tokens += unknown
+            self.total_tokens += total
+            snapshot = self.swap(store, base.ranker.with_jokes(store.texts, new_texts))
+
+        refit_needed = self.total_tokens >= self.min_drift_tokens and self.drift > self.drift_threshold
+        if self.persistent:
+            self._run_in_background(self._persist, jokes_df)
+        elif refit_needed:
+            self._run_in_background(self._refit)
+        return {
+            'added': len(new_texts),
+            'total': len(snapshot.store),
+            'drift': round(self.drift, 4),
+            'refit_scheduled': refit_needed,
+            'version': snapshot.version,
+        }
+
+    def _run_in_background(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self._background = thread
+
+    def wait(self, timeout=None):
+        """Wait for the latest background refit or persist to finish."""
+        if self._background is not None:
+            self._background.join(timeout)
+
+    def _refit(self):
+        """Refit TF-IDF and SVD on the whole corpus, then swap, replaying jokes ingested meanwhile."""
+        base = self.current
+        ranker = JokeRanker(
+            base.store.texts,
+            n_components=base.ranker.reducer.n_components,
+            index_type=base.ranker.index_type,
+            index_params=base.ranker.index_params,
+            search_mode=base.ranker.search_mode,
+            search_params=base.ranker.search_params,
+        )
+        with self._write_lock:
+            latest = self.current
+            if len(latest.store) > len(base.store):
+                ranker = ranker.with_jokes(
+                    latest.store.texts, [latest.store.text(i) for i in range(len(base.store), len(latest.store))]
+                )
+            self.unknown_tokens = self.total_tokens = 0
+            self.swap(latest.store, ranker)
+
+    def _persist(self, jokes_df):
+        """Write ingested jokes to dataset.csv and a new index version, then load it."""
+        ranker = self.current.ranker
+        summary = ingest_offline(
+            jokes_df, self.dataset_path, self.index_dir, self.drift_threshold, self.min_drift_tokens,
+            index_type=ranker.index_type, index_params=ranker.index_params,
+            search_mode=ranker.search_mode, search_params=ranker.search_params,
+        )
+        if summary['refit']:
+            self.unknown_tokens = self.total_tokens = 0
+        self.reload_if_changed()
+
+    def reload_if_changed(self):
+        """Swap to the on-disk index if another process published a new version."""
+        version_dir = current_version_dir(self.index_dir) if self.index_dir else None
+        if version_dir is None or version_dir == self.loaded_version_dir:
+            return False
+        ranker = self.current.ranker
+        try:
+            store = JokeStore.from_csv(self.dataset_path)
+            new_ranker = JokeRanker.from_index(
+                store.texts, self.index_dir, dataset_hash(self.dataset_path),
+                index_type=ranker.index_type, index_params=ranker.index_params,
+                search_mode=ranker.search_mode, search_params=ranker.search_params,
+            )
+        except (OSError, ValueError) as e:
+            # The dataset and index are mid-update; try again on the next poll
+            log_event(logger, 'index_reload_skipped', logging.WARNING, error=str(e))
+            return False
+        with self._write_lock:
+            self.loaded_version_dir = os.path.join(self.index_dir, new_ranker.version)
+            self.swap(store, new_ranker)
+        log_event(logger, 'index_reloaded', version=new_ranker.version, jokes=len(store))
+        return True
+
+    def start_polling(self, interval):
+        """Check for new on-disk index versions every interval seconds in a daemon thread."""
+        def poll():
+            while not stop.wait(interval):
+                self.reload_if_changed()
+
+        stop = threading.Event()
+        threading.Thread(target=poll, daemon=True).start()
+        return stop
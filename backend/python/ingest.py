@@ -0,0 +1,119 @@
+import contextlib
+import json
+import os
+import pandas as pd
+from python.joke_index import dataset_hash
+from python.joke_ranker import JokeRanker
+from python.joke_store import JokeStore
+from python.profanity_filter import CLEAN_COLUMN, label_clean
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; ingestion then relies on a single writer
+    fcntl = None
+
+LOCK_FILE = ".ingest.lock"
+
+# Columns every ingested joke gets, matching dataset.csv
+JOKE_COLUMNS = ['id', 'title', 'body', 'category']
+
+
+def normalize_jokes(records):
+    """Turn scraped joke dicts (reddit.py, wocka.py, stupidstuff.py output) into dataset rows."""
+    jokes_df = pd.DataFrame.from_records(list(records))
+    for column in JOKE_COLUMNS:
+        if column not in jokes_df:
+            jokes_df[column] = None
+    jokes_df = jokes_df[jokes_df['body'].notna() | jokes_df['title'].notna()]
+    return jokes_df.reset_index(drop=True)
+
+
+def load_scraped_jokes(path):
+    """Load a scraper output file: a JSON list, or JSON Lines with one joke per line."""
+    with open(path) as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == '[':
+            records = json.load(f)
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+    return normalize_jokes(records)
+
+
+@contextlib.contextmanager
+def index_lock(index_dir):
+    """Hold an exclusive lock on the index directory while rewriting the dataset and index."""
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, LOCK_FILE), "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def append_to_dataset(dataset_path, jokes_df):
+    """Append rows to dataset.csv, keeping its existing columns; returns the rows as written.
+
+    If the dataset carries precomputed clean labels, the new rows are scored too.
+    """
+    if os.path.exists(dataset_path):
+        columns = pd.read_csv(dataset_path, nrows=0).columns.tolist()
+        if CLEAN_COLUMN in columns:
+            jokes_df = label_clean(jokes_df)
+        jokes_df = jokes_df.reindex(columns=columns)
+        jokes_df.to_csv(dataset_path, mode='a', header=False, index=False)
+    else:
+        jokes_df.to_csv(dataset_path, index=False)
+    return jokes_df
+
+
+def ingest_offline(jokes_df, dataset_path, index_dir, drift_threshold=0.2, min_drift_tokens=500, **ranker_params):
+    """Append jokes to dataset.csv and write a matching index version without a full refit.
+
+    New jokes are projected with the current index's vectorizer and SVD. The model is
+    refit from scratch only if there is no usable index, or once the share of
+    out-of-vocabulary tokens among all jokes ingested since the last fit (tracked in the
+    index metadata) exceeds drift_threshold. Running workers pick up the new version
+    through IndexManager.reload_if_changed.
+    """
+    with index_lock(index_dir):
+        try:
+            store = JokeStore.from_csv(dataset_path)
+            ranker = JokeRanker.from_index(store.texts, index_dir, dataset_hash(dataset_path), **ranker_params)
+        except (OSError, ValueError):
+            store, ranker = None, None
+
+        append_to_dataset(dataset_path, jokes_df)
+        new_store = JokeStore.from_csv(dataset_path)
+        start = len(store) if store is not None else 0
+        new_texts = [new_store.text(i) for i in range(start, len(new_store))]
+
+        unknown = total = 0
+        if ranker is not None:
+            unknown, total = ranker.vocabulary_drift(new_texts)
+            unknown += ranker.index_meta.get('drift_unknown_tokens', 0)
+            total += ranker.index_meta.get('drift_total_tokens', 0)
+        drift = unknown / total if total else 0.0
+        refit = ranker is None or (total >= min_drift_tokens and drift > drift_threshold)
+        if refit:
+            ranker = JokeRanker(new_store.texts, **ranker_params)
+            unknown = total = 0
+        else:
+            ranker = ranker.with_jokes(new_store.texts, new_texts)
+        version_dir = ranker.save(
+            index_dir, dataset_hash(dataset_path),
+            extra_meta={'drift_unknown_tokens': unknown, 'drift_total_tokens': total},
+        )
+
+    return {
+        'added': len(new_texts),
+        'total': len(new_store),
+        'drift': round(drift, 4),
+        'refit': refit,
+        'index_version': os.path.basename(version_dir),
+    }
@@ -0,0 +1,107 @@
+import numpy as np
+from scipy import sparse
+
+
+class InvertedIndex:
+    """BM25 over term-major postings of raw term counts, with max-score pruning.
+
+    The postings are a CSC (jokes x terms) matrix of counts under the TF-IDF vocabulary:
+    for term t, tf.indices[tf.indptr[t]:tf.indptr[t + 1]] are the jokes containing it in
+    increasing order. Each posting's BM25 contribution (its impact) is computed once, along
+    with each term's largest impact, which bounds what the term can add to any joke.
+    """
+
+    def __init__(self, tf, k1=1.2, b=0.75):
+        self.tf = sparse.csc_matrix(tf)
+        self.tf.sort_indices()
+        self.k1 = k1
+        self.b = b
+        self.n_docs, self.n_terms = self.tf.shape
+
+        docs = self.tf.indices
+        counts = self.tf.data.astype(np.float32)
+        lengths = np.bincount(docs, weights=counts, minlength=self.n_docs).astype(np.float32)
+        average = float(lengths.mean()) if self.n_docs and lengths.mean() > 0 else 1.0
+        df = np.diff(self.tf.indptr)
+        idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        term_of_posting = np.repeat(np.arange(self.n_terms), df)
+        norm = self.k1 * (1.0 - self.b + self.b * lengths[docs] / average)
+        self.impacts = (idf[term_of_posting] * counts * (self.k1 + 1.0) / (counts + norm)).astype(np.float32)
+        self.max_impact = np.zeros(self.n_terms, dtype=np.float32)
+        nonempty = df > 0
+        self.max_impact[nonempty] = np.maximum.reduceat(self.impacts, self.tf.indptr[:-1][nonempty])
+
+    @classmethod
+    def from_postings(cls, indptr, docs, counts, n_docs, **params):
+        """Wrap postings saved by save_index (term-major indptr, joke ids, counts)."""
+        return cls(postings_matrix(indptr, docs, counts, n_docs), **params)
+
+    def with_docs(self, new_tf):
+        """Return an index with the rows of new_tf (jokes x terms counts) appended as new jokes."""
+        return InvertedIndex(sparse.vstack([self.tf, new_tf], format='csc'), self.k1, self.b)
+
+    def postings(self, term):
+        start, end = self.tf.indptr[term], self.tf.indptr[term + 1]
+        return self.tf.indices[start:end], self.impacts[start:end]
+
+    def search(self, terms, k, rows=None, prune=True):
+        """Return the k best (jokes, BM25 scores) for a query's term ids, best first.
+
+        Terms are scored one at a time, highest max impact first. Once the k-th best score
+        so far beats the sum of the remaining terms' max impacts, no unseen joke can enter
+        the top k, so the remaining (typically long, low-idf) postings are only probed for
+        the jokes that can still make it. The result is the same as scoring every posting.
+        rows optionally restricts results to those jokes.
+        """
+        terms = np.unique(np.asarray(terms, dtype=np.int64))
+        terms = terms[self.max_impact[terms] > 0]
+        if len(terms) == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        terms = terms[np.argsort(-self.max_impact[terms], kind='stable')]
+        remaining = np.concatenate([np.cumsum(self.max_impact[terms][::-1])[::-1][1:], [0.0]])
+
+        allowed = None
+        if rows is not None:
+            allowed = np.zeros(self.n_docs, dtype=bool)
+            allowed[rows] = True
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        seen = np.zeros(self.n_docs, dtype=bool)
+        touched = []
+        candidates = None
+        for term, rest in zip(terms, remaining):
+            docs, impacts = self.postings(term)
+            if candidates is None:
+                # Every joke is still a possible result: score the whole posting list
+                scores[docs] += impacts
+                new = docs[~seen[docs]]
+                seen[new] = True
+                touched.append(new if allowed is None else new[allowed[new]])
+                if not prune:
+                    continue
+                candidates_so_far = np.concatenate(touched)
+                threshold = _kth_largest(scores[candidates_so_far], k)
+                if threshold > rest:
+                    candidates = candidates_so_far[scores[candidates_so_far] + rest >= threshold]
+            else:
+                # Only jokes already seen can reach the top k: probe their positions in the list
+                positions = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+                found = docs[positions] == candidates
+                scores[candidates[found]] += impacts[positions[found]]
+                threshold = _kth_largest(scores[candidates], k)
+                candidates = candidates[scores[candidates] + rest >= threshold]
+
+        if candidates is None:
+            candidates = np.concatenate(touched)
+        best = candidates[np.argsort(-scores[candidates], kind='stable')[:k]]
+        return best, scores[best]
+
+
+def postings_matrix(indptr, docs, counts, n_docs):
+    """The (jokes x terms) CSC count matrix over postings saved by save_index, without copying them."""
+    return sparse.csc_matrix((counts, docs, indptr), shape=(n_docs, len(indptr) - 1), copy=False)
+
+
+def _kth_largest(values, k):
+    if len(values) < k:
+        return 0.0
+    return float(np.partition(values, len(values) - k)[len(values) - k])
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import random
+import numpy as np
+
+
+class JokeCatalog:
+    """Per-snapshot precomputed data behind the browse endpoints.
+
+    Built once for each live (store, ranker) snapshot: the /categories and /debug/jokes
+    bodies serialized to JSON with their ETags. A random joke within a category and/or
+    clean is one randrange over the store's JokeFilters.eligible_rows, which are cached per
+    filter, so /joke/random matches categories exactly as search does. The sorted 'id'
+    column used to find a joke's row is built on first use.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        store = snapshot.store
+        filters = store.filters
+        self.n_rows = len(store)
+        self._ids = None
+
+        self.categories_body, self.categories_etag = self._encode(filters.names)
+        self.debug_body, self.debug_etag = self._encode({
+            "total_jokes": len(store),
+            "joke_texts": len(snapshot.ranker.jokes),
+            "index_version": snapshot.version,
+            "categories": filters.names,
+            "sample_jokes": [store.record(i) for i in range(min(3, len(store)))],
+        })
+
+    def _encode(self, payload):
+        body = json.dumps(payload).encode() + b"\n"
+        return body, f"{self.version}-{hashlib.sha1(body).hexdigest()[:12]}"
+
+    def random_row(self, category="", clean=False):
+        """Return a uniformly random row, or None if no joke matches.
+
+        category matches like the search filter (see JokeFilters.filter_key): any category
+        containing it, case-insensitively, and '' or 'general' for all. clean is ignored
+        when the dataset has no clean labels, as in search.
+        """
+        rows = self.snapshot.store.filters.eligible_rows(category, ('clean',) if clean else ())
+        if rows is None:
+            return random.randrange(self.n_rows) if self.n_rows else None
+        return int(rows[random.randrange(len(rows))]) if len(rows) else None
+
+    def _id_index(self):
+        """(sorted ids, their rows) for the dataset's 'id' column; None if it has none."""
+        if self._ids is None:
+            store = self.snapshot.store
+            column = store.columns.get('id')
+            if column is None:
+                self._ids = ()
+            else:
+                if not isinstance(column, np.ndarray):
+                    column = np.array(['' if column[i] is None else column[i] for i in range(len(column))])
+                order = np.argsort(column, kind='stable')
+                self._ids = (column[order], order)
+        return self._ids or None
+
+    def row_of(self, joke_id):
+        """Row of the joke whose 'id' is joke_id (a string, as it arrives in a URL); None if unknown.
+
+        Without an 'id' column the id is the row number. Numeric columns match the id's
+        numeric value, so '7' and '7.0' find the same joke; if ids repeat, the first row wins.
+        """
+        index = self._id_index()
+        if index is None:
+            return int(joke_id) if joke_id.isdigit() and int(joke_id) < self.n_rows else None
+        ids, rows = index
+        if ids.dtype.kind in 'iufb':
+            try:
+                joke_id = float(joke_id)
+            except ValueError:
+                return None
+        position = np.searchsorted(ids, joke_id)
+        if position < len(ids) and ids[position] == joke_id:
+            return int(rows[position])
+        return None
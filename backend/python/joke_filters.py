@@ -0,0 +1,98 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# Boolean dataset columns that queries can filter on (e.g. sentiment 'clean')
+FLAG_COLUMNS = ('clean',)
+
+
+class JokeFilters:
+    """Integer-coded category column plus boolean flag columns for pre-filtered search.
+
+    Rows are grouped per category code as CSR-style postings (order/offsets), so the rows
+    eligible for a filter are a union of slices instead of a scan over the category strings.
+    Eligible row sets are cached per (category, flags) and returned as sorted int arrays.
+    """
+
+    def __init__(self, categories, flags=None, max_cached_filters=1024):
+        codes, names = pd.factorize(pd.Series(categories, dtype=object), use_na_sentinel=True)
+        self.codes = codes.astype(np.int32)
+        self.names = [str(name) for name in names]
+        self.n_rows = len(self.codes)
+        self.flags = {name: np.asarray(mask, dtype=bool) for name, mask in (flags or {}).items()}
+
+        # Rows with a missing category (code -1) are never eligible for a category filter
+        self.order = np.argsort(self.codes, kind='stable').astype(np.int64)
+        counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.names))
+        self.offsets = np.full(len(self.names) + 1, int(np.sum(self.codes < 0)), dtype=np.int64)
+        self.offsets[1:] += np.cumsum(counts)
+
+        self.max_cached_filters = max_cached_filters
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, jokes_df):
+        """Build filters from the dataset's category column and any flag columns it has."""
+        categories = jokes_df['category'] if 'category' in jokes_df else [None] * len(jokes_df)
+        flags = {
+            name: jokes_df[name].fillna(False).astype(bool).to_numpy()
+            for name in FLAG_COLUMNS if name in jokes_df
+        }
+        return cls(categories, flags)
+
+    def values(self):
+        """Decode the category codes back to an object array (None where missing)."""
+        names = np.array(self.names + [None], dtype=object)
+        return names[self.codes]
+
+    def set_flag(self, name, mask):
+        """Add or replace a boolean flag column and drop cached row sets."""
+        with self._lock:
+            self.flags[name] = np.asarray(mask, dtype=bool)
+            self._cache.clear()
+
+    def category_rows(self, code):
+        """Return the rows with the given category code."""
+        return self.order[self.offsets[code]:self.offsets[code + 1]]
+
+    def matching_codes(self, category):
+        """Codes of every category containing the filter text, case-insensitively."""
+        needle = category.lower()
+        return [code for code, name in enumerate(self.names) if needle in name.lower()]
+
+    def filter_key(self, category="", flags=()):
+        """Normalize a filter to (category, flags): the category stripped and lowercased ('' for
+        none or 'general'), and the sorted flags this dataset has. Equal keys select equal rows."""
+        category = (category or '').strip().lower()
+        if category == 'general':
+            category = ''
+        return category, tuple(sorted(set(flag for flag in flags if flag in self.flags)))
+
+    def is_active(self, category="", flags=()):
+        """Whether the filter restricts the corpus at all ('general' means no category)."""
+        return self.filter_key(category, flags) != ('', ())
+
+    def eligible_rows(self, category="", flags=()):
+        """Return the sorted rows passing the category and flag filters, or None if unfiltered."""
+        key = self.filter_key(category, flags)
+        if key == ('', ()):
+            return None
+        with self._lock:
+            rows = self._cache.get(key)
+        if rows is not None:
+            return rows
+
+        if key[0]:
+            codes = self.matching_codes(key[0])
+            rows = np.sort(np.concatenate([self.category_rows(c) for c in codes])) if codes else np.empty(0, dtype=np.int64)
+        else:
+            rows = np.arange(self.n_rows, dtype=np.int64)
+        for flag in key[1]:
+            rows = rows[self.flags[flag][rows]]
+
+        with self._lock:
+            if len(self._cache) >= self.max_cached_filters:
+                self._cache.clear()
+            self._cache[key] = rows
+        return rows
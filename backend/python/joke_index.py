@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+from python.neighbour_graph import NeighbourGraph
+
+# Bump whenever the layout of files inside an index version changes.
+# 2: the trained vector index (IVF centroids and assignments) is saved alongside.
+# 3: quantized indexes save their codes, and PQ its codebook, alongside too.
+FORMAT_VERSION = 3
+
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+VOCABULARY_FILE = "vocabulary.json"
+IDF_FILE = "idf.npy"
+COMPONENTS_FILE = "components.npy"
+REDUCED_FILE = "joke_reduced.npy"
+# Optional term-major postings (raw term counts) for the BM25 inverted index
+POSTINGS_INDPTR_FILE = "postings_indptr.npy"
+POSTINGS_DOCS_FILE = "postings_docs.npy"
+POSTINGS_COUNTS_FILE = "postings_counts.npy"
+# Optional precomputed "more like this" neighbours (CSR, see neighbour_graph.py)
+NEIGHBOURS_INDPTR_FILE = "neighbours_indptr.npy"
+NEIGHBOURS_IDS_FILE = "neighbours_ids.npy"
+NEIGHBOURS_SCORES_FILE = "neighbours_scores.npy"
+# Optional trained vector index state: one vector_<name>.npy per array of VectorIndex.state()
+VECTOR_INDEX_PREFIX = "vector_"
+
+
+def dataset_hash(dataset_path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a dataset file."""
+    digest = hashlib.sha256()
+    with open(dataset_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def current_version_dir(index_dir):
+    """Return the directory of the active index version, or None if there is none."""
+    try:
+        with open(os.path.join(index_dir, CURRENT_FILE)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(index_dir, version)
+
+
+def save_index(index_dir, vocabulary, idf, components, joke_reduced, data_hash, keep_versions=2, extra_meta=None,
+               postings=None, neighbours=None, vector_index=None):
+    """Write a fitted model as a new index version and atomically make it current.
+
+    Each build goes into its own sub-directory and the CURRENT pointer is swapped with
+    os.replace, so workers that already memory-mapped an older version keep reading it.
+    postings is an optional (indptr, joke ids, counts) term-major CSR of term counts, and
+    neighbours an optional NeighbourGraph of each joke's most similar jokes, and
+    vector_index an optional (kind, params, state arrays) of the trained vector index, so
+    workers load it instead of training it again.
+    """
+    version = f"v{FORMAT_VERSION}-{data_hash[:12]}-{time.time_ns()}"
+    version_dir = os.path.join(index_dir, version)
+    os.makedirs(version_dir)
+
+    np.save(os.path.join(version_dir, IDF_FILE), np.asarray(idf, dtype=np.float64))
+    np.save(os.path.join(version_dir, COMPONENTS_FILE), np.asarray(components, dtype=np.float32))
+    np.save(os.path.join(version_dir, REDUCED_FILE), np.asarray(joke_reduced, dtype=np.float32))
+    with open(os.path.join(version_dir, VOCABULARY_FILE), "w") as f:
+        json.dump(list(vocabulary), f)
+    if postings is not None:
+        indptr, docs, counts = postings
+        # One index dtype for both arrays, so scipy can wrap the memory maps without copying
+        index_dtype = np.int32 if len(docs) < 2 ** 31 else np.int64
+        np.save(os.path.join(version_dir, POSTINGS_INDPTR_FILE), np.asarray(indptr, dtype=index_dtype))
+        np.save(os.path.join(version_dir, POSTINGS_DOCS_FILE), np.asarray(docs, dtype=index_dtype))
+        np.save(os.path.join(version_dir, POSTINGS_COUNTS_FILE), np.asarray(counts, dtype=np.float32))
+    if neighbours is not None:
+        np.save(os.path.join(version_dir, NEIGHBOURS_INDPTR_FILE), np.asarray(neighbours.indptr, dtype=np.int64))
+        np.save(os.path.join(version_dir, NEIGHBOURS_IDS_FILE), np.asarray(neighbours.ids, dtype=np.int32))
+        np.save(os.path.join(version_dir, NEIGHBOURS_SCORES_FILE), np.asarray(neighbours.scores, dtype=np.float16))
+    vector_meta = None
+    if vector_index is not None:
+        kind, params, arrays = vector_index
+        for name, array in arrays.items():
+            np.save(os.path.join(version_dir, f"{VECTOR_INDEX_PREFIX}{name}.npy"), np.asarray(array))
+        vector_meta = {'kind': kind, 'params': params, 'arrays': sorted(arrays)}
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'dataset_hash': data_hash,
+        'n_jokes': int(joke_reduced.shape[0]),
+        'n_components': int(components.shape[0]),
+        'n_terms': len(vocabulary),
+        'n_postings': int(len(postings[1])) if postings is not None else 0,
+        'n_neighbours': neighbours.max_degree if neighbours is not None else 0,
+        'vector_index': vector_meta,
+        'created_at': time.time(),
+        **(extra_meta or {}),
+    }
+    with open(os.path.join(version_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    pointer_tmp = os.path.join(index_dir, CURRENT_FILE + ".tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(index_dir, CURRENT_FILE))
+
+    _prune_versions(index_dir, keep_versions)
+    return version_dir
+
+
+def _prune_versions(index_dir, keep_versions):
+    """Delete all but the newest keep_versions index versions."""
+    versions = sorted(
+        (name for name in os.listdir(index_dir)
+         if os.path.isdir(os.path.join(index_dir, name))),
+        key=lambda name: os.path.getmtime(os.path.join(index_dir, name)),
+    )
+    for name in versions[:-keep_versions]:
+        shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+
+
+def load_index(index_dir, expected_hash=None):
+    """Load the current index version, memory-mapping the large matrices.
+
+    Raises FileNotFoundError if no index has been built and ValueError if the index was
+    written in another format version or for a different dataset.
+    """
+    version_dir = current_version_dir(index_dir)
+    if version_dir is None:
+        raise FileNotFoundError(f"No search index found in {index_dir}")
+
+    with open(os.path.join(version_dir, META_FILE)) as f:
+        meta = json.load(f)
+    if meta.get('format_version') != FORMAT_VERSION:
+        raise ValueError(
+            f"Index format version {meta.get('format_version')} is not supported "
+            f"(expected {FORMAT_VERSION}); rebuild the index."
+        )
+    if expected_hash is not None and meta['dataset_hash'] != expected_hash:
+        raise ValueError("Index is stale: it was built from a different dataset; rebuild the index.")
+
+    with open(os.path.join(version_dir, VOCABULARY_FILE)) as f:
+        vocabulary = json.load(f)
+
+    postings = None
+    if os.path.exists(os.path.join(version_dir, POSTINGS_INDPTR_FILE)):
+        postings = tuple(
+            np.load(os.path.join(version_dir, name), mmap_mode='r')
+            for name in (POSTINGS_INDPTR_FILE, POSTINGS_DOCS_FILE, POSTINGS_COUNTS_FILE)
+        )
+
+    neighbours = None
+    if os.path.exists(os.path.join(version_dir, NEIGHBOURS_INDPTR_FILE)):
+        neighbours = NeighbourGraph(*(
+            np.load(os.path.join(version_dir, name), mmap_mode='r')
+            for name in (NEIGHBOURS_INDPTR_FILE, NEIGHBOURS_IDS_FILE, NEIGHBOURS_SCORES_FILE)
+        ))
+
+    vector_index = None
+    if meta.get('vector_index'):
+        vector_index = dict(meta['vector_index'], arrays={
+            name: np.load(os.path.join(version_dir, f"{VECTOR_INDEX_PREFIX}{name}.npy"), mmap_mode='r')
+            for name in meta['vector_index']['arrays']
+        })
+
+    return {
+        'meta': meta,
+        'path': version_dir,
+        'vocabulary': vocabulary,
+        'idf': np.load(os.path.join(version_dir, IDF_FILE)),
+        'components': np.load(os.path.join(version_dir, COMPONENTS_FILE)),
+        'joke_reduced': np.load(os.path.join(version_dir, REDUCED_FILE), mmap_mode='r'),
+        'postings': postings,
+        'neighbours': neighbours,
+        'vector_index': vector_index,
+    }
@@ -1,40 +1,339 @@
+import copy
+import hashlib
+import os
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 from python.svd_reducer import SVDReducer
 from python.text_utils import preprocess
+from python.joke_index import load_index, save_index
+from python.vector_index import make_vector_index
+from scipy import sparse
+from python.inverted_index import InvertedIndex, postings_matrix
+from python.neighbour_graph import build_neighbour_graph
+from python.metrics import stage_timer
+
+# 'svd' ranks by cosine in the SVD space; 'hybrid' fetches BM25 candidates and reranks them by cosine
+SEARCH_MODES = ('svd', 'hybrid')
+
+# With diversity on, this many times top_n results are fetched before near-duplicates are dropped
+DIVERSITY_OVERFETCH = 3
+
 
 class JokeRanker:
-    def __init__(self, joke_data, n_components=100):
+    def __init__(self, joke_data, n_components=100, index_type='exact', index_params=None,
+                 search_mode='svd', search_params=None):
         """Initialize the joke ranker with jokes data and SVD support."""
         if isinstance(joke_data, str):
             self.jokes = self.load_jokes_from_file(joke_data)
         else:
             self.jokes = joke_data
 
-       
-        self.jokes_cleaned = [preprocess(joke) for joke in self.jokes]
+        # The cleaned texts and full TF-IDF matrix are only needed while fitting, so they are not kept
+        jokes_cleaned = [preprocess(joke) for joke in self.jokes]
 
-    
         self.vectorizer = TfidfVectorizer(stop_words='english')
-        self.joke_vectors = self.vectorizer.fit_transform(self.jokes_cleaned)
+        joke_vectors = self.vectorizer.fit_transform(jokes_cleaned)
 
         # Apply SVD
         self.reducer = SVDReducer(n_components=n_components)
-        self.joke_reduced = self.reducer.fit(self.joke_vectors)
+        self.joke_reduced = self.reducer.fit(joke_vectors)
+        self.joke_tf = self.term_counts(jokes_cleaned).tocsc()
+        self.inverted_index = None
+        self.neighbour_graph = None
+        self.stored_vector_index = None
+        self.index_meta = None
+        self.version = 'fitted'
+        self.use_vector_index(index_type, **(index_params or {}))
+        self.use_search_mode(search_mode, **(search_params or {}))
+
+    @classmethod
+    def from_index(cls, joke_data, index_dir, data_hash=None, index_type='exact', index_params=None,
+                   search_mode='svd', search_params=None):
+        """Create a ranker from a persisted index instead of refitting TF-IDF and SVD."""
+        index = load_index(index_dir, expected_hash=data_hash)
+        ranker = cls.__new__(cls)
+        if isinstance(joke_data, str):
+            ranker.jokes = ranker.load_jokes_from_file(joke_data)
+        else:
+            ranker.jokes = joke_data
+        if len(ranker.jokes) != index['meta']['n_jokes']:
+            raise ValueError(
+                f"Index has {index['meta']['n_jokes']} jokes but {len(ranker.jokes)} were given; rebuild the index."
+            )
+
+        vocabulary = {term: i for i, term in enumerate(index['vocabulary'])}
+        ranker.vectorizer = TfidfVectorizer(stop_words='english', vocabulary=vocabulary)
+        ranker.vectorizer.idf_ = index['idf']
+        ranker.reducer = SVDReducer.from_components(index['components'])
+        ranker.joke_reduced = index['joke_reduced']
+        # Indexes built before postings were saved can only be searched in 'svd' mode
+        ranker.joke_tf = None
+        if index['postings'] is not None:
+            ranker.joke_tf = postings_matrix(*index['postings'], n_docs=len(ranker.jokes))
+        ranker.inverted_index = None
+        # Indexes built without --neighbours answer similar_indices with a vector search
+        ranker.neighbour_graph = index['neighbours']
+        ranker.stored_vector_index = index['vector_index']
+        ranker.index_meta = index['meta']
+        ranker.version = os.path.basename(index['path'])
+        ranker.use_vector_index(index_type, **(index_params or {}))
+        ranker.use_search_mode(search_mode, **(search_params or {}))
+        return ranker
+
+    def use_vector_index(self, index_type, **index_params):
+        """Switch the nearest-neighbour backend ('exact' or 'ivf') used by rank_jokes.
+
+        If the loaded index version saved a trained backend of this kind and parameters,
+        its arrays are reused (memory-mapped) instead of training it again.
+        """
+        self.index_type = index_type
+        self.index_params = index_params
+        stored = self.stored_vector_index
+        state = {}
+        if stored is not None and stored['kind'] == index_type and stored['params'] == index_params:
+            state = stored['arrays']
+        self.vector_index = make_vector_index(index_type, self.joke_reduced, **index_params, **state)
+
+    def use_search_mode(self, search_mode, candidates=100, svd_weight=0.5, diversity=None):
+        """Switch between 'svd' and 'hybrid' ranking.
+
+        In hybrid mode the BM25 inverted index fetches `candidates` jokes and each is scored
+        svd_weight * cosine + (1 - svd_weight) * BM25 / (best BM25 among the candidates).
+        If diversity is set, results whose SVD cosine to a better result reaches it are
+        dropped (see diversify).
+
+        The BM25 index is built from the postings (joke_tf) the first time hybrid mode is
+        chosen; in 'svd' mode only the memory-mapped postings are held.
+        """
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{search_mode}'; expected one of {list(SEARCH_MODES)}")
+        if search_mode == 'hybrid' and self.inverted_index is None and self.joke_tf is not None:
+            self.inverted_index = InvertedIndex(self.joke_tf)
+        self.search_mode = search_mode
+        self.search_params = {'candidates': candidates, 'svd_weight': svd_weight, 'diversity': diversity}
+
+    @property
+    def hybrid(self):
+        return self.search_mode == 'hybrid' and self.inverted_index is not None
+
+    def with_jokes(self, jokes, new_jokes):
+        """Return a ranker over jokes, whose tail is new_jokes, without refitting.
+
+        The new jokes are projected with the already-fitted vectorizer and SVD and appended
+        to joke_reduced; this ranker is left untouched so readers can keep using it.
+        """
+        new_reduced = self.embed_texts(new_jokes)
+        ranker = copy.copy(self)
+        ranker.jokes = jokes
+        ranker.joke_reduced = np.concatenate([np.asarray(self.joke_reduced), new_reduced])
+        if self.joke_tf is not None:
+            new_counts = self.term_counts([preprocess(text) for text in new_jokes])
+            if self.inverted_index is not None:
+                ranker.inverted_index = self.inverted_index.with_docs(new_counts)
+                ranker.joke_tf = ranker.inverted_index.tf
+            else:
+                # Not searched in 'svd' mode: only the counts that save writes are appended
+                ranker.joke_tf = sparse.vstack([self.joke_tf, new_counts], format='csc')
+        # The suffix names the content, so workers that ingested different batches (sharing a
+        # result cache through JOKE_CACHE_PATH) never end up with the same version
+        digest = hashlib.sha1('\0'.join(new_jokes).encode('utf-8')).hexdigest()[:12]
+        ranker.version = f"{self.version}+{len(new_jokes)}-{digest}"
+        # Reuse the trained backend: only the new rows are assigned or encoded
+        ranker.vector_index = self.vector_index.with_rows(ranker.joke_reduced)
+        return ranker
+
+    def build_neighbours(self, k=10, min_score=None, workers=None):
+        """Precompute every joke's k most similar jokes (see neighbour_graph.build_neighbour_graph)."""
+        self.neighbour_graph = build_neighbour_graph(self.joke_reduced, k, min_score=min_score, workers=workers)
+        return self.neighbour_graph
+
+    def vocabulary_drift(self, texts):
+        """Return (unknown_tokens, total_tokens) for texts under the fitted vocabulary."""
+        analyzer = self.vectorizer.build_analyzer()
+        vocabulary = self.vectorizer.vocabulary_
+        unknown = total = 0
+        for text in texts:
+            tokens = analyzer(preprocess(text))
+            total += len(tokens)
+            unknown += sum(1 for token in tokens if token not in vocabulary)
+        return unknown, total
+
+    def save(self, index_dir, data_hash, extra_meta=None):
+        """Persist the fitted vocabulary, IDF weights, SVD components, reduced matrix, postings,
+        neighbours and the trained vector index."""
+        postings = None
+        if self.joke_tf is not None:
+            tf = self.joke_tf
+            postings = (tf.indptr, tf.indices, tf.data)
+        # Jokes appended since the graph was built are saved with empty entries, which
+        # similar_indices answers with a vector search
+        neighbours = self.neighbour_graph
+        if neighbours is not None and len(neighbours) < len(self.joke_reduced):
+            neighbours = neighbours.with_rows(len(self.joke_reduced))
+        state = self.vector_index.state()
+        vector_index = (self.index_type, self.index_params, state) if state else None
+        return save_index(
+            index_dir,
+            self.vectorizer.get_feature_names_out().tolist(),
+            self.vectorizer.idf_,
+            self.reducer.components,
+            self.joke_reduced,
+            data_hash,
+            extra_meta=extra_meta,
+            postings=postings,
+            neighbours=neighbours,
+            vector_index=vector_index,
+        )
 
     def load_jokes_from_file(self, joke_file):
         """Load jokes from a CSV file."""
         df = pd.read_csv(joke_file)
         return df['joke'].fillna("").tolist()
 
-    def rank_jokes(self, query, top_n=5):
-        """Rank jokes based on cosine similarity in SVD-reduced space."""
-        cleaned_query = preprocess(query)  
-        query_vec = self.vectorizer.transform([cleaned_query])
-        query_reduced = self.reducer.transform(query_vec)
+    def term_counts(self, cleaned_texts):
+        """Raw (jokes x terms) counts under the fitted vocabulary, for already preprocessed texts."""
+        # TfidfVectorizer is a CountVectorizer; the parent transform skips the IDF weighting
+        return CountVectorizer.transform(self.vectorizer, cleaned_texts)
 
-        ranked_indices, similarities = self.reducer.compute_similarity(
-            query_reduced, self.joke_reduced, top_n
-        )
-        return [(self.jokes[i], similarities[i]) for i in ranked_indices]
+    def embed_texts(self, texts):
+        """Project a list of strings into the normalized SVD space as a (q, d) matrix."""
+        return self.reducer.transform(self.vectorizer.transform([preprocess(text) for text in texts]))
+
+    def embed_queries(self, queries):
+        """Like embed_texts, timing the vectorize and SVD stages of the search pipeline."""
+        with stage_timer('vectorize'):
+            query_vecs = self.vectorizer.transform([preprocess(query) for query in queries])
+        with stage_timer('svd_transform'):
+            return self.reducer.transform(query_vecs)
+
+    def fetch_size(self, top_n):
+        """Results to fetch for top_n, leaving room for diversify to drop near-duplicates."""
+        return top_n * DIVERSITY_OVERFETCH if self.search_params.get('diversity') else top_n
+
+    def diversify(self, indices, scores, top_n):
+        """Keep the best top_n results, skipping any whose cosine to a kept one reaches the diversity threshold.
+
+        Reposted jokes with small wording changes sit almost on top of each other in the SVD
+        space, so this keeps one of each without a dedup pass over the corpus.
+        """
+        threshold = self.search_params.get('diversity')
+        if not threshold or len(indices) <= 1:
+            return indices[:top_n], scores[:top_n]
+        vectors = np.asarray(self.joke_reduced[indices], dtype=np.float32)
+        similar = vectors @ vectors.T >= threshold
+        keep = []
+        for i in range(len(indices)):
+            if not similar[i, keep].any():
+                keep.append(i)
+                if len(keep) == top_n:
+                    break
+        return indices[keep], scores[keep]
+
+    def rank_indices(self, query, top_n=5, rows=None):
+        """Return the row indices and cosine scores of the best jokes, optionally only among rows."""
+        if self.hybrid:
+            indices, scores = self.rank_indices_hybrid(query, self.fetch_size(top_n), rows)
+        else:
+            query_reduced = self.embed_queries([query])
+            with stage_timer('similarity'):
+                indices, scores = self.vector_index.search(query_reduced[0], self.fetch_size(top_n), rows=rows)
+        return self.diversify(indices, scores, top_n)
+
+    def rank_indices_hybrid(self, query, top_n=5, rows=None):
+        """Fetch BM25 candidates from the inverted index and rerank them by blended score.
+
+        Queries with no indexed terms, or too few candidates, are filled from the SVD search.
+        """
+        with stage_timer('vectorize'):
+            query_vec = self.vectorizer.transform([preprocess(query)])
+        with stage_timer('retrieve'):
+            candidates, bm25 = self.inverted_index.search(
+                query_vec.indices, max(top_n, self.search_params['candidates']), rows=rows
+            )
+        with stage_timer('svd_transform'):
+            query_reduced = self.reducer.transform(query_vec)[0]
+        with stage_timer('similarity'):
+            if len(candidates) < top_n:
+                extra, _ = self.vector_index.search(query_reduced, top_n, rows=rows)
+                extra = extra[(extra >= 0) & ~np.isin(extra, candidates)][:top_n - len(candidates)]
+                candidates = np.concatenate([candidates, extra])
+                bm25 = np.concatenate([bm25, np.zeros(len(extra), dtype=np.float32)])
+            if len(candidates) == 0:
+                return candidates, bm25
+            weight = self.search_params['svd_weight']
+            cosine = np.asarray(self.joke_reduced[candidates], dtype=np.float32) @ query_reduced
+            scores = weight * cosine + (1.0 - weight) * bm25 / max(float(bm25.max()), 1e-12)
+            best = np.argsort(-scores, kind='stable')[:top_n]
+            return candidates[best], scores[best].astype(np.float32)
+
+    def similar_indices(self, row, top_n=5):
+        """Return the row indices and cosine scores of the jokes most similar to joke `row`.
+
+        Rows with an entry in the neighbour graph are answered from it with a slice; others
+        (no graph, jokes appended since the build, which have no or an empty entry, or top_n
+        beyond the stored k) fall back to a vector search with the joke's own vector.
+        """
+        fetched = self.fetch_size(top_n)
+        graph = self.neighbour_graph
+        indices = None
+        if graph is not None and row < len(graph) and fetched <= graph.max_degree:
+            with stage_timer('neighbours'):
+                indices, scores = graph.neighbours(row, fetched)
+        if indices is None or not len(indices):
+            with stage_timer('similarity'):
+                indices, scores = self.vector_index.search(
+                    np.asarray(self.joke_reduced[row], dtype=np.float32), fetched + 1
+                )
+                keep = (indices >= 0) & (indices != row)
+                indices, scores = indices[keep][:fetched], scores[keep][:fetched]
+        return self.diversify(indices, scores, top_n)
+
+    def rank_jokes(self, query, top_n=5, rows=None):
+        """Rank jokes based on cosine similarity in SVD-reduced space, optionally only among rows."""
+        ranked_indices, similarities = self.rank_indices(query, top_n, rows)
+        return [(self.jokes[i], score) for i, score in zip(ranked_indices, similarities)]
+
+    def rank_indices_batch(self, queries, top_n=5, rows=None):
+        """Rank many queries with one vectorizer transform, one projection and one scoring GEMM.
+
+        top_n is either one value for every query or a list with one value per query, and
+        rows is an optional list of per-query eligible row arrays (None for unfiltered).
+        Queries sharing the same row array are scored together in one GEMM.
+        Returns one (indices, scores) pair per query, in input order.
+        """
+        if not queries:
+            return []
+        top_ns = list(top_n) if isinstance(top_n, (list, tuple)) else [top_n] * len(queries)
+        rows = list(rows) if rows is not None else [None] * len(queries)
+        if self.hybrid:
+            # Candidate sets differ per query, so hybrid queries are ranked one at a time
+            return [
+                self.diversify(*self.rank_indices_hybrid(q, self.fetch_size(n), r), n)
+                for q, n, r in zip(queries, top_ns, rows)
+            ]
+        queries_reduced = self.embed_queries(queries)
+
+        groups = {}
+        for i, eligible in enumerate(rows):
+            groups.setdefault(id(eligible), []).append(i)
+
+        results = [None] * len(queries)
+        with stage_timer('similarity'):
+            for members in groups.values():
+                eligible = rows[members[0]]
+                ranked_indices, similarities = self.vector_index.search(
+                    queries_reduced[members], max(self.fetch_size(top_ns[i]) for i in members), rows=eligible
+                )
+                for i, indices, scores in zip(members, ranked_indices, similarities):
+                    fetched = self.fetch_size(top_ns[i])
+                    keep = indices[:fetched] >= 0
+                    results[i] = self.diversify(indices[:fetched][keep], scores[:fetched][keep], top_ns[i])
+        return results
+
+    def rank_jokes_batch(self, queries, top_n=5, rows=None):
+        """Like rank_indices_batch, but returns one list of (joke, score) pairs per query."""
+        return [
+            [(self.jokes[i], score) for i, score in zip(indices, scores)]
+            for indices, scores in self.rank_indices_batch(queries, top_n, rows)
+        ]
@@ -1,5 +1,13 @@
 from python.query_processing import QueryProcessor
-from profanity_check import predict
+from python.profanity_filter import CLEAN_COLUMN, score_clean
+
+def label_jokes(dataset):
+    """Precompute each joke's 'clean' flag in one batched profanity pass, skipping labeled jokes."""
+    unlabeled = [joke for joke in dataset if CLEAN_COLUMN not in joke]
+    clean = score_clean([joke['joke_text'] for joke in unlabeled])
+    for joke, is_clean in zip(unlabeled, clean):
+        joke[CLEAN_COLUMN] = bool(is_clean)
+    return dataset
 
 def retrieve_jokes(category, dataset):
     """Retrieves jokes based on the category while filtering out inappropriate content."""
@@ -10,10 +18,11 @@ def retrieve_jokes(category, dataset):
         if category.lower() in joke['category'].lower()
     ]
 
-    # Parses categorical jokes to return only clean jokes
+    # Scores any jokes that were not labeled up front, then keeps only clean jokes
+    label_jokes(category_jokes)
     clean_jokes = [
         joke for joke in category_jokes 
-        if predict([joke['joke_text']])[0] == 0
+        if joke[CLEAN_COLUMN]
     ]
     return clean_jokes
 
@@ -36,6 +45,7 @@ def main():
         {"id": 3, "joke_text": "Why did the scarecrow win an award? Because he was outstanding in his field!", "category": "Puns", "rating": 4},
         {"id": 4, "joke_text": "This joke contains an inappropriate word.", "category": "General", "rating": 3}
     ]
+    label_jokes(dataset)
     
     #inappropriate_words = {"fuck", "shit", "bitch", "cunt", "pussy", "shit"}  # Example filter words
     
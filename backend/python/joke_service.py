@@ -0,0 +1,340 @@
+import logging
+import os
+import threading
+import time
+from python.query_processing import QueryProcessor
+from python.metrics import REGISTRY, stage_timer
+from python.log_utils import DEFAULT_SAMPLE_RATE, get_logger, log_event
+
+logger = get_logger('service')
+
+# Query sentiments that map onto a joke flag column
+SENTIMENT_FLAGS = {'clean': 'clean'}
+
+
+class JokeService:
+    """The searchable corpus behind the Flask app, built once per process on demand.
+
+    Construction is cheap and imports nothing heavy. load() reads the dataset, memory-maps
+    the prebuilt index (or fits the ranker if it is missing or stale) and sets up the result
+    cache and index manager; it runs on the first request, on a /ready probe, or ahead of
+    time in a gunicorn master so forked workers start warm. Per-process background work
+    (index polling) starts in whichever process first serves a request.
+    """
+
+    def __init__(self, dataset_path, index_dir, vector_index_type='exact', cache_size=1024,
+                 cache_ttl=None, cache_path=None, drift_threshold=0.2, index_poll_seconds=30,
+                 log_sample_rate=DEFAULT_SAMPLE_RATE, search_mode='svd', search_params=None):
+        self.dataset_path = dataset_path
+        self.index_dir = index_dir
+        self.vector_index_type = vector_index_type
+        self.search_mode = search_mode
+        self.search_params = search_params or {}
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.cache_path = cache_path
+        self.drift_threshold = drift_threshold
+        self.index_poll_seconds = index_poll_seconds
+        self.log_sample_rate = log_sample_rate
+
+        self.query_processor = QueryProcessor()
+        self.index_manager = None
+        self.result_cache = None
+        self.load_error = None
+        self._ready = threading.Event()
+        self._load_lock = threading.Lock()
+        self._loader = None
+        self._polling_pid = None
+        self._catalog = None
+
+    @classmethod
+    def from_env(cls, dataset_path, index_dir):
+        """Configure the service from the JOKE_* environment variables."""
+        return cls(
+            dataset_path, index_dir,
+            # Nearest-neighbour backend: 'exact' scans every joke, 'ivf' probes only nearby clusters
+            vector_index_type=os.environ.get('JOKE_VECTOR_INDEX', 'exact'),
+            # 'hybrid' fetches BM25 candidates from the inverted index and reranks them in SVD space
+            search_mode=os.environ.get('JOKE_SEARCH_MODE', 'svd'),
+            search_params={
+                'candidates': int(os.environ.get('JOKE_HYBRID_CANDIDATES', 100)),
+                'svd_weight': float(os.environ.get('JOKE_HYBRID_WEIGHT', 0.5)),
+                # Cosine above which a result counts as a near-duplicate of a better one; unset keeps them
+                'diversity': float(os.environ['JOKE_DIVERSITY']) if os.environ.get('JOKE_DIVERSITY') else None,
+            },
+            cache_size=int(os.environ.get('JOKE_CACHE_SIZE', 1024)),
+            cache_ttl=float(os.environ['JOKE_CACHE_TTL']) if os.environ.get('JOKE_CACHE_TTL') else None,
+            # Set JOKE_CACHE_PATH to share cached results across workers
+            cache_path=os.environ.get('JOKE_CACHE_PATH'),
+            drift_threshold=float(os.environ.get('JOKE_DRIFT_THRESHOLD', 0.2)),
+            index_poll_seconds=float(os.environ.get('JOKE_INDEX_POLL_SECONDS', 30)),
+            # Share of searches logged as structured events
+            log_sample_rate=float(os.environ.get('JOKE_LOG_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)),
+        )
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def load(self):
+        """Build the store, ranker, cache and index manager once; later calls return immediately."""
+        if self._ready.is_set():
+            return self
+        with self._load_lock:
+            if self._ready.is_set():
+                return self
+            try:
+                self._load()
+            except Exception as e:
+                self.load_error = e
+                raise
+            self.load_error = None
+            self._ready.set()
+        return self
+
+    def _load(self):
+        # Heavy imports (pandas, scikit-learn) happen here rather than when app.py is imported
+        from python.joke_index import dataset_hash
+        from python.joke_ranker import JokeRanker
+        from python.joke_store import JokeStore
+        from python.result_cache import ResultCache, SQLiteCacheBackend
+        from python.index_manager import IndexManager
+
+        # Load jokes from CSV into a columnar store addressed by row index
+        try:
+            joke_store = JokeStore.from_csv(self.dataset_path)
+            log_event(logger, 'dataset_loaded', path=self.dataset_path, jokes=len(joke_store))
+        except Exception as e:
+            log_event(logger, 'dataset_load_failed', logging.ERROR, path=self.dataset_path, error=str(e))
+            joke_store = JokeStore.empty()
+
+        try:
+            data_hash = dataset_hash(self.dataset_path)
+        except OSError:
+            data_hash = None
+
+        # Memory-map the prebuilt index; fall back to fitting in-process if it is missing or stale
+        try:
+            joke_ranker = JokeRanker.from_index(
+                joke_store.texts, self.index_dir, data_hash, index_type=self.vector_index_type,
+                search_mode=self.search_mode, search_params=self.search_params,
+            )
+            log_event(
+                logger, 'index_loaded', path=self.index_dir, version=joke_ranker.version,
+                search_mode=self.search_mode, postings=joke_ranker.joke_tf is not None,
+            )
+        except (OSError, ValueError) as e:
+            log_event(logger, 'index_unavailable', logging.WARNING, path=self.index_dir, error=str(e))
+            joke_ranker = JokeRanker(
+                joke_store.texts, index_type=self.vector_index_type,
+                search_mode=self.search_mode, search_params=self.search_params,
+            )
+            joke_ranker.version = f"fitted-{data_hash}"
+
+        # Search results keyed on the processed query
+        self.result_cache = ResultCache(
+            max_entries=self.cache_size,
+            ttl=self.cache_ttl,
+            version=joke_ranker.version,
+            backend=SQLiteCacheBackend(self.cache_path) if self.cache_path else None,
+        )
+
+        # Live (store, ranker) snapshot; ingestion and refits swap it atomically
+        self.index_manager = IndexManager(
+            joke_store, joke_ranker, self.dataset_path, self.index_dir,
+            drift_threshold=self.drift_threshold,
+        )
+        self.index_manager.add_listener(lambda snapshot: self.result_cache.set_version(snapshot.version))
+        REGISTRY.add_collector(self.collect_metrics)
+
+    def load_in_background(self):
+        """Start load() in a daemon thread unless it is done or already running."""
+        with self._load_lock:
+            if self._ready.is_set() or (self._loader is not None and self._loader.is_alive()):
+                return
+            self._loader = threading.Thread(target=self._load_quietly, daemon=True)
+            self._loader.start()
+
+    def _load_quietly(self):
+        try:
+            self.load()
+        except Exception as e:
+            log_event(logger, 'load_failed', logging.ERROR, exc_info=e, error=str(e))
+
+    def ensure_loaded(self):
+        """Load if needed and start this process's index polling (threads don't survive a fork)."""
+        self.load()
+        if self._polling_pid != os.getpid():
+            with self._load_lock:
+                if self._polling_pid != os.getpid():
+                    self._polling_pid = os.getpid()
+                    if self.index_poll_seconds > 0:
+                        self.index_manager.start_polling(self.index_poll_seconds)
+        return self
+
+    @property
+    def current(self):
+        """The live (store, ranker, version) snapshot."""
+        return self.ensure_loaded().index_manager.current
+
+    @property
+    def catalog(self):
+        """Precomputed browse data (JokeCatalog) for the live snapshot, rebuilt after each swap."""
+        from python.joke_catalog import JokeCatalog
+
+        snapshot = self.current
+        catalog = self._catalog
+        if catalog is None or catalog.snapshot is not snapshot:
+            with self._load_lock:
+                if self._catalog is None or self._catalog.snapshot is not snapshot:
+                    self._catalog = JokeCatalog(snapshot)
+                catalog = self._catalog
+        return catalog
+
+    def search_keywords(self, query, category="", filters=None):
+        """Process a raw query and return the keyword string used for ranking, its filter key and query info.
+
+        The filter key is the normalized (category, flags) pair from filters.filter_key; both
+        the cache key and the eligible rows are derived from it, so they always agree.
+        """
+        # Process the query to extract information
+        with stage_timer('process_query'):
+            query_info = self.query_processor.process_query(query)
+
+        # Override category if provided as a parameter
+        category = (category or '').strip().lower()
+        if category:
+            query_info['category'] = category
+
+        # Get keywords for search
+        search_query = ' '.join(query_info['keywords'])
+
+        flag = SENTIMENT_FLAGS.get(query_info['sentiment'])
+        flags = (flag,) if filters is not None and flag in filters.flags else ()
+        if filters is not None:
+            category, flags = filters.filter_key(category, flags)
+        return search_query, (category, flags), query_info
+
+    def joke_search(self, query, category="", top_n=5):
+        start = time.perf_counter()
+        try:
+            snapshot = self.current
+            result_cache = self.result_cache
+            search_query, (filter_category, flags), query_info = self.search_keywords(
+                query, category, snapshot.store.filters
+            )
+            cache_key = result_cache.make_key(search_query, filter_category, top_n, flags)
+            with stage_timer('cache_lookup'):
+                results = result_cache.get(cache_key)
+            cached = results is not None
+            if not cached:
+                # Score only the jokes passing the category/flag filters, so filtered queries still get top_n
+                with stage_timer('filter'):
+                    rows = snapshot.store.filters.eligible_rows(filter_category, flags)
+                ranked_indices, scores = snapshot.ranker.rank_indices(search_query, top_n, rows=rows)
+                with stage_timer('hydrate'):
+                    results = snapshot.store.hydrate(ranked_indices, scores)
+                result_cache.put(cache_key, results, version=snapshot.version)
+
+            log_event(
+                logger, 'search', sample_rate=self.log_sample_rate,
+                query=query, keywords=search_query, category=query_info['category'],
+                sentiment=query_info['sentiment'], flags=list(flags), results=len(results),
+                cached=cached, version=snapshot.version, ms=round((time.perf_counter() - start) * 1000, 3),
+            )
+            return results
+        except Exception as e:
+            log_event(logger, 'search_failed', logging.ERROR, exc_info=e, query=query, error=str(e))
+            return []
+
+    def similar(self, joke_id, top_n=5):
+        """Return (joke record, similar jokes) for the joke with this id, or None if it is unknown.
+
+        Each similar joke is its full record plus its cosine 'similarity' to the joke,
+        served from the index's precomputed neighbour graph when it has one.
+        """
+        start = time.perf_counter()
+        catalog = self.catalog
+        snapshot = catalog.snapshot
+        row = catalog.row_of(joke_id)
+        if row is None:
+            return None
+        indices, scores = snapshot.ranker.similar_indices(row, top_n)
+        with stage_timer('hydrate'):
+            similar = [
+                dict(snapshot.store.record(i), similarity=round(float(score), 4))
+                for i, score in zip(indices, scores)
+            ]
+        log_event(
+            logger, 'similar', sample_rate=self.log_sample_rate, id=joke_id, row=row, results=len(similar),
+            version=snapshot.version, ms=round((time.perf_counter() - start) * 1000, 3),
+        )
+        return snapshot.store.record(row), similar
+
+    def joke_search_batch(self, searches):
+        """Run many (query, category, top_n) searches, scoring all cache misses in one matrix multiply."""
+        start = time.perf_counter()
+        snapshot = self.current
+        result_cache = self.result_cache
+        prepared = []
+        for query, category, top_n in searches:
+            search_query, (filter_category, flags), _ = self.search_keywords(query, category, snapshot.store.filters)
+            cache_key = result_cache.make_key(search_query, filter_category, top_n, flags)
+            with stage_timer('filter'):
+                prepared.append((cache_key, snapshot.store.filters.eligible_rows(filter_category, flags)))
+
+        with stage_timer('cache_lookup'):
+            results = [result_cache.get(cache_key) for cache_key, _ in prepared]
+        misses = [i for i, cached in enumerate(results) if cached is None]
+
+        ranked = snapshot.ranker.rank_indices_batch(
+            [prepared[i][0][0] for i in misses],
+            [searches[i][2] for i in misses],
+            rows=[prepared[i][1] for i in misses],
+        )
+        with stage_timer('hydrate'):
+            for i, (ranked_indices, scores) in zip(misses, ranked):
+                results[i] = snapshot.store.hydrate(ranked_indices, scores)
+                result_cache.put(prepared[i][0], results[i], version=snapshot.version)
+
+        log_event(
+            logger, 'search_batch', sample_rate=self.log_sample_rate,
+            queries=len(searches), misses=len(misses), version=snapshot.version,
+            ms=round((time.perf_counter() - start) * 1000, 3),
+        )
+        return results
+
+    def collect_metrics(self):
+        """Gauges for /metrics: index size and version, and result cache counters."""
+        if not self.ready:
+            return []
+        snapshot = self.index_manager.current
+        embeddings = snapshot.ranker.joke_reduced
+        cache = self.result_cache.stats()
+        return [
+            ('joke_index_jokes', 'Jokes in the live index.', [({}, len(snapshot.store))]),
+            ('joke_index_dimensions', 'Dimensions of the joke embeddings.', [({}, embeddings.shape[1])]),
+            ('joke_index_embedding_bytes', 'Size of the joke embedding matrix.', [({}, embeddings.nbytes)]),
+            ('joke_store_bytes', 'Size of the columnar joke store.', [({}, snapshot.store.nbytes)]),
+            ('joke_index_info', 'Live index version.', [({'version': snapshot.version}, 1)]),
+            ('joke_cache_entries', 'Search results held in the cache.', [({}, cache['entries'])]),
+            ('joke_cache_lookups', 'Result cache lookups since start.', [
+                ({'result': 'hit'}, cache['hits']),
+                ({'result': 'miss'}, cache['misses']),
+                ({'result': 'shared_hit'}, cache['shared_hits']),
+            ]),
+            ('joke_cache_evictions', 'Result cache entries evicted or expired since start.', [
+                ({'reason': 'lru'}, cache['evictions']),
+                ({'reason': 'ttl'}, cache['expirations']),
+            ]),
+            ('joke_cache_hit_rate', 'Result cache hit rate since start.', [({}, cache['hit_rate'])]),
+        ]
+
+    def ingest(self, records):
+        """Normalize scraped joke dicts and add them to the live index; None if none are usable."""
+        from python.ingest import normalize_jokes
+
+        jokes_df = normalize_jokes(records)
+        if len(jokes_df) == 0:
+            return None
+        return self.ensure_loaded().index_manager.ingest(jokes_df)
@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+from python.joke_filters import JokeFilters
+
+
+class StringColumn:
+    """Arrow-style string column: one UTF-8 byte buffer plus int64 offsets and a missing mask.
+
+    Strings are decoded on access, so the column holds no per-row Python objects.
+    """
+
+    def __init__(self, data, offsets, missing):
+        self.data = data
+        self.offsets = offsets
+        self.missing = missing
+
+    @classmethod
+    def from_values(cls, values):
+        missing = pd.isna(pd.Series(values, dtype=object)).to_numpy()
+        encoded = [b'' if is_missing else str(value).encode('utf-8') for value, is_missing in zip(values, missing)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets, missing)
+
+    @classmethod
+    def concat(cls, columns):
+        """Join several columns end to end without decoding them."""
+        shifts = np.cumsum([0] + [column.data.size for column in columns[:-1]])
+        offsets = np.concatenate(
+            [columns[0].offsets[:1]] + [column.offsets[1:] + shift for column, shift in zip(columns, shifts)]
+        )
+        return cls(
+            np.concatenate([column.data for column in columns]),
+            offsets,
+            np.concatenate([column.missing for column in columns]),
+        )
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if self.missing[i]:
+            return None
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.offsets.nbytes + self.missing.nbytes
+
+
+class JokeTexts:
+    """Read-only sequence of each joke's 'title body' text, built from the store on access."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, i):
+        return self.store.text(i)
+
+    def __iter__(self):
+        return (self.store.text(i) for i in range(len(self.store)))
+
+
+class JokeStore:
+    """Columnar joke rows addressed by integer row index.
+
+    String columns are StringColumns, numeric columns are NumPy arrays and the category
+    column lives as integer codes in self.filters (a JokeFilters), so hydrating a search
+    result is a handful of array lookups by row index.
+    """
+
+    def __init__(self, columns, filters, column_order):
+        self.columns = columns
+        self.filters = filters
+        self.column_order = column_order
+        self.n_rows = filters.n_rows
+        self.texts = JokeTexts(self)
+
+    @classmethod
+    def from_frame(cls, jokes_df):
+        columns = {}
+        for name in jokes_df.columns:
+            if name == 'category':
+                continue
+            series = jokes_df[name]
+            if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+                columns[name] = series.to_numpy()
+            else:
+                columns[name] = StringColumn.from_values(series.tolist())
+        return cls(columns, JokeFilters.from_frame(jokes_df), list(jokes_df.columns))
+
+    @classmethod
+    def from_csv(cls, dataset_path):
+        return cls.from_frame(pd.read_csv(dataset_path))
+
+    def with_rows(self, jokes_df):
+        """Return a new store with the rows of jokes_df appended; this store is left unchanged."""
+        other = JokeStore.from_frame(jokes_df)
+        column_order = self.column_order + [name for name in other.column_order if name not in self.column_order]
+        columns = {}
+        for name in column_order:
+            if name == 'category':
+                continue
+            old = self.columns.get(name, _missing_column(len(self)))
+            new = other.columns.get(name, _missing_column(len(other)))
+            if isinstance(old, StringColumn) or isinstance(new, StringColumn):
+                columns[name] = StringColumn.concat([_as_string_column(old), _as_string_column(new)])
+            else:
+                columns[name] = np.concatenate([old, new])
+
+        categories = np.concatenate([self.filters.values(), other.filters.values()])
+        flags = {
+            name: np.concatenate([
+                self.filters.flags.get(name, np.zeros(len(self), dtype=bool)),
+                other.filters.flags.get(name, np.zeros(len(other), dtype=bool)),
+            ])
+            for name in set(self.filters.flags) | set(other.filters.flags)
+        }
+        return JokeStore(columns, JokeFilters(categories, flags), column_order)
+
+    @classmethod
+    def empty(cls):
+        return cls.from_frame(pd.DataFrame(columns=['id', 'title', 'body', 'category']))
+
+    def __len__(self):
+        return self.n_rows
+
+    def value(self, name, i):
+        """Return one cell; missing strings come back as None."""
+        if name == 'category':
+            code = self.filters.codes[i]
+            return self.filters.names[code] if code >= 0 else None
+        if name not in self.columns:
+            return None
+        value = self.columns[name][i]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def text(self, i):
+        """The 'title body' text the ranker indexes for row i."""
+        return f"{self.value('title', i) or ''} {self.value('body', i) or ''}".strip()
+
+    def record(self, i):
+        """Return row i as a dict of every dataset column."""
+        return {name: self.value(name, i) for name in self.column_order}
+
+    def hydrate(self, indices, scores):
+        """Build search results for ranked row indices."""
+        return [
+            {
+                'title': self.value('title', i) or '',
+                'body': self.value('body', i) or '',
+                'category': self.value('category', i) or '',
+                'score': float(score),
+            }
+            for i, score in zip(indices, scores)
+        ]
+
+    @property
+    def categories(self):
+        return self.filters.names
+
+    @property
+    def nbytes(self):
+        return sum(
+            column.nbytes for column in self.columns.values()
+        ) + self.filters.codes.nbytes + self.filters.order.nbytes
+
+
+def joke_texts(jokes_df):
+    """The 'title body' text of each row of a jokes DataFrame, as JokeStore.text builds it."""
+    title = jokes_df['title'] if 'title' in jokes_df else pd.Series('', index=jokes_df.index)
+    body = jokes_df['body'] if 'body' in jokes_df else pd.Series('', index=jokes_df.index)
+    return (title.fillna('').astype(str) + ' ' + body.fillna('').astype(str)).str.strip().tolist()
+
+
+def _missing_column(n_rows):
+    return np.full(n_rows, np.nan)
+
+
+def _as_string_column(column):
+    if isinstance(column, StringColumn):
+        return column
+    return StringColumn.from_values(column.tolist())
@@ -0,0 +1,45 @@
+import json
+import logging
+import os
+import random
+
+# Share of per-request events (searches) that are logged; errors are always logged
+DEFAULT_SAMPLE_RATE = 0.01
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, event name and the event's fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def get_logger(name):
+    """Return a logger under 'jokes', which writes JSON lines to stderr at JOKE_LOG_LEVEL."""
+    root = logging.getLogger('jokes')
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        root.addHandler(handler)
+        root.setLevel(os.environ.get('JOKE_LOG_LEVEL', 'INFO').upper())
+        root.propagate = False
+    return logging.getLogger(f'jokes.{name}')
+
+
+def log_event(logger, event, level=logging.INFO, sample_rate=1.0, exc_info=None, **fields):
+    """Log a structured event, keeping only a sample_rate share of calls."""
+    if sample_rate < 1.0:
+        if random.random() >= sample_rate:
+            return
+        fields['sample_rate'] = sample_rate
+    if logger.isEnabledFor(level):
+        logger.log(level, event, exc_info=exc_info, extra={'fields': fields})
@@ -0,0 +1,118 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from python.svd_reducer import top_k
+
+# Rows scored together, and corpus rows per tile: a (ROW_BLOCK x COLUMN_BLOCK) float32
+# tile is 64 MB, and each worker thread holds one at a time
+ROW_BLOCK = 512
+COLUMN_BLOCK = 32768
+# Columns per group when narrowing a tile to its top k (see tile_top_k)
+GROUP_SIZE = 16
+
+
+class NeighbourGraph:
+    """Each joke's most similar jokes, as CSR rows: for row i, ids[indptr[i]:indptr[i + 1]]
+    are its neighbours in joke_reduced space, best first, with cosine scores alongside.
+
+    The arrays may be memory maps; neighbours(i) is a slice, so a lookup costs O(k).
+    Rows appended after the graph was built have no entry (len(graph) <= i), or an empty
+    one once it has been extended with with_rows.
+    """
+
+    def __init__(self, indptr, ids, scores):
+        self.indptr = indptr
+        self.ids = ids
+        self.scores = scores
+        # Computed once: it is checked on every lookup and is O(n) over indptr
+        self.max_degree = int(np.diff(indptr).max()) if len(indptr) > 1 else 0
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def with_rows(self, n_rows):
+        """A graph over n_rows rows, the ones past len(self) having empty entries."""
+        padding = np.full(n_rows - len(self), self.indptr[-1], dtype=self.indptr.dtype)
+        return NeighbourGraph(np.concatenate([self.indptr, padding]), self.ids, self.scores)
+
+    def neighbours(self, row, k=None):
+        start, end = int(self.indptr[row]), int(self.indptr[row + 1])
+        if k is not None:
+            end = min(end, start + k)
+        return np.asarray(self.ids[start:end], dtype=np.int64), np.asarray(self.scores[start:end], dtype=np.float32)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.ids.nbytes + self.scores.nbytes
+
+
+def tile_top_k(tile, k, group_size=GROUP_SIZE):
+    """Column indices of the k largest scores in each row of tile, in no particular order.
+
+    Columns are split into strided groups (column c is in group c % n_groups) and only
+    the k groups with the largest maxima are searched: any of a row's top k scores is at
+    least its k-th largest, so its group's maximum is too, and at most k groups can have
+    such a maximum. Taking group maxima is an elementwise max over contiguous slices,
+    much cheaper than selecting over the whole row.
+    """
+    rows, cols = tile.shape
+    n_groups = cols // group_size
+    if n_groups <= k:
+        return top_k(tile, min(k, cols))
+    grouped = n_groups * group_size
+    group_max = tile[:, :grouped].reshape(rows, group_size, n_groups).max(axis=1)
+    best_groups = np.argpartition(group_max, n_groups - k, axis=1)[:, n_groups - k:]
+    candidates = (best_groups[:, :, None] + n_groups * np.arange(group_size)).reshape(rows, -1)
+    if grouped < cols:
+        candidates = np.concatenate(
+            [candidates, np.broadcast_to(np.arange(grouped, cols), (rows, cols - grouped))], axis=1
+        )
+    best = top_k(np.take_along_axis(tile, candidates, axis=1), k)
+    return np.take_along_axis(candidates, best, axis=1)
+
+
+def build_neighbour_graph(vectors, k=10, min_score=None, workers=None, row_block=ROW_BLOCK,
+                          column_block=COLUMN_BLOCK):
+    """Exact top-k cosine neighbours of every row of vectors (L2-normalized), excluding itself.
+
+    Rows are processed in blocks across a thread pool (the tile products and reductions
+    run in BLAS and NumPy without the GIL). Each block is scored against the corpus one
+    column tile at a time and merged into a running top k, so memory stays at one tile per
+    worker and the N x N score matrix is never built. Neighbours scoring below min_score
+    are dropped, so rows may have fewer than k. Returns a NeighbourGraph.
+    """
+    n = vectors.shape[0]
+    k = max(0, min(k, n - 1))
+    ids = np.zeros((n, k), dtype=np.int32)
+    scores = np.full((n, k), -np.inf, dtype=np.float32)
+
+    def score_rows(start):
+        end = min(start + row_block, n)
+        block = np.asarray(vectors[start:end], dtype=np.float32)
+        best_ids = np.empty((end - start, 0), dtype=np.int64)
+        best_scores = np.empty((end - start, 0), dtype=np.float32)
+        for column in range(0, n, column_block):
+            column_end = min(column + column_block, n)
+            tile = block @ np.asarray(vectors[column:column_end], dtype=np.float32).T
+            # A joke is not its own neighbour
+            own = np.arange(max(start, column), min(end, column_end))
+            tile[own - start, own - column] = -np.inf
+            top = tile_top_k(tile, min(k, tile.shape[1]))
+            merged_ids = np.concatenate([best_ids, top + column], axis=1)
+            merged_scores = np.concatenate([best_scores, np.take_along_axis(tile, top, axis=1)], axis=1)
+            keep = top_k(merged_scores, min(k, merged_scores.shape[1]))
+            best_ids = np.take_along_axis(merged_ids, keep, axis=1)
+            best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+        ids[start:end] = best_ids
+        scores[start:end] = best_scores
+
+    if k:
+        with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+            list(pool.map(score_rows, range(0, n, row_block)))
+
+    keep = np.isfinite(scores)
+    if min_score is not None:
+        keep &= scores >= min_score
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(keep.sum(axis=1), out=indptr[1:])
+    return NeighbourGraph(indptr, ids[keep], scores[keep].astype(np.float16))
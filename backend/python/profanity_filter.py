@@ -0,0 +1,76 @@
+import os
+import numpy as np
+import pandas as pd
+from python.joke_store import joke_texts
+
+try:
+    from profanity_check import predict_prob
+except ImportError as e:  # missing, or the original package failing against newer scikit-learn
+    predict_prob = None
+    _import_error = e
+
+# Dataset column holding the precomputed classification; JokeFilters exposes it as the 'clean' flag
+CLEAN_COLUMN = 'clean'
+
+# Texts scored per profanity_check call; large enough to amortize the per-call overhead
+CHUNK_SIZE = 10_000
+
+PROFANITY_THRESHOLD = 0.5
+
+
+def profanity_scorer():
+    """profanity_check.predict_prob, or ImportError if it cannot be imported.
+
+    There is no fallback: labels are saved to the dataset and only unlabeled rows are scored
+    again, so a cruder scorer's mistakes would outlive fixing the install.
+    """
+    if predict_prob is None:
+        raise ImportError(
+            "profanity_check cannot be imported, so jokes cannot be labeled as clean; install "
+            "alt-profanity-check (see requirements.txt) or build with --skip-profanity"
+        ) from _import_error
+    return predict_prob
+
+
+def score_clean(texts, chunk_size=CHUNK_SIZE, scorer=None, threshold=PROFANITY_THRESHOLD):
+    """Classify every text as clean (True) or not, scoring chunk_size texts per model call."""
+    scorer = scorer or profanity_scorer()
+    n_texts = len(texts)
+    clean = np.ones(n_texts, dtype=bool)
+    for start in range(0, n_texts, chunk_size):
+        stop = min(start + chunk_size, n_texts)
+        chunk = [texts[i] for i in range(start, stop)]
+        clean[start:stop] = np.asarray(scorer(chunk)) < threshold
+    return clean
+
+
+def label_clean(jokes_df, **score_params):
+    """Return a copy of jokes_df whose clean column is filled in for every row that lacks it."""
+    jokes_df = jokes_df.copy()
+    labels = jokes_df[CLEAN_COLUMN] if CLEAN_COLUMN in jokes_df else pd.Series(np.nan, index=jokes_df.index, dtype=object)
+    todo = np.flatnonzero(labels.isna().to_numpy())
+    labels = labels.astype(object)
+    if len(todo):
+        labels.iloc[todo] = score_clean(joke_texts(jokes_df.iloc[todo]), **score_params)
+    jokes_df[CLEAN_COLUMN] = labels.astype(bool)
+    return jokes_df
+
+
+def add_clean_column(dataset_path, **score_params):
+    """Score the dataset's unlabeled jokes and persist the clean column; returns rows scored.
+
+    The file is only rewritten when something was scored, since it changes the dataset hash
+    and so invalidates the built index.
+    """
+    jokes_df = pd.read_csv(dataset_path)
+    if CLEAN_COLUMN in jokes_df:
+        missing = int(jokes_df[CLEAN_COLUMN].isna().sum())
+    else:
+        missing = len(jokes_df)
+    if missing == 0:
+        return 0
+    labeled = label_clean(jokes_df, **score_params)
+    real_path = os.path.realpath(dataset_path)
+    labeled.to_csv(real_path + '.tmp', index=False)
+    os.replace(real_path + '.tmp', real_path)
+    return missing
@@ -1,11 +1,5 @@
-import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
 from python.text_utils import preprocess
+from python.query_analyzer import QueryAnalyzer
 
 class QueryProcessor:
     def __init__(self):
@@ -21,11 +15,32 @@ class QueryProcessor:
             'relationships', 'technology', 'health', 'money', 'travel'
         ]
 
-        self.tfidf_vectorizer = TfidfVectorizer(
-            stop_words='english',
-            max_features=1000,
-            ngram_range=(1, 2)
-        )
+        self.sentiment_keywords = {
+            'sarcastic': ['sarcastic', 'sarcasm', 'ironic', 'irony'],
+            'clever': ['clever', 'witty', 'smart', 'intelligent'],
+            'dark': ['dark', 'edgy', 'morbid', 'black humor'],
+            'clean': ['clean', 'family friendly', 'pg', 'appropriate']
+        }
+
+        # Compiled once from the keyword tables above; call rebuild_analyzer() after editing them
+        self.analyzer = QueryAnalyzer(self.humor_categories, self.sentiment_keywords, self.joke_subjects)
+
+        self._tfidf_vectorizer = None
+
+    @property
+    def tfidf_vectorizer(self):
+        """Unfitted query vectorizer, built on first use so importing this module skips scikit-learn."""
+        if self._tfidf_vectorizer is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            self._tfidf_vectorizer = TfidfVectorizer(
+                stop_words='english',
+                max_features=1000,
+                ngram_range=(1, 2)
+            )
+        return self._tfidf_vectorizer
+
+    def rebuild_analyzer(self):
+        self.analyzer = QueryAnalyzer(self.humor_categories, self.sentiment_keywords, self.joke_subjects)
 
     def preprocess_query(self, query):
         return preprocess(query)
@@ -48,13 +63,7 @@ class QueryProcessor:
 
     def detect_sentiment(self, query):
         query_lower = query.lower()
-        sentiment_keywords = {
-            'sarcastic': ['sarcastic', 'sarcasm', 'ironic', 'irony'],
-            'clever': ['clever', 'witty', 'smart', 'intelligent'],
-            'dark': ['dark', 'edgy', 'morbid', 'black humor'],
-            'clean': ['clean', 'family friendly', 'pg', 'appropriate']
-        }
-        for sentiment, keywords in sentiment_keywords.items():
+        for sentiment, keywords in self.sentiment_keywords.items():
             for keyword in keywords:
                 if keyword in query_lower:
                     return sentiment
@@ -72,6 +81,11 @@ class QueryProcessor:
         return suggestions[:max_suggestions]
 
     def process_query(self, query):
+        """Extract keywords, category and sentiment with the precompiled QueryAnalyzer."""
+        return self.analyzer.analyze(query)
+
+    def process_query_reference(self, query):
+        """Step-by-step version of process_query, kept to check the analyzer against."""
         processed_query = self.preprocess_query(query)
         keywords = self.extract_keywords(processed_query)
         category = self.identify_humor_category(query)
@@ -87,4 +101,4 @@ class QueryProcessor:
             'keywords': filtered_keywords if filtered_keywords else keywords,
             'category': category,
             'sentiment': sentiment
-        }
+        }
\ No newline at end of file
@@ -0,0 +1,176 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """Bounded LRU cache of search results with optional TTL and hit/miss/eviction counters.
+
+    Entries belong to a version (the dataset hash and index version); changing the version
+    with set_version drops every entry, so results never outlive the index they came from.
+    An optional shared backend (see SQLiteCacheBackend) lets several workers reuse results.
+    """
+
+    def __init__(self, max_entries=1024, ttl=None, version=None, backend=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = version
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_hits = 0
+
+    @staticmethod
+    def make_key(keywords, category="", top_n=5, flags=()):
+        """Normalize the processed query info into a cache key."""
+        return (' '.join(keywords.split()), (category or '').strip().lower(), int(top_n), tuple(sorted(flags)))
+
+    def set_version(self, version):
+        """Invalidate every cached result when the index or dataset version changes."""
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self._entries.clear()
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            version = self.version
+
+        if self.backend is not None:
+            value = self.backend.get(version, key)
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                self._store(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value, version=None):
+        """Cache value under key, evicting the least recently used entry when full.
+
+        Pass the version the value was computed against; results that finished after the
+        index was swapped are then dropped instead of being cached under the new version.
+        """
+        if version is not None and version != self.version:
+            return
+        self._store(key, value)
+        if self.backend is not None:
+            self.backend.put(self.version, key, value, self.ttl)
+
+    def _store(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return the cache counters and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'version': self.version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared_hits': self.shared_hits,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class SQLiteCacheBackend:
+    """Result store in a local SQLite file shared by every worker on the host.
+
+    Values are stored as JSON, keyed by (version, key); rows from other versions are
+    never read and are pruned on the next write after max_entries is exceeded.
+    """
+
+    def __init__(self, path, max_entries=100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "version TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL, stored_at REAL NOT NULL, PRIMARY KEY (version, key))"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # SQLite connections must not cross a fork (e.g. a gunicorn master preloading the app)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, version, key):
+        try:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM results WHERE version = ? AND key = ?",
+                (str(version), json.dumps(key)),
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return json.loads(row[0])
+
+    def put(self, version, key, value, ttl=None):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                    (str(version), json.dumps(key), json.dumps(value), now + ttl if ttl else None, now),
+                )
+                self._writes += 1
+                if self._writes % 1000 == 0:
+                    self._prune(conn, version, now)
+        except sqlite3.Error:
+            # The shared store is an optimization; a locked or broken file must not fail searches
+            pass
+
+    def _prune(self, conn, version, now):
+        conn.execute("DELETE FROM results WHERE version != ? OR expires_at <= ?", (str(version), now))
+        conn.execute(
+            "DELETE FROM results WHERE stored_at < (SELECT stored_at FROM results "
+            "ORDER BY stored_at DESC LIMIT 1 OFFSET ?)",
+            (self.max_entries,),
+        )
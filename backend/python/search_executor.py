@@ -0,0 +1,101 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from python.metrics import REGISTRY
+
+EXECUTOR_EVENTS = REGISTRY.counter(
+    'joke_search_executor_events_total',
+    'Searches computed, coalesced onto an identical in-flight search, or shed.',
+    ('event',),
+)
+
+
+class Overloaded(Exception):
+    """A search was shed: the queue was full ('queue_full') or its deadline passed ('deadline')."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _Call:
+    __slots__ = ('future', 'deadline')
+
+
+class SearchExecutor:
+    """Bounded thread pool for ranking work awaited from an asyncio event loop.
+
+    At most max_workers searches run at once, and at most max_pending are admitted (running
+    plus queued); past that run() raises Overloaded('queue_full') straight away so the
+    server answers 503 instead of building a backlog it can never serve in time. Concurrent
+    calls with the same key share one computation. Each caller waits at most `timeout`
+    seconds, and work whose callers have all given up is dropped when it reaches a thread.
+    State is only touched from the event loop thread, so there are no locks.
+    """
+
+    def __init__(self, max_workers=4, max_pending=64, timeout=2.0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self._inflight = {}
+        self._pool = None
+        REGISTRY.add_collector(self.collect_metrics)
+
+    async def run(self, key, fn, *args):
+        """Return fn(*args) computed in the pool, sharing the result with callers of the same key.
+
+        key=None never coalesces. Raises Overloaded when shed or when the deadline passes.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + self.timeout
+        call = self._inflight.get(key) if key is not None else None
+        if call is not None:
+            call.deadline = max(call.deadline, deadline)
+            EXECUTOR_EVENTS.inc(('coalesced',))
+        else:
+            if self.pending >= self.max_pending:
+                EXECUTOR_EVENTS.inc(('queue_full',))
+                raise Overloaded('queue_full')
+            if self._pool is None:
+                # Created on first use so the threads belong to the (possibly forked) serving process
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix='search')
+            call = _Call()
+            call.deadline = deadline
+            call.future = loop.run_in_executor(self._pool, self._execute, call, fn, args)
+            self.pending += 1
+            if key is not None:
+                self._inflight[key] = call
+            call.future.add_done_callback(lambda future: self._finish(key, call))
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(call.future), deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            EXECUTOR_EVENTS.inc(('deadline',))
+            raise Overloaded('deadline') from None
+
+    def _execute(self, call, fn, args):
+        if time.monotonic() > call.deadline:
+            EXECUTOR_EVENTS.inc(('expired',))
+            raise Overloaded('deadline')
+        EXECUTOR_EVENTS.inc(('computed',))
+        return fn(*args)
+
+    def _finish(self, key, call):
+        self.pending -= 1
+        if key is not None and self._inflight.get(key) is call:
+            del self._inflight[key]
+        if not call.future.cancelled():
+            # Mark the exception retrieved when every waiter has already timed out
+            call.future.exception()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def collect_metrics(self):
+        return [
+            ('joke_search_executor_pending', 'Searches admitted to the executor and not yet finished.',
+             [({}, self.pending)]),
+        ]
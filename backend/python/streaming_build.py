@@ -0,0 +1,207 @@
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+from python.joke_index import dataset_hash, save_index
+from python.joke_store import joke_texts
+from python.neighbour_graph import build_neighbour_graph
+from python.vector_index import make_vector_index
+from python.text_utils import preprocess
+from python.log_utils import get_logger, log_event
+
+logger = get_logger('streaming_build')
+
+# Jokes read from the CSV and handed to a worker at a time
+CHUNK_SIZE = 50_000
+
+# Per-process vectorizer for the counting pass, set by _init_counter
+_counter = None
+
+
+def read_text_chunks(dataset_path, chunk_size=CHUNK_SIZE):
+    """Yield lists of 'title body' texts, built like JokeStore.text, chunk_size rows at a time."""
+    columns = [name for name in ('title', 'body') if name in pd.read_csv(dataset_path, nrows=0).columns]
+    for chunk in pd.read_csv(dataset_path, usecols=columns, dtype=str, chunksize=chunk_size):
+        yield joke_texts(chunk)
+
+
+def _document_frequencies(texts):
+    """Pass 1 worker: ({term: number of jokes containing it}, number of jokes) for one chunk."""
+    vectorizer = CountVectorizer(stop_words='english', binary=True, dtype=np.int32)
+    try:
+        present = vectorizer.fit_transform([preprocess(text) for text in texts])
+    except ValueError:
+        # Nothing but stop words (or nothing at all) in this chunk
+        return {}, len(texts)
+    counts = np.asarray(present.sum(axis=0)).ravel().tolist()
+    return dict(zip(vectorizer.get_feature_names_out().tolist(), counts)), len(texts)
+
+
+def _init_counter(vocabulary):
+    global _counter
+    _counter = CountVectorizer(stop_words='english', vocabulary=vocabulary, dtype=np.float32)
+
+
+def _term_counts(texts):
+    """Pass 2 worker: (jokes x terms) raw counts for one chunk under the merged vocabulary."""
+    return _counter.transform([preprocess(text) for text in texts])
+
+
+def parallel_map(fn, items, workers, initializer=None, initargs=()):
+    """Yield fn(item) in order, running at most 2 * workers items ahead of the consumer.
+
+    Unlike Pool.imap, which queues the whole input, this reads the next chunk only when a
+    result has been taken, so at most a few chunks are in memory at once.
+    """
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for item in items:
+            yield fn(item)
+        return
+    with ProcessPoolExecutor(workers, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def build_index_streaming(dataset_path, index_dir, n_components=100, chunk_size=CHUNK_SIZE, workers=None,
+                          n_iter=7, oversample=10, seed=42, work_dir=None, neighbours=0, index_type='exact'):
+    """Build the same index as build_index.build_index without holding the corpus in memory.
+
+    1. Stream the CSV, tokenizing chunks in a process pool, and merge per-chunk document
+       frequencies into the vocabulary (sorted, as TfidfVectorizer does) and IDF weights.
+    2. Stream it again, counting each chunk's terms in the pool, and spill the sparse
+       counts to work_dir.
+    3. Fit SVD by randomized subspace iteration: every pass multiplies the spilled TF-IDF
+       chunks into a (terms x (n_components + oversample)) block, so no pass needs more
+       than one chunk of rows.
+    4. Project each chunk into joke_reduced and scatter its counts into the term-major
+       postings, both written to memory-mapped files, then publish them with save_index.
+       With neighbours=k, each joke's k most similar jokes are found from the memory-mapped
+       rows first (see neighbour_graph) and published alongside.
+       A trained index_type backend (e.g. 'ivf') is saved with them too.
+
+    Returns the new version directory.
+    """
+    workers = workers or os.cpu_count() or 1
+    data_hash = dataset_hash(dataset_path)
+    start = time.perf_counter()
+
+    # Pass 1: vocabulary and document frequencies
+    frequencies = {}
+    n_docs = 0
+    for chunk_frequencies, chunk_docs in parallel_map(
+        _document_frequencies, read_text_chunks(dataset_path, chunk_size), workers
+    ):
+        n_docs += chunk_docs
+        for term, count in chunk_frequencies.items():
+            frequencies[term] = frequencies.get(term, 0) + count
+    vocabulary = sorted(frequencies)
+    if not vocabulary:
+        raise ValueError("empty vocabulary; the dataset only contains stop words")
+    if n_components >= len(vocabulary):
+        raise ValueError(f"n_components={n_components} must be below the vocabulary size {len(vocabulary)}")
+    document_frequency = np.array([frequencies[term] for term in vocabulary], dtype=np.int64)
+    del frequencies
+    # TfidfVectorizer's smoothed IDF
+    idf = np.log((1.0 + n_docs) / (1.0 + document_frequency)) + 1.0
+    log_event(logger, 'vocabulary_built', jokes=n_docs, terms=len(vocabulary),
+              seconds=round(time.perf_counter() - start, 2))
+
+    with tempfile.TemporaryDirectory(prefix='joke_build_', dir=work_dir) as tmp:
+        # Pass 2: spill per-chunk counts
+        chunk_paths = []
+        vocabulary_index = {term: i for i, term in enumerate(vocabulary)}
+        for counts in parallel_map(
+            _term_counts, read_text_chunks(dataset_path, chunk_size), workers,
+            initializer=_init_counter, initargs=(vocabulary_index,),
+        ):
+            path = os.path.join(tmp, f"counts-{len(chunk_paths)}.npz")
+            sparse.save_npz(path, counts.tocsr(), compressed=False)
+            chunk_paths.append(path)
+        del vocabulary_index
+        log_event(logger, 'counts_spilled', chunks=len(chunk_paths), seconds=round(time.perf_counter() - start, 2))
+
+        idf_diagonal = sparse.diags(idf)
+
+        def tfidf_chunks():
+            for path in chunk_paths:
+                counts = sparse.load_npz(path)
+                yield counts, normalize(counts @ idf_diagonal)
+
+        # Randomized subspace iteration on X^T X, streaming X by chunks
+        rng = np.random.default_rng(seed)
+        width = min(n_components + oversample, len(vocabulary))
+        basis = np.linalg.qr(rng.standard_normal((len(vocabulary), width)))[0]
+        for _ in range(n_iter):
+            product = np.zeros_like(basis)
+            for _, tfidf in tfidf_chunks():
+                product += tfidf.T @ (tfidf @ basis)
+            basis = np.linalg.qr(product)[0]
+        gram = np.zeros((width, width))
+        for _, tfidf in tfidf_chunks():
+            projected = tfidf @ basis
+            gram += projected.T @ projected
+        eigenvalues, eigenvectors = np.linalg.eigh(gram)
+        top = np.argsort(eigenvalues)[::-1][:n_components]
+        components = np.ascontiguousarray((basis @ eigenvectors[:, top]).T, dtype=np.float32)
+        log_event(logger, 'svd_fitted', components=n_components, iterations=n_iter,
+                  seconds=round(time.perf_counter() - start, 2))
+
+        # Final pass: reduced rows and term-major postings
+        n_postings = int(document_frequency.sum())
+        index_dtype = np.int32 if n_postings < 2 ** 31 else np.int64
+        indptr = np.zeros(len(vocabulary) + 1, dtype=index_dtype)
+        np.cumsum(document_frequency, out=indptr[1:])
+        joke_reduced = np.lib.format.open_memmap(
+            os.path.join(tmp, "joke_reduced.npy"), mode='w+', dtype=np.float32, shape=(n_docs, n_components)
+        )
+        posting_docs = np.lib.format.open_memmap(
+            os.path.join(tmp, "postings_docs.npy"), mode='w+', dtype=index_dtype, shape=(n_postings,)
+        )
+        posting_counts = np.lib.format.open_memmap(
+            os.path.join(tmp, "postings_counts.npy"), mode='w+', dtype=np.float32, shape=(n_postings,)
+        )
+        cursor = indptr[:-1].astype(np.int64)
+        row = 0
+        for counts, tfidf in tfidf_chunks():
+            n_rows = counts.shape[0]
+            joke_reduced[row:row + n_rows] = normalize(np.asarray(tfidf @ components.T.astype(np.float64)))
+            by_term = counts.tocsc()
+            by_term.sort_indices()
+            lengths = np.diff(by_term.indptr)
+            destination = np.repeat(cursor - by_term.indptr[:-1], lengths) + np.arange(by_term.nnz)
+            posting_docs[destination] = by_term.indices + row
+            posting_counts[destination] = by_term.data
+            cursor += lengths
+            row += n_rows
+
+        graph = None
+        if neighbours:
+            graph_start = time.perf_counter()
+            graph = build_neighbour_graph(joke_reduced, neighbours)
+            log_event(logger, 'neighbours_built', k=neighbours, seconds=round(time.perf_counter() - graph_start, 2))
+
+        state = make_vector_index(index_type, joke_reduced).state()
+        vector_index = (index_type, {}, state) if state else None
+
+        version_dir = save_index(
+            index_dir, vocabulary, idf, components, joke_reduced, data_hash,
+            extra_meta={'build': 'streaming', 'chunk_size': chunk_size, 'svd_iterations': n_iter},
+            postings=(indptr, posting_docs, posting_counts), neighbours=graph, vector_index=vector_index,
+        )
+        del joke_reduced, posting_docs, posting_counts
+
+    log_event(logger, 'index_built', path=version_dir, seconds=round(time.perf_counter() - start, 2))
+    return version_dir
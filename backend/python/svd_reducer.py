@@ -1,18 +1,31 @@
+import numpy as np
 from sklearn.decomposition import TruncatedSVD
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import normalize
 
+# Cap on the number of query x corpus scores materialized at once by compute_similarity
+SCORE_BLOCK_ELEMENTS = 1 << 24
+
 class SVDReducer:
     def __init__(self, n_components=100):
         """Initialize the SVD reducer with specified number of components."""
         self.n_components = n_components
         self.svd = TruncatedSVD(n_components=self.n_components, random_state=42)
+        self.components = None
         self.fitted = False
 
+    @classmethod
+    def from_components(cls, components):
+        """Create an already-fitted reducer from stored SVD components."""
+        reducer = cls(n_components=components.shape[0])
+        reducer.components = components
+        reducer.fitted = True
+        return reducer
+
     def fit(self, tfidf_matrix):
         """Fit the SVD model and normalize the reduced matrix."""
         self.joke_reduced = self.svd.fit_transform(tfidf_matrix)
-        self.joke_reduced = normalize(self.joke_reduced, axis=1)
+        self.joke_reduced = normalize(self.joke_reduced, axis=1).astype(np.float32)
+        self.components = self.svd.components_
         self.fitted = True
         return self.joke_reduced
 
@@ -20,10 +33,48 @@ class SVDReducer:
         """Transform and normalize a new TF-IDF vector into the reduced space."""
         if not self.fitted:
             raise ValueError("SVDReducer must be fit before calling transform().")
-        return normalize(self.svd.transform(tfidf_vector), axis=1)
+        return normalize(tfidf_vector @ self.components.T, axis=1).astype(np.float32)
 
     def compute_similarity(self, query_reduced, corpus_reduced, top_n=5):
-        """Compute cosine similarities between reduced query and reduced corpus."""
-        similarities = cosine_similarity(query_reduced, corpus_reduced).flatten()
-        ranked_indices = similarities.argsort()[::-1][:top_n]
-        return ranked_indices, similarities
+        """Return the top_n corpus indices and cosine scores for each query, best first.
+
+        Both sides are already L2-normalized, so cosine similarity is a float32 dot product,
+        and argpartition selects the top_n without sorting the whole corpus. A 1-D query
+        gives 1-D results; a (q, d) matrix of queries gives (q, top_n) results.
+        """
+        return dot_top_k(query_reduced, corpus_reduced, top_n)
+
+
+def dot_top_k(query_reduced, corpus_reduced, top_n=5):
+    """Return the top_n corpus rows by dot product for each query; see compute_similarity."""
+    queries = np.asarray(query_reduced, dtype=np.float32)
+    single = queries.ndim == 1
+    queries = np.atleast_2d(queries)
+    n = corpus_reduced.shape[0]
+    k = max(0, min(top_n, n))
+
+    indices = np.empty((queries.shape[0], k), dtype=np.int64)
+    scores = np.empty((queries.shape[0], k), dtype=np.float32)
+    block = max(1, SCORE_BLOCK_ELEMENTS // max(n, 1))
+    for start in range(0, queries.shape[0], block):
+        block_scores = queries[start:start + block] @ corpus_reduced.T
+        top = top_k(block_scores, k)
+        indices[start:start + block] = top
+        scores[start:start + block] = np.take_along_axis(block_scores, top, axis=1)
+
+    if single:
+        return indices[0], scores[0]
+    return indices, scores
+
+
+def top_k(scores, k):
+    """Return the column indices of the k largest scores in each row, best first."""
+    n = scores.shape[1]
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
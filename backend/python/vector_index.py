@@ -0,0 +1,413 @@
+import numpy as np
+from python.svd_reducer import dot_top_k, top_k
+
+
+class VectorIndex:
+    """Nearest-neighbour search over the L2-normalized rows of joke_reduced.
+
+    search() follows SVDReducer.compute_similarity: a 1-D query gives 1-D (indices, scores)
+    and a (q, d) matrix of queries gives (q, top_n) arrays, best match first. Passing rows
+    (a sorted array of row ids) restricts the search to those rows.
+    """
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def search(self, queries, top_n=5, rows=None):
+        raise NotImplementedError
+
+    def state(self):
+        """Trained arrays (name -> array) that rebuild this index without training when passed
+        back to its constructor as keyword arguments; saved with the index version."""
+        return {}
+
+    def with_rows(self, vectors):
+        """An index over vectors, whose leading rows are this index's rows, that reuses this
+        index's training and only assigns or encodes the appended rows."""
+        return type(self)(vectors, **self.state())
+
+    def search_rows(self, queries, top_n, rows):
+        """Exactly score only the given rows; filtered sets are small enough to scan directly."""
+        indices, scores = dot_top_k(queries, self.vectors[rows], top_n)
+        return rows[indices], scores
+
+
+class ExactIndex(VectorIndex):
+    """Brute-force scan of every row; the reference for approximate backends."""
+
+    def search(self, queries, top_n=5, rows=None):
+        if rows is not None:
+            return self.search_rows(queries, top_n, rows)
+        return dot_top_k(queries, self.vectors, top_n)
+
+
+class IVFIndex(VectorIndex):
+    """Inverted-file index: rows are bucketed by their nearest k-means centroid and a query
+    only scans the nprobe buckets whose centroids score highest against it.
+
+    Passing centroids (and assignments) from a saved index skips the clustering; rows past
+    the end of assignments are assigned to the nearest existing centroid. The rows grouped
+    by list (order and list_vectors) are saved too, so a loaded index scans a memory map
+    shared between workers instead of its own copy of the matrix.
+    """
+
+    def __init__(self, vectors, n_lists=None, nprobe=8, n_iter=10, sample_size=None, seed=42,
+                 centroids=None, assignments=None, order=None, list_vectors=None):
+        super().__init__(vectors)
+        n = vectors.shape[0]
+        self.nprobe = nprobe
+        if centroids is None:
+            if n_lists is None:
+                n_lists = int(4 * np.sqrt(n))
+            n_lists = max(1, min(n_lists, n))
+            rng = np.random.default_rng(seed)
+            if sample_size is None:
+                sample_size = 64 * n_lists
+            sample = vectors[np.sort(rng.choice(n, size=min(n, sample_size), replace=False))]
+            centroids = spherical_kmeans(np.asarray(sample, dtype=np.float32), n_lists, n_iter, rng)
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.n_lists = self.centroids.shape[0]
+
+        assigned = 0 if assignments is None else len(assignments)
+        if assigned < n:
+            new_assignments = _nearest_centroid(vectors[assigned:], self.centroids).astype(np.int32)
+            assignments = new_assignments if assignments is None else np.concatenate([assignments, new_assignments])
+        self.assignments = assignments
+        # Lay rows out contiguously per list so a probe is a slice, not a gather
+        if list_vectors is None or len(list_vectors) < n:
+            order = np.argsort(assignments, kind='stable')
+            list_vectors = np.ascontiguousarray(vectors[order], dtype=np.float32)
+        self.order = order
+        self.list_vectors = list_vectors
+        self.offsets = np.zeros(self.n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=self.n_lists), out=self.offsets[1:])
+
+    def state(self):
+        return {
+            'centroids': self.centroids,
+            'assignments': self.assignments,
+            'order': self.order,
+            'list_vectors': self.list_vectors,
+        }
+
+    def with_rows(self, vectors):
+        return IVFIndex(vectors, nprobe=self.nprobe, **self.state())
+
+    def search(self, queries, top_n=5, rows=None, nprobe=None):
+        if rows is not None:
+            return self.search_rows(queries, top_n, rows)
+        queries = np.asarray(queries, dtype=np.float32)
+        single = queries.ndim == 1
+        queries = np.atleast_2d(queries)
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+
+        probes = top_k(queries @ self.centroids.T, nprobe)
+        indices = np.full((queries.shape[0], top_n), -1, dtype=np.int64)
+        scores = np.full((queries.shape[0], top_n), -np.inf, dtype=np.float32)
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            spans = [(self.offsets[l], self.offsets[l + 1]) for l in lists]
+            positions = np.concatenate([np.arange(start, end) for start, end in spans])
+            if positions.size == 0:
+                continue
+            candidate_scores = np.concatenate([self.list_vectors[start:end] @ query for start, end in spans])
+            best = top_k(candidate_scores[None, :], min(top_n, positions.size))[0]
+            indices[row, :best.size] = self.order[positions[best]]
+            scores[row, :best.size] = candidate_scores[best]
+
+        if single:
+            return _trim(indices[0], scores[0])
+        return indices, scores
+
+
+class CompressedIndex(VectorIndex):
+    """Scan over compressed copies of the rows, with optional exact re-ranking.
+
+    Subclasses encode the rows into self.codes and score prepared queries against a block
+    of codes without decompressing the matrix. The best rerank * top_n rows by approximate
+    score are then re-scored exactly against the full-precision rows, which are touched
+    only for those candidates. rerank=0 returns the approximate scores.
+    """
+
+    block_size = 65536
+
+    def __init__(self, vectors, rerank=4):
+        super().__init__(vectors)
+        self.rerank = rerank
+
+    @property
+    def nbytes(self):
+        raise NotImplementedError
+
+    def prepare(self, queries):
+        raise NotImplementedError
+
+    def score_block(self, prepared, start, end):
+        raise NotImplementedError
+
+    def search(self, queries, top_n=5, rows=None):
+        if rows is not None:
+            return self.search_rows(queries, top_n, rows)
+        queries = np.asarray(queries, dtype=np.float32)
+        single = queries.ndim == 1
+        queries = np.atleast_2d(queries)
+        n = len(self)
+        k = max(0, min(top_n, n))
+        fetch = min(n, k * self.rerank) if self.rerank else k
+
+        # Keep each block's best `fetch` rows, then pick the overall best among them
+        prepared = self.prepare(queries)
+        block_indices, block_scores = [], []
+        for start in range(0, n, self.block_size):
+            scores = self.score_block(prepared, start, min(start + self.block_size, n))
+            best = top_k(scores, min(fetch, scores.shape[1]))
+            block_indices.append(best + start)
+            block_scores.append(np.take_along_axis(scores, best, axis=1))
+        candidates = np.concatenate(block_indices, axis=1)
+        candidate_scores = np.concatenate(block_scores, axis=1)
+        best = top_k(candidate_scores, fetch)
+        indices = np.take_along_axis(candidates, best, axis=1)
+        scores = np.take_along_axis(candidate_scores, best, axis=1)
+
+        if self.rerank and k:
+            exact = np.einsum('qkd,qd->qk', np.asarray(self.vectors[indices.ravel()], dtype=np.float32)
+                              .reshape(indices.shape + (-1,)), queries)
+            best = top_k(exact, k)
+            indices = np.take_along_axis(indices, best, axis=1)
+            scores = np.take_along_axis(exact, best, axis=1)
+        else:
+            indices, scores = indices[:, :k], scores[:, :k]
+        if single:
+            return indices[0], scores[0]
+        return indices, scores
+
+
+class ScalarQuantizedIndex(CompressedIndex):
+    """Each dimension stored as one byte (dtype='int8') or as float16 (dtype='float16').
+
+    int8 codes are uint8 steps between the dimension's min and max over all rows, so
+    x[d] ~= low[d] + scale[d] * code[d], and q . x = q . low + (q * scale) . code is scored
+    on the codes with the offset added per query.
+
+    Passing codes (and low and scale) from a saved index skips encoding; rows past the end
+    of codes are encoded with the same low and scale, clipped to its range.
+    """
+
+    convert_rows = 4096
+
+    def __init__(self, vectors, dtype='int8', rerank=4, codes=None, low=None, scale=None):
+        super().__init__(vectors, rerank)
+        if dtype not in ('int8', 'float16'):
+            raise ValueError(f"Unknown scalar quantization '{dtype}'; expected 'int8' or 'float16'")
+        self.dtype = dtype
+        n, d = vectors.shape
+        if dtype == 'int8' and low is None:
+            low = np.full(d, np.inf, dtype=np.float32)
+            high = np.full(d, -np.inf, dtype=np.float32)
+            for start in range(0, n, self.block_size):
+                block = np.asarray(vectors[start:start + self.block_size], dtype=np.float32)
+                low = np.minimum(low, block.min(axis=0))
+                high = np.maximum(high, block.max(axis=0))
+            scale = np.where(high > low, (high - low) / 255.0, 1.0).astype(np.float32)
+        self.low = low
+        self.scale = scale
+
+        encoded = 0 if codes is None else len(codes)
+        if encoded == n:
+            self.codes = codes
+            return
+        self.codes = np.empty((n, d), dtype=np.float16 if dtype == 'float16' else np.uint8)
+        if encoded:
+            self.codes[:encoded] = codes
+        for start in range(encoded, n, self.block_size):
+            self.codes[start:start + self.block_size] = self.encode(vectors[start:start + self.block_size])
+
+    def encode(self, block):
+        if self.dtype == 'float16':
+            return block
+        block = np.asarray(block, dtype=np.float32)
+        return np.clip(np.rint((block - self.low) / self.scale), 0, 255)
+
+    def state(self):
+        if self.dtype == 'float16':
+            return {'codes': self.codes}
+        return {'codes': self.codes, 'low': self.low, 'scale': self.scale}
+
+    def with_rows(self, vectors):
+        return ScalarQuantizedIndex(vectors, self.dtype, self.rerank, **self.state())
+
+    @property
+    def nbytes(self):
+        tables = 0 if self.dtype == 'float16' else self.low.nbytes + self.scale.nbytes
+        return self.codes.nbytes + tables
+
+    def prepare(self, queries):
+        if self.dtype == 'float16':
+            return queries, None
+        return queries * self.scale, queries @ self.low
+
+    def score_block(self, prepared, start, end):
+        weights, offsets = prepared
+        scores = np.empty((weights.shape[0], end - start), dtype=np.float32)
+        # Widening a cache-sized slice at a time into one buffer keeps the scan bound by
+        # reading the codes, a quarter of the float32 bytes
+        buffer = np.empty((min(self.convert_rows, end - start), self.codes.shape[1]), dtype=np.float32)
+        for inner in range(start, end, self.convert_rows):
+            widened = buffer[:min(self.convert_rows, end - inner)]
+            widened[...] = self.codes[inner:inner + len(widened)]
+            scores[:, inner - start:inner - start + len(widened)] = weights @ widened.T
+        if offsets is not None:
+            scores += offsets[:, None]
+        return scores
+
+
+class Float16Index(ScalarQuantizedIndex):
+    """ScalarQuantizedIndex keeping the rows as float16."""
+
+    def __init__(self, vectors, rerank=4, codes=None):
+        super().__init__(vectors, dtype='float16', rerank=rerank, codes=codes)
+
+    def with_rows(self, vectors):
+        return Float16Index(vectors, self.rerank, **self.state())
+
+
+class PQIndex(CompressedIndex):
+    """Product quantization: the dimensions are split into n_subspaces groups, and each row
+    stores, per group, the id of the nearest of n_centroids (at most 256) k-means centroids.
+
+    A query is scored from a lookup table of its dot product with every centroid of every
+    group: a row's score is the sum of its groups' table entries.
+
+    Passing centroids (the (n_centroids, d) codebook, one block of columns per group) and
+    codes from a saved index skips training; rows past the end of codes are encoded with it.
+    """
+
+    def __init__(self, vectors, n_subspaces=50, n_centroids=256, n_iter=15, sample_size=None, seed=42, rerank=8,
+                 centroids=None, codes=None):
+        super().__init__(vectors, rerank)
+        n, d = vectors.shape
+        self.subspaces = np.array_split(np.arange(d), min(n_subspaces, d))
+        if centroids is None:
+            n_centroids = max(1, min(n_centroids, 256, n))
+            rng = np.random.default_rng(seed)
+            if sample_size is None:
+                sample_size = 64 * n_centroids
+            sample = np.asarray(vectors[np.sort(rng.choice(n, size=min(n, sample_size), replace=False))],
+                                dtype=np.float32)
+            centroids = np.concatenate(
+                [kmeans(sample[:, dims], n_centroids, n_iter, rng) for dims in self.subspaces], axis=1
+            )
+        self.codebook = np.asarray(centroids, dtype=np.float32)
+        self.n_centroids = self.codebook.shape[0]
+        self.centroids = [self.codebook[:, dims] for dims in self.subspaces]
+        self.code_offsets = (np.arange(len(self.subspaces)) * self.n_centroids).astype(np.intp)
+
+        encoded = 0 if codes is None else len(codes)
+        if encoded == n:
+            self.codes = codes
+            return
+        self.codes = np.empty((n, len(self.subspaces)), dtype=np.uint8)
+        if encoded:
+            self.codes[:encoded] = codes
+        for start in range(encoded, n, self.block_size):
+            block = np.asarray(vectors[start:start + self.block_size], dtype=np.float32)
+            for j, (dims, centroids) in enumerate(zip(self.subspaces, self.centroids)):
+                self.codes[start:start + self.block_size, j] = _nearest(block[:, dims], centroids)
+
+    def state(self):
+        return {'centroids': self.codebook, 'codes': self.codes}
+
+    def with_rows(self, vectors):
+        return PQIndex(vectors, n_subspaces=len(self.subspaces), rerank=self.rerank, **self.state())
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + sum(centroids.nbytes for centroids in self.centroids)
+
+    def prepare(self, queries):
+        # (q, n_subspaces * n_centroids) lookup table, one run of n_centroids entries per group
+        return np.concatenate(
+            [queries[:, dims] @ centroids.T for dims, centroids in zip(self.subspaces, self.centroids)], axis=1
+        )
+
+    def score_block(self, prepared, start, end):
+        positions = self.codes[start:end] + self.code_offsets
+        scores = np.empty((prepared.shape[0], end - start), dtype=np.float32)
+        # One query at a time keeps the gathered (rows x n_subspaces) table small
+        for i, table in enumerate(prepared):
+            scores[i] = table[positions].sum(axis=1)
+        return scores
+
+
+def kmeans(points, n_clusters, n_iter, rng):
+    """Lloyd's k-means on the rows of points; returns (n_clusters, d) centroids."""
+    centroids = points[rng.choice(points.shape[0], size=n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignments = _nearest(points, centroids)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, points)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def _nearest(points, centroids):
+    """Index of the closest centroid (Euclidean) for every row of points."""
+    distances = (centroids ** 2).sum(axis=1) - 2.0 * points @ centroids.T
+    return np.argmin(distances, axis=1)
+
+
+def _trim(indices, scores):
+    """Drop the padding left when fewer than top_n candidates were scanned."""
+    keep = indices >= 0
+    return indices[keep], scores[keep]
+
+
+def _nearest_centroid(vectors, centroids, block_size=65536):
+    """Return the index of the highest-scoring centroid for every row."""
+    assignments = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        assignments[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(vectors, n_clusters, n_iter, rng):
+    """Cluster unit vectors by cosine similarity; returns normalized (n_clusters, d) centroids."""
+    centroids = vectors[rng.choice(vectors.shape[0], size=n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignments = _nearest_centroid(vectors, centroids)
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=n_clusters)
+        filled = np.flatnonzero(counts)
+        sums = np.add.reduceat(vectors[order], np.concatenate(([0], np.cumsum(counts)[:-1]))[filled], axis=0)
+        centroids[filled] = sums
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            # Re-seed empty clusters from random rows so every list stays useful
+            centroids[empty] = vectors[rng.choice(vectors.shape[0], size=empty.size, replace=False)]
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms == 0, 1, norms)
+    return centroids
+
+
+VECTOR_INDEXES = {
+    'exact': ExactIndex,
+    'ivf': IVFIndex,
+    'sq8': ScalarQuantizedIndex,
+    'fp16': Float16Index,
+    'pq': PQIndex,
+}
+
+
+def make_vector_index(kind, vectors, **params):
+    """Build the vector index backend registered under kind.
+
+    params may include the arrays of a saved index's state() to skip training.
+    """
+    if kind not in VECTOR_INDEXES:
+        raise ValueError(f"Unknown vector index '{kind}'; expected one of {sorted(VECTOR_INDEXES)}")
+    return VECTOR_INDEXES[kind](vectors, **params)
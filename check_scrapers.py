@@ -0,0 +1,157 @@
+"""Run wocka.py and stupidstuff.py against the saved pages in scraper_fixtures/ and check the records.
+
+    python check_scrapers.py
+
+The pages are served by a local http.server, so the scrapers go through the real engine
+(pooled session, rate limiter, retries, checkpoint) without touching the sites. The
+fixtures cover normal jokes, a missing and a hidden (dirty) wocka joke, a stupidstuff
+page that answers 503 once before succeeding, and an id with no page (404). Each scraper
+is then run again on the same output to check that it resumes from the .done checkpoint:
+finished ids are not fetched again, and only the failed id is retried.
+Exits non-zero if anything differs.
+"""
+import functools
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import stupidstuff
+import wocka
+from scraper_engine import ScrapeEngine
+
+fixtures_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scraper_fixtures')
+
+# Paths that answer 503 on their first request
+FLAKY_PATHS = {'/stupidstuff/204.html'}
+
+EXPECTED = {
+    'wocka': {
+        'ids': [101, 102, 103, 104],
+        'records': [
+            {'id': 101, 'category': 'Work Jokes', 'title': 'The Lumberjack',
+             'body': 'A lumberjack applied for a job and claimed he could cut down 100 trees a day.\n'
+                     '"Where did you learn to do that?" asked the foreman.\n'
+                     '"In the Sahara Forest." "You mean the Sahara Desert?" "Sure, now it is."'},
+            {'id': 104, 'category': 'Animal', 'title': 'Duck & Lip Balm',
+             'body': 'A duck walks into a store and asks for lip balm.\n'
+                     'The clerk asks, "Cash or card?"\n'
+                     'The duck says, "Just put it on my bill."'},
+        ],
+        'counts': {'stored': 2, 'empty': 2, 'failed': 0, 'skipped': 0},
+        'rerun': {'stored': 0, 'empty': 0, 'failed': 0, 'skipped': 4},
+        'refetched': [],
+    },
+    'stupidstuff': {
+        'ids': [201, 202, 203, 204],
+        'records': [
+            {'id': 201, 'category': 'Computers', 'rating': 3.75,
+             'body': "Why did the programmer quit his job?\n\nBecause he didn't get arrays."},
+            {'id': 202, 'category': 'Light Bulbs', 'rating': 2.0,
+             'body': 'How many surrealists does it take to change a light bulb?\n'
+                     'Two: one to hold the giraffe and one to fill the bathtub with brightly colored machine tools.'},
+            {'id': 204, 'category': 'Blonde', 'rating': 2.0, 'body': 'What do you call a fly without wings?\nA walk.'},
+        ],
+        # 203 has no page: the 404 is a failure, left out of the checkpoint and retried
+        'counts': {'stored': 3, 'empty': 0, 'failed': 1, 'skipped': 0},
+        'rerun': {'stored': 0, 'empty': 0, 'failed': 1, 'skipped': 3},
+        'refetched': ['/stupidstuff/203.html'],
+    },
+}
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    requests_seen = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            first = self.path not in self.requests_seen
+            self.requests_seen.append(self.path)
+        if first and self.path in FLAKY_PATHS:
+            self.send_error(503)
+            return
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+def read_records(path):
+    with open(path) as f:
+        return sorted((json.loads(line) for line in f), key=lambda record: record['id'])
+
+
+def check_scraper(name, module, base_url, tmp, failures):
+    expected = EXPECTED[name]
+    output = os.path.join(tmp, f"{name}.jsonl")
+    url_template = f"{base_url}/{name}/{{}}.html"
+
+    def run():
+        engine = ScrapeEngine(url_template, module.joke_record, output, workers=4, rate=0, retries=2, backoff=0.01)
+        return engine.run(expected['ids'], progress=lambda message: None)
+
+    FixtureHandler.requests_seen.clear()
+    counts = run()
+    fetches = {path: FixtureHandler.requests_seen.count(path) for path in set(FixtureHandler.requests_seen)}
+    records = read_records(output)
+    FixtureHandler.requests_seen.clear()
+    rerun_counts = run()
+    refetched = sorted(set(FixtureHandler.requests_seen))
+
+    report = {
+        'counts': counts,
+        'rerun_counts': rerun_counts,
+        'records_match': records == expected['records'],
+        'rerun_output_unchanged': read_records(output) == records,
+        'refetched_on_rerun': refetched,
+        'flaky_fetches': {path: fetches.get(path) for path in FLAKY_PATHS if path.startswith(f"/{name}/")},
+    }
+    if counts != expected['counts']:
+        failures.append(f"{name}: counts {counts} != {expected['counts']}")
+    if records != expected['records']:
+        failures.append(f"{name}: records differ: {json.dumps(records, indent=2)}")
+    if rerun_counts != expected['rerun']:
+        failures.append(f"{name}: rerun counts {rerun_counts} != {expected['rerun']}")
+    if not report['rerun_output_unchanged']:
+        failures.append(f"{name}: the rerun changed the output")
+    if refetched != expected['refetched']:
+        failures.append(f"{name}: the rerun fetched {refetched}, expected {expected['refetched']}")
+    for path in FLAKY_PATHS:
+        if path.startswith(f"/{name}/") and fetches.get(path) != 2:
+            failures.append(f"{name}: {path} was fetched {fetches.get(path)} times, expected a 503 then a retry")
+    return report
+
+
+def main():
+    server = ThreadingHTTPServer(
+        ('127.0.0.1', 0), functools.partial(FixtureHandler, directory=fixtures_directory)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    failures = []
+    report = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            report['wocka'] = check_scraper('wocka', wocka, base_url, tmp, failures)
+            report['stupidstuff'] = check_scraper('stupidstuff', stupidstuff, base_url, tmp, failures)
+
+        # A negative retry count still fetches once
+        engine = ScrapeEngine(f"{base_url}/wocka/{{}}.html", wocka.joke_record, os.devnull, retries=-1, rate=0)
+        if wocka.joke_record(101, engine.fetch(101))['title'] != 'The Lumberjack':
+            failures.append("fetch with retries=-1 did not return the page")
+    except Exception as ex:
+        failures.append(f"{type(ex).__name__}: {ex}")
+    finally:
+        server.shutdown()
+
+    report['ok'] = not failures
+    print(json.dumps(report, indent=2))
+    for failure in failures:
+        print("FAIL " + failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Concurrent, resumable fetch engine shared by the id-based scrapers (wocka.py, stupidstuff.py).
+
+Pages are fetched by a bounded thread pool over one pooled keep-alive session, throttled per
+host and retried with exponential backoff. Parsed jokes are appended to a JSON Lines file and
+every finished id (found or not) is appended to a checkpoint file, so a restarted run skips
+the ids it already handled. Ids that still fail after all retries are logged and left out of
+the checkpoint, so the next run tries them again.
+
+Point url_template at a local server (e.g. `python -m http.server` over saved pages) to exercise
+the parsers without touching the real sites.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Allow at most `rate` requests per second to each host, across all threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class ScrapeEngine:
+    """Fetch url_template.format(id) for many ids and append parse(id, content) records to a JSONL file.
+
+    parse returns a dict to store, or None for ids that have no usable joke (missing, hidden).
+    """
+
+    def __init__(self, url_template, parse, output_path, checkpoint_path=None, workers=8,
+                 rate=5.0, retries=4, backoff=0.5, timeout=15):
+        self.url_template = url_template
+        self.parse = parse
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path or output_path + ".done"
+        self.workers = workers
+        # Every id is fetched at least once, however low retries is set
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, id):
+        """Download one page, retrying connection errors and 429/5xx responses with backoff."""
+        url = self.url_template.format(id)
+        for attempt in range(self.retries + 1):
+            self.limiter.wait(url)
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.content
+                error = requests.HTTPError(f"HTTP {response.status_code} for {url}")
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                error = ex
+            if attempt < self.retries:
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+        raise error
+
+    def scrape_one(self, id):
+        return self.parse(id, self.fetch(id))
+
+    def completed_ids(self):
+        """Ids recorded in the checkpoint by earlier runs."""
+        if not os.path.exists(self.checkpoint_path):
+            return set()
+        with open(self.checkpoint_path) as f:
+            return {int(line) for line in f if line.strip()}
+
+    def run(self, ids, progress=print):
+        """Scrape every id not yet in the checkpoint; returns counts of stored, empty and failed ids."""
+        done = self.completed_ids()
+        pending = iter([id for id in ids if id not in done])
+        counts = {'stored': 0, 'empty': 0, 'failed': 0, 'skipped': len(done)}
+
+        with open(self.output_path, "a") as output, open(self.checkpoint_path, "a") as checkpoint, \
+                ThreadPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = {}
+
+            def submit_next():
+                id = next(pending, None)
+                if id is not None:
+                    in_flight[pool.submit(self.scrape_one, id)] = id
+
+            # Keep a bounded window of requests in flight instead of queueing every id
+            for _ in range(self.workers * 4):
+                submit_next()
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    id = in_flight.pop(future)
+                    try:
+                        record = future.result()
+                    except Exception as ex:
+                        counts['failed'] += 1
+                        progress("ID {} failed: ".format(id))
+                        logging.error(ex)
+                    else:
+                        if record is None:
+                            counts['empty'] += 1
+                        else:
+                            output.write(json.dumps(record, sort_keys=True) + "\n")
+                            output.flush()
+                            counts['stored'] += 1
+                            progress("ID {} success".format(id))
+                        checkpoint.write("{}\n".format(id))
+                        checkpoint.flush()
+                    submit_next()
+        return counts
+
+
+def add_engine_arguments(parser, output, max_id):
+    """Command-line options shared by the scrapers."""
+    parser.add_argument("--output", default=output)
+    parser.add_argument("--start-id", type=int, default=1)
+    parser.add_argument("--max-id", type=int, default=max_id)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=5.0, help="max requests per second per host")
+    parser.add_argument("--retries", type=int, default=4)
+    parser.add_argument("--url-template", default=None,
+                        help="page URL with {} for the id, e.g. http://localhost:8000/{}.html for saved fixtures")
+    return parser
@@ -1,28 +1,28 @@
 from lxml import html
 import requests
-import json
+import argparse
 import logging
 import re
+from scraper_engine import ScrapeEngine, add_engine_arguments
 
 re_category_rating = re.compile(r"\s*Category: (.*[A-z])\s*Rating: (.*\d)\s*")
 
 logging.basicConfig(level=logging.ERROR)
 
-def extract_joke(id):
-    """Download and parse a single joke."""
+URL_BASE = "http://stupidstuff.org/jokes/joke.htm?jokeid={}"
 
-    url_base = "http://stupidstuff.org/jokes/joke.htm?jokeid={}"
-    response = requests.get(url_base.format(id))
+def parse_joke(page):
+    """Parse a single joke page's HTML."""
 
-    tree = html.fromstring(response.content)
+    tree = html.fromstring(page)
     content = tree.xpath('//table[@bgcolor="#ffffff" and @width="470"]//table[@class="scroll"]//td')[0]
     category_rating_cells = content.xpath('//table[@bgcolor="#ffffff"]//table[@class="bkline"]//td/b[text()="Category: "]/..')
-    #print(category_rating_cell)
 
     crap = content.xpath('./child::node()[not(self::text()) and not(self::br)]') # all html nodes in content, but not plaintext
 
+    # drop_tree keeps each node's tail, the joke text that follows it
     for node in crap:
-        content.remove(node)
+        node.drop_tree()
 
     body_text = content.text_content().strip()
     joke_body = body_text
@@ -36,24 +36,25 @@ def extract_joke(id):
     return joke_body, category, rating
 
 
+def extract_joke(id, url_base=URL_BASE):
+    """Download and parse a single joke."""
+
+    response = requests.get(url_base.format(id))
+    return parse_joke(response.content)
+
+
+def joke_record(id, page):
+    """Turn a fetched page into an output record."""
+    body, category, rating = parse_joke(page)
+    return {"id": id, "category": category, "body": body, "rating": rating}
+
+
 if __name__ == "__main__":
 
-    jokes = []
-
-    save_frequency = 100 # save after every 100 IDs
-    max_id = 3773
-    for id in range(1, max_id+1): #19000
-        try:
-            body, category, rating = extract_joke(id)
-
-            joke = {"id": id, "category": category, "body": body, "rating": rating}
-            jokes.append(joke)
-            print("ID {} success: [{}]".format(id, category))
-        except Exception as ex:
-            print("ID {} failed: ".format(id))
-            logging.error(ex)
-            raise ex
-
-        if id % save_frequency == 0 or id == max_id:
-            with open("stupidstuff.json", "w") as f:
-                json.dump(jokes, f, indent=4, sort_keys=True)
\ No newline at end of file
+    parser = add_engine_arguments(argparse.ArgumentParser(description=__doc__), "stupidstuff.jsonl", 3773)
+    args = parser.parse_args()
+
+    # Failed ids are logged and retried on the next run instead of aborting the scrape
+    engine = ScrapeEngine(args.url_template or URL_BASE, joke_record, args.output, workers=args.workers, rate=args.rate, retries=args.retries)
+    counts = engine.run(range(args.start_id, args.max_id + 1))
+    print("Done: {stored} stored, {failed} failed, {skipped} already done.".format(**counts))
@@ -1,25 +1,26 @@
 from lxml import html
 import requests
-import json
+import argparse
 import logging
+from scraper_engine import ScrapeEngine, add_engine_arguments
 
 logging.basicConfig(level=logging.ERROR)
 
-def extract_joke(id):
-    """Download and parse a single joke."""
+URL_BASE = "http://www.wocka.com/{}.html"
 
-    url_base = "http://www.wocka.com/{}.html"
-    response = requests.get(url_base.format(id))
+def parse_joke(page):
+    """Parse a single joke page's HTML."""
 
-    tree = html.fromstring(response.content)
+    tree = html.fromstring(page)
     content = tree.xpath('//div[@id="content"]')[0]
     h2s = tree.xpath('//div[@id="content"]/h2')
     category_rows = content.xpath('./div[@class="right"]//tr/td/b[text()="Category"]/../..')
 
     crap = tree.xpath('//div[@id="content"]/child::node()[not(self::text()) and not(self::br)]') # all html nodes in content, but not plaintext
 
+    # drop_tree keeps each node's tail, the joke text that follows it
     for node in crap:
-        content.remove(node)
+        node.drop_tree()
 
     body_text = content.text_content().strip()
 
@@ -37,27 +38,27 @@ def extract_joke(id):
     return joke_title, joke_body, category
 
 
-if __name__ == "__main__":
+def extract_joke(id, url_base=URL_BASE):
+    """Download and parse a single joke."""
+
+    response = requests.get(url_base.format(id))
+    return parse_joke(response.content)
 
-    jokes = []
 
-    save_frequency = 100 # save after every 100 IDs
-    max_id = 19000
-    for id in range(1, max_id+1): #19000
-        try:
-            title, body, category = extract_joke(id)
+def joke_record(id, page):
+    """Turn a fetched page into an output record, or None if the joke is missing or hidden."""
+    title, body, category = parse_joke(page)
+    if title is None:
+        print("ID {} {}.".format(id, body))
+        return None
+    return {"id": id, "category": category, "title": title, "body": body}
 
-            if title is None:
-                print("ID {} {}.".format(id, body))
-                continue
 
-            joke = {"id": id, "category": category, "title": title, "body": body}
-            jokes.append(joke)
-            print("ID {} success: [{}] {}".format(id, category, title))
-        except Exception as ex:
-            print("ID {} failed: ".format(id))
-            logging.error(ex)
+if __name__ == "__main__":
+
+    parser = add_engine_arguments(argparse.ArgumentParser(description=__doc__), "wocka.jsonl", 19000)
+    args = parser.parse_args()
 
-        if id % save_frequency == 0 or id == max_id:
-            with open("wocka.json", "w") as f:
-                json.dump(jokes, f, indent=4, sort_keys=True)
\ No newline at end of file
+    engine = ScrapeEngine(args.url_template or URL_BASE, joke_record, args.output, workers=args.workers, rate=args.rate, retries=args.retries)
+    counts = engine.run(range(args.start_id, args.max_id + 1))
+    print("Done: {stored} stored, {empty} missing or hidden, {failed} failed, {skipped} already done.".format(**counts))